@@ -0,0 +1,61 @@
+import {
+	ZenoService,
+	type InferenceRequest,
+	type JobInfo,
+	type PromptComparison,
+	type PromptComparisonRequest,
+} from "../zenoservice";
+
+const UNFINISHED = ["queued", "running", "paused"];
+
+/** Poll a job until it is done, failed or cancelled. */
+export async function waitForJob(
+	job: JobInfo,
+	interval = 1000
+): Promise<JobInfo> {
+	while (UNFINISHED.includes(job.status)) {
+		await new Promise((resolve) => setTimeout(resolve, interval));
+		job = await ZenoService.getJob(job.id);
+	}
+	return job;
+}
+
+let promptJob: JobInfo | undefined;
+
+/**
+ * Run a prompt in a background job and wait for it.
+ * With cancelPrevious, the previous job started this way is cancelled first,
+ * e.g. as its prompt version was replaced by a new one.
+ */
+export async function runPromptJob(
+	req: InferenceRequest,
+	cancelPrevious = false
+): Promise<JobInfo> {
+	if (
+		cancelPrevious &&
+		promptJob !== undefined &&
+		UNFINISHED.includes(promptJob.status)
+	) {
+		await ZenoService.controlJob(promptJob.id, "cancel");
+	}
+	const job = await ZenoService.runPrompt(req);
+	if (cancelPrevious) {
+		promptJob = job;
+	}
+	const finished = await waitForJob(job);
+	if (promptJob?.id === finished.id) {
+		promptJob = finished;
+	}
+	return finished;
+}
+
+/**
+ * Compare two prompt versions in a background job and wait for it.
+ * Resolves to undefined if the job failed or was cancelled.
+ */
+export async function comparePromptsJob(
+	req: PromptComparisonRequest
+): Promise<PromptComparison | undefined> {
+	const job = await waitForJob(await ZenoService.comparePrompts(req));
+	return job.status === "done" ? (job.result as PromptComparison) : undefined;
+}
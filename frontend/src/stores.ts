@@ -56,6 +56,36 @@ wsResponse.subscribe(($wsResponse) => {
 		} as WSResponse);
 	}
 });
+interface LLMStreamEvent {
+	streamId: string;
+	kind: string;
+	promptId: string;
+	delta: string;
+	done: boolean;
+}
+
+// Text streamed so far by the latest LLM call of each kind, e.g.
+// "suggest_requirements", cleared when the next call of that kind starts.
+export const llmStreams: Writable<Record<string, string>> = writable({});
+const llmStreamIds: Record<string, string> = {};
+
+websocketStore(new_uri.replace(/status$/, "llm-stream"), "").subscribe(
+	($event) => {
+		if (!$event) {
+			return;
+		}
+		const event: LLMStreamEvent = JSON.parse($event);
+		llmStreams.update((streams) => {
+			if (llmStreamIds[event.kind] !== event.streamId) {
+				llmStreamIds[event.kind] = event.streamId;
+				streams[event.kind] = "";
+			}
+			streams[event.kind] += event.delta;
+			return streams;
+		});
+	}
+);
+
 export const ready: Writable<boolean> = writable(false);
 
 export const rowsPerPage = writable(0);
@@ -19,6 +19,7 @@ export type { HistogramColumnRequest } from "./models/HistogramColumnRequest";
 export type { HistogramRequest } from "./models/HistogramRequest";
 export type { HTTPValidationError } from "./models/HTTPValidationError";
 export type { InferenceRequest } from "./models/InferenceRequest";
+export type { JobInfo } from "./models/JobInfo";
 export type { FeedbackRequest } from "./models/FeedbackRequest";
 export type {EvaluatorFeedbackRequest} from "./models/EvaluatorsFeedback";
 export { MetadataType } from "./models/MetadataType";
@@ -28,6 +29,11 @@ export type { Parameters } from "./models/Parameters";
 export type { PlotRequest } from "./models/PlotRequest";
 export type { Points2D } from "./models/Points2D";
 export type { PointsColors } from "./models/PointsColors";
+export type {
+	PromptComparison,
+	RequirementComparison,
+} from "./models/PromptComparison";
+export type { PromptComparisonRequest } from "./models/PromptComparisonRequest";
 export type { Report } from "./models/Report";
 export type { Slice } from "./models/Slice";
 export type { SliceFinderRequest } from "./models/SliceFinderRequest";
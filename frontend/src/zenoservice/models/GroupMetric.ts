@@ -5,4 +5,7 @@
 export type GroupMetric = {
 	metric?: number;
 	size: number;
+	ciLow?: number;
+	ciHigh?: number;
+	evaluatedSize?: number;
 };
@@ -0,0 +1,22 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+export type JobInfo = {
+	id: string;
+	kind: string;
+	request?: Record<string, any>;
+	/** "queued", "running", "paused", "cancelled", "done" or "failed". */
+	status: string;
+	rowsDone?: number;
+	rowsTotal?: number;
+	callsInFlight?: number;
+	error?: string;
+	/** The job that started this one, which cancels, pauses and resumes it too. */
+	parentId?: string;
+	/** What a finished job returned, e.g. the PromptComparison of "compare_prompts". */
+	result?: Record<string, any>;
+	createdAt: number;
+	startedAt?: number;
+	endedAt?: number;
+};
@@ -10,6 +10,19 @@ export type Example = {
 	feedback: string;
 };
 
+export type CodeEvaluator = {
+	kind: string;
+	pattern?: string;
+	ignoreCase?: boolean;
+	negate?: boolean;
+	minLength?: number;
+	maxLength?: number;
+	unit?: string;
+	jsonSchema?: { [key: string]: any };
+	code?: string;
+	llmFallback?: boolean;
+};
+
 export type Requirement = {
 	id: string;
 	name: string;
@@ -19,6 +32,7 @@ export type Requirement = {
 	examples?: Array<Example>;
 	mode?: string;
 	implementationUpdateFlag?: boolean;
+	evaluator?: CodeEvaluator;
 };
 
 export type Prompt = {
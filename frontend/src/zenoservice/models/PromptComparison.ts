@@ -0,0 +1,23 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+export type RequirementComparison = {
+	requirementId: string;
+	/** Rows evaluated with both prompts, and the passes of each. */
+	rows: number;
+	baselinePasses: number;
+	candidatePasses: number;
+	/** "better", "worse", "same" or "undecided" for the candidate. */
+	decision: string;
+};
+
+export type PromptComparison = {
+	model: string;
+	baselinePromptId: string;
+	candidatePromptId: string;
+	rows: number;
+	totalRows: number;
+	stoppedEarly: boolean;
+	requirements: Array<RequirementComparison>;
+};
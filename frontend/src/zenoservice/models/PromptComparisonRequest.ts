@@ -0,0 +1,9 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+export type PromptComparisonRequest = {
+	model: string;
+	baselinePromptId: string;
+	candidatePromptId: string;
+};
@@ -7,10 +7,12 @@ import type { EntryRequest } from "../models/EntryRequest";
 import type { GroupMetric } from "../models/GroupMetric";
 import type { HistogramBucket } from "../models/HistogramBucket";
 import type { HistogramRequest } from "../models/HistogramRequest";
+import type { JobInfo } from "../models/JobInfo";
 import type { MetricRequest } from "../models/MetricRequest";
 import type { PlotRequest } from "../models/PlotRequest";
 import type { Points2D } from "../models/Points2D";
 import type { PointsColors } from "../models/PointsColors";
+import type { PromptComparisonRequest } from "../models/PromptComparisonRequest";
 import type { Report } from "../models/Report";
 import type { Slice } from "../models/Slice";
 import type { SliceFinderRequest } from "../models/SliceFinderRequest";
@@ -155,14 +157,14 @@ export class ZenoService {
 	}
 
 	/**
-	 * Run Prompt on Data
+	 * Run Prompt on Data in a background job
 	 * @param requestBody
-	 * @returns any Successful Response
+	 * @returns JobInfo Successful Response
 	 * @throws ApiError
 	 */
 	public static runPrompt(
 		requestBody: InferenceRequest
-	): CancelablePromise<any> {
+	): CancelablePromise<JobInfo> {
 		console.log(requestBody);
 		return __request(OpenAPI, {
 			method: "POST",
@@ -175,6 +177,82 @@ export class ZenoService {
 		});
 	}
 
+	/**
+	 * Compare two prompt versions in a background job
+	 * @param requestBody
+	 * @returns JobInfo Successful Response, with the PromptComparison as result
+	 * @throws ApiError
+	 */
+	public static comparePrompts(
+		requestBody: PromptComparisonRequest
+	): CancelablePromise<JobInfo> {
+		return __request(OpenAPI, {
+			method: "POST",
+			url: "/compare-prompts",
+			body: requestBody,
+			mediaType: "application/json",
+			errors: {
+				422: `Validation Error`,
+			},
+		});
+	}
+
+	/**
+	 * Get Jobs
+	 * @returns JobInfo Successful Response
+	 * @throws ApiError
+	 */
+	public static getJobs(): CancelablePromise<Array<JobInfo>> {
+		return __request(OpenAPI, {
+			method: "GET",
+			url: "/jobs",
+		});
+	}
+
+	/**
+	 * Get Job
+	 * @param jobId
+	 * @returns JobInfo Successful Response
+	 * @throws ApiError
+	 */
+	public static getJob(jobId: string): CancelablePromise<JobInfo> {
+		return __request(OpenAPI, {
+			method: "GET",
+			url: "/jobs/{job_id}",
+			path: {
+				job_id: jobId,
+			},
+			errors: {
+				404: `Not Found`,
+				422: `Validation Error`,
+			},
+		});
+	}
+
+	/**
+	 * Cancel, pause or resume a Job
+	 * @param jobId
+	 * @param action
+	 * @returns JobInfo Successful Response
+	 * @throws ApiError
+	 */
+	public static controlJob(
+		jobId: string,
+		action: "cancel" | "pause" | "resume"
+	): CancelablePromise<JobInfo> {
+		return __request(OpenAPI, {
+			method: "POST",
+			url: `/jobs/{job_id}/${action}`,
+			path: {
+				job_id: jobId,
+			},
+			errors: {
+				404: `Not Found`,
+				422: `Validation Error`,
+			},
+		});
+	}
+
 	/**
 	 * Optimize one requirement
 	 * @param requestBody
@@ -1,7 +1,7 @@
 """External API for Zeno. Includes decorator functions, return types, and options."""
 
 import functools
-from typing import Any, Callable, Dict, List, Union, ClassVar
+from typing import Any, Callable, Dict, List, Optional, Union, ClassVar
 
 from numpy.typing import NDArray
 from pandas import DataFrame, Series
@@ -61,6 +61,91 @@ class ZenoParameters(BaseModel):
     samples: int = 30
     port: int = 8000
     host: str = "localhost"
+    # Persistent LLM response cache. Defaults to <cache_path>/llm, point several
+    # projects at one directory to share responses between them.
+    llm_cache: bool = True
+    llm_cache_path: str = ""
+    llm_cache_max_size: int = 2 * 1024**3
+    llm_cache_max_age: float = 30 * 24 * 60 * 60
+    # Client-side rate limits, per model. llm_model_limits overrides the defaults
+    # for individual models as {"model": {"rpm": ..., "tpm": ...}}.
+    llm_rpm: Optional[int] = None
+    llm_tpm: Optional[int] = None
+    llm_model_limits: Dict[str, Dict[str, int]] = {}
+    llm_concurrency: int = 10
+    llm_max_concurrency: int = 32
+    # API keys or OpenAI-compatible servers to spread LLM calls over, e.g.
+    # [{"name": "a", "api_key": ..., "base_url": ..., "weight": 2, "rpm": ...,
+    # "tpm": ..., "models": [...]}]. Limits not set per endpoint default to the
+    # llm_* values above. Empty to use OPENAI_API_KEY only.
+    llm_endpoints: List[Dict[str, Any]] = []
+    # HTTP connections to the LLM API. llm_http_max_connections of 0 sizes the
+    # connection pool of each endpoint from its max concurrency. llm_endpoints
+    # entries can override these as max_connections, keepalive_expiry, http2,
+    # timeout and connect_timeout. HTTP/2 needs `pip install httpx[http2]`.
+    llm_http_max_connections: int = 0
+    llm_http_keepalive_expiry: float = 60
+    llm_http2: bool = False
+    llm_http_timeout: float = 600
+    llm_http_connect_timeout: float = 10
+    # How queued LLM calls are picked across the interactive, foreground and
+    # background lanes: "strict" by lane or "weighted" round-robin, with
+    # llm_lane_weights as e.g. {"interactive": 16, "foreground": 4, "background": 1}.
+    llm_scheduling: str = "weighted"
+    llm_lane_weights: Dict[str, int] = {}
+    # Run requirement evaluation through an offline batch API instead of
+    # interactive calls. llm_batch_backend defaults to the OpenAI Batch API.
+    llm_batch: bool = False
+    llm_batch_poll_interval: float = 60
+    llm_batch_backend: Any = None
+    # Evaluation results are written to the cache every this many rows, so an
+    # interrupted sweep keeps its progress.
+    evaluation_flush_every: int = 50
+    # Evaluate several rows per request, with at most this many estimated tokens
+    # of model outputs and evaluation_pack_max_rows rows. 0 sends one row each.
+    evaluation_pack_tokens: int = 0
+    evaluation_pack_max_rows: int = 16
+    # Judge every requirement of a prompt in one call per row, instead of one
+    # call per row and requirement.
+    evaluation_combine_requirements: bool = False
+    # Inference and evaluation jobs run at the same time. They share the LLM
+    # client pool, so its limits bound the requests in flight, not this.
+    parallel_jobs: int = 8
+    # Model functions get this many rows at a time, and the outputs are saved
+    # after every call so a crash only loses the rows in flight. 0 adapts the
+    # size so a call takes about inference_chunk_seconds.
+    inference_chunk_size: int = 0
+    inference_chunk_seconds: float = 30.0
+    # run_prompt infers missing outputs in chunks of this many rows and
+    # evaluates each chunk while the next one is inferred. 0 infers every row
+    # before evaluating any.
+    pipeline_chunk_size: int = 100
+    # Evaluate a stratified random sample of this many rows first, then keep
+    # evaluating batches of the same size in the background until the 95%
+    # interval of the pass rate is at most evaluation_target_ci wide on each
+    # side, or every row is evaluated. Strata are the values of the
+    # evaluation_sample_strata column, or positions in the data. 0 evaluates
+    # every row at once.
+    evaluation_sample_size: int = 0
+    evaluation_sample_strata: str = ""
+    evaluation_target_ci: float = 0.02
+    # compare_prompts runs both prompts on batches of comparison_batch_size rows
+    # until a sequential test decides every requirement, or the candidate is
+    # worse on one. comparison_effect is the share above one half of the rows
+    # where exactly one prompt passes that counts as a difference;
+    # comparison_alpha and comparison_beta are the error rates of the test.
+    # Prompts are also the same on a requirement once the rows where exactly
+    # one of them passes are surely below a comparison_margin share of all rows.
+    comparison_batch_size: int = 50
+    comparison_effect: float = 0.2
+    comparison_alpha: float = 0.05
+    comparison_beta: float = 0.2
+    comparison_margin: float = 0.05
+    # Replaces the OpenAI API for every LLM call of the backend, e.g. with
+    # zeno.llm.mock.MockLLM for offline runs and benchmarks.
+    llm_custom_api: Any = None
+    # File written by dump_llm_telemetry, defaults to <cache_path>/llm_telemetry.json.
+    llm_telemetry_path: str = ""
 
     class Config:
         arbitrary_types_allowed = True
@@ -9,7 +9,12 @@ import sys
 import json
 import re
 import threading
+import contextvars
 import copy
+import itertools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from inspect import getsource
 from difflib import SequenceMatcher
 from pathlib import Path
@@ -30,25 +35,47 @@ from zeno.api import (
     ZenoParameters,
 )
 from zeno.classes.base import DataProcessingReturn, MetadataType, ZenoColumnType
-from zeno.openai_client import OpenAIMultiClient
-from zeno.classes.classes import MetricKey, PlotRequest, InferenceRequest, FeedbackRequest, TableRequest, ZenoColumn, Prompt, Requirement, Example, EvaluatorFeedback, SuggestNewReqRequest, RemoveExampleFeedback
+from zeno.openai_client import OpenAIClientPool
+from zeno.llm.batch import BatchClient, OpenAIBatchBackend
+from zeno.llm.cache import ResponseCache, payload_key
+from zeno.llm.dead_letter import DeadLetterStore
+from zeno.llm.endpoints import APIEndpoint
+from zeno.llm.evaluation_store import EvaluationStore, output_key, requirement_key
+from zeno.llm.packing import pack_rows, parse_packed
+from zeno.llm.rate_limit import RateLimiter
+from zeno.llm.scheduler import Lane
+from zeno.llm.stream import StreamBroker
+from zeno.llm.telemetry import Telemetry
+from zeno.llm.transport import HTTPTransport
+from zeno.classes.classes import MetricKey, PlotRequest, InferenceRequest, JobInfo, CodeEvaluator, PromptComparison, PromptComparisonRequest, RequirementComparison, FeedbackRequest, TableRequest, ZenoColumn, Prompt, Requirement, Example, EvaluatorFeedback, SuggestNewReqRequest, RemoveExampleFeedback
 from zeno.classes.report import Report
 from zeno.classes.slice import FilterIds, FilterPredicateGroup, GroupMetric, Slice
 from zeno.classes.tag import Tag, TagMetricKey
+from zeno.processing.code_evaluation import reject_untrusted_code, run_code_evaluator
+from zeno.processing import jobs, sequential
+from zeno.processing.jobs import JobManager
+from zeno.processing.priority import PriorityHints
+from zeno.processing.sampling import proportion_interval, stratified_order
 from zeno.processing.data_processing import (
+    infer_rows,
+    load_model_fn,
     postdistill_data,
     predistill_data,
     run_inference,
 )
 from zeno.processing.filtering import filter_table
 from zeno.util import (
+    append_series,
+    examples_to_str,
     generate_diff_cols,
     get_metadata_type,
     load_series,
     read_functions,
     read_metadata,
     read_pickle,
+    requirements_to_eval_str,
     requirements_to_str,
+    save_series,
 )
 from zeno.prompt_templates import (
     REQUIREMENT_CREATOR_PROMPT, 
@@ -56,6 +83,10 @@ from zeno.prompt_templates import (
     PROMPT_COMPILER_PROMPT, 
     REQUIREMENT_EXTRACTOR_PROMPT, 
     REQUIREMENT_EVALUATION_PROMPT,
+    REQUIREMENT_EVALUATION_OUTPUT_PROMPT,
+    REQUIREMENT_EVALUATION_PACKED_PROMPT,
+    REQUIREMENT_EVALUATION_PACKED_OUTPUT_PROMPT,
+    REQUIREMENTS_EVALUATION_PROMPT,
     REQUIREMENT_SUGGESTION_PROMPT,
     REQUIREMENT_UPDATE_PROMPT,
     REQUIREMENT_UPDATE_REQUEST_PROMPT
@@ -66,8 +97,93 @@ class ZenoBackend(object):
     def __init__(self, args: ZenoParameters):
         logging.basicConfig(level=logging.INFO)
         self.params = args
+        # Guards self.df while evaluation and inference jobs run in threads.
+        self.__df_lock = threading.RLock()
+        # Rows appended to each saved evaluation column since it was saved whole.
+        self.__appended_rows: Dict[str, int] = {}
+        # Rows shown in the table, inferred and evaluated before the others.
+        self.priority = PriorityHints()
+        # Background jobs, journaled so unfinished ones resume after a restart.
+        self.jobs = JobManager(os.path.join(self.params.cache_path, "jobs.jsonl"))
+        # Jobs that can be started by request, and resumed, by kind.
+        self.__job_targets: Dict[str, Tuple[type, Callable]] = {
+            "run_prompt": (InferenceRequest, self.run_prompt),
+            "resume_evaluation": (InferenceRequest, self.resume_evaluation),
+            "compare_prompts": (PromptComparisonRequest, self.compare_prompts),
+            "refine_evaluation": (InferenceRequest, self.__refine_evaluation),
+        }
+        self.__setup_llm_pool()
         self.initial_setup()
 
+    def __setup_llm_pool(self):
+        """Start the LLM client pool shared by every LLM call of the backend."""
+        self.llm_cache: Optional[ResponseCache] = None
+        if self.params.llm_cache:
+            self.llm_cache = ResponseCache(
+                self.params.llm_cache_path or os.path.join(self.params.cache_path, "llm"),
+                max_size=self.params.llm_cache_max_size,
+                max_age=self.params.llm_cache_max_age,
+            )
+        rate_limits = dict(
+            rpm=self.params.llm_rpm,
+            tpm=self.params.llm_tpm,
+            limits=self.params.llm_model_limits,
+            initial_concurrency=self.params.llm_concurrency,
+            max_concurrency=self.params.llm_max_concurrency,
+        )
+        transport = HTTPTransport(
+            max_connections=self.params.llm_http_max_connections or None,
+            keepalive_expiry=self.params.llm_http_keepalive_expiry,
+            http2=self.params.llm_http2,
+            timeout=self.params.llm_http_timeout,
+            connect_timeout=self.params.llm_http_connect_timeout,
+        )
+        if self.params.llm_endpoints:
+            endpoints = [
+                APIEndpoint.from_config(config, rate_limits, transport)
+                for config in self.params.llm_endpoints
+            ]
+        else:
+            endpoints = [
+                APIEndpoint(rate_limiter=RateLimiter(**rate_limits), transport=transport)
+            ]
+        self.llm_rate_limiter = endpoints[0].rate_limiter
+        self.llm_telemetry = Telemetry()
+        self.llm_pool = OpenAIClientPool(
+            custom_api=self.params.llm_custom_api,
+            cache=self.llm_cache,
+            endpoints=endpoints,
+            telemetry=self.llm_telemetry,
+            scheduling=self.params.llm_scheduling,
+            lane_weights={
+                Lane[name.upper()]: weight
+                for name, weight in self.params.llm_lane_weights.items()
+            },
+        )
+        self.llm_batch_backend = self.params.llm_batch_backend or OpenAIBatchBackend()
+        # Partial output of interactive LLM calls, pushed to the UI as it arrives.
+        self.llm_streams = StreamBroker()
+        # Verdicts by requirement and output content, reused across prompt versions.
+        self.llm_evaluations = EvaluationStore(
+            os.path.join(self.params.cache_path, "evaluations")
+        )
+        # Output keys by output column and row, with the output they hash.
+        self.__output_key_cache: Dict[str, Dict] = {}
+        # Requirement key and output keys a score column was last checked against.
+        self.__checked_evaluations: Dict[str, Tuple[str, Dict]] = {}
+        # Evaluation payloads that failed, by score column, for resume_evaluation.
+        self.llm_dead_letters = DeadLetterStore(
+            os.path.join(self.params.cache_path, "dead_letters")
+        )
+
+    def dump_llm_telemetry(self) -> str:
+        """Write LLM request telemetry to a JSON file and return its path."""
+        path = self.params.llm_telemetry_path or os.path.join(
+            self.params.cache_path, "llm_telemetry.json"
+        )
+        self.llm_telemetry.dump(path)
+        return path
+
     def initial_setup(self) -> None:
         self.metadata = self.params.metadata
         self.functions = self.params.functions
@@ -245,6 +361,7 @@ class ZenoBackend(object):
         if not self.tests:
             self.done_running_inference = True
             self.status = "Done processing"
+            self.__resume_jobs()
             return
 
         for fn in self.predistill_functions.values():
@@ -261,31 +378,44 @@ class ZenoBackend(object):
                     )
                 )
 
-        self.__thread = threading.Thread(
-            target=asyncio.run, args=(self.__process(),), daemon=True
-        )
-        self.__thread.start()
+        # Rerun on every start, so not journaled.
+        self.jobs.submit("process", {}, lambda: asyncio.run(self.__process()), persist=False)
 
     async def __process(self):
-        self.status = "Running predistill functions"
-        print(self.status)
-        self.__predistill()
-
-        self.status = "Running inference"
-        print(self.status)
-        self.__inference(run_additional_inference=False)
-        self.done_running_inference = True
+        try:
+            self.status = "Running predistill functions"
+            print(self.status)
+            self.__predistill()
+
+            self.status = "Running inference"
+            print(self.status)
+            self.__inference(run_additional_inference=False)
+            self.done_running_inference = True
 
-        self.status = "Running evaluators"
-        print(self.status)
-        self.__run_evaluation(run_additional_inference=False)
+            self.status = "Running evaluators"
+            print(self.status)
+            self.__run_evaluation(run_additional_inference=False)
 
-        self.status = "Running postdistill functions"
-        print(self.status)
-        self.__postdistill()
+            self.status = "Running postdistill functions"
+            print(self.status)
+            self.__postdistill()
 
-        self.status = "Done processing"
-        print(self.status)
+            self.status = "Done processing"
+            print(self.status)
+        finally:
+            # Journaled jobs load the same columns, so they wait for processing.
+            self.__resume_jobs()
+
+    def __resume_jobs(self):
+        self.jobs.resume_unfinished({
+            kind: lambda request, request_type=request_type, target=target: target(request_type.model_validate(request))
+            for kind, (request_type, target) in self.__job_targets.items()
+        })
+
+    def start_job(self, kind: str, req: BaseModel) -> JobInfo:
+        """Run a backend method in the background as a job of the given kind."""
+        request_type, target = self.__job_targets[kind]
+        return self.jobs.submit(kind, req.model_dump(), partial(target, req))
 
     def __set_data_processing_returns(self, rets: List[List[DataProcessingReturn]]):
         """Update DataFrame with new columns from processing functions.
@@ -294,14 +424,61 @@ class ZenoBackend(object):
             rets (List[List[DataProcessingReturn]]): List of returns from decorated
             functions.
         """
-        for ret in rets:
-            for out in ret:
+        with self.__df_lock:
+            for ret in rets:
+                for out in ret:
+                    c_hash = str(out.column)
+                    if c_hash in self.df.columns and len(out.output) < len(self.df):
+                        # Only some rows, e.g. the ones an evaluation set, so
+                        # rows set by others meanwhile are kept.
+                        merged = self.df[c_hash].astype(object)
+                        merged.loc[out.output.index] = out.output.astype(object)
+                        self.df[c_hash] = merged
+                    else:
+                        self.df.loc[:, c_hash] = out.output
+                    self.df[c_hash] = self.df[c_hash].convert_dtypes()
+                    out.column.metadata_type = get_metadata_type(self.df[c_hash])
+                    if out.column not in self.complete_columns:
+                        self.complete_columns.append(out.column)
+
+    def __save_evaluations(self, outputs: List[DataProcessingReturn]):
+        """Merge rows of evaluation columns into self.df and save those rows.
+
+        Evaluations of the same requirement can run at the same time, e.g. a
+        refinement in the background and a run on rows the user picked. Each
+        only passes the rows it evaluated, so none undoes the others. The rows
+        are appended to the saved column, which is saved whole once more rows
+        were appended than it has, so saving stays linear in the rows saved.
+        """
+        with self.__df_lock:
+            self.__set_data_processing_returns([outputs])
+            for out in outputs:
                 c_hash = str(out.column)
-                self.df.loc[:, c_hash] = out.output
-                self.df[c_hash] = self.df[c_hash].convert_dtypes()
-                out.column.metadata_type = get_metadata_type(self.df[c_hash])
-                if out.column not in self.complete_columns:
-                    self.complete_columns.append(out.column)
+                path = Path(self.cache_path, c_hash + ".pickle")
+                appended = self.__appended_rows.get(c_hash, 0) + len(out.output)
+                if appended > len(self.df):
+                    save_series(self.df[c_hash], path)
+                    appended = 0
+                else:
+                    append_series(out.output, path)
+                self.__appended_rows[c_hash] = appended
+
+    def __run_jobs(self, tasks: List[Callable[[], List[DataProcessingReturn]]]):
+        """Run inference or evaluation tasks at the same time.
+
+        Tasks send their LLM calls to the shared client pool, so its rate limits
+        bound the total throughput rather than the number of tasks. The columns
+        of each task are set as soon as it finishes.
+        """
+        if len(tasks) <= 1 or self.params.parallel_jobs <= 1:
+            for task in tasks:
+                self.__set_data_processing_returns([task()])
+            return
+        with ThreadPoolExecutor(max_workers=self.params.parallel_jobs) as executor:
+            # In the context of the caller, to report to its background job.
+            futures = [executor.submit(contextvars.copy_context().run, task) for task in tasks]
+            for future in as_completed(futures):
+                self.__set_data_processing_returns([future.result()])
 
     def __predistill(self) -> None:
         """Run distilling functions not dependent on model outputs."""
@@ -379,8 +556,9 @@ class ZenoBackend(object):
             model_save_path = Path(self.cache_path, model_hash + ".pickle")
             embedding_save_path = Path(self.cache_path, embedding_hash + ".pickle")
 
-            load_series(self.df, model_column, model_save_path)
-            load_series(self.df, embedding_column, embedding_save_path)
+            with self.__df_lock:
+                load_series(self.df, model_column, model_save_path)
+                load_series(self.df, embedding_column, embedding_save_path)
 
             if self.df[model_hash].isna().any() and run_additional_inference:
                 models_to_run.append(req)
@@ -423,24 +601,27 @@ class ZenoBackend(object):
                         [self.batch_size] * len(models_to_run),
                         range(len(models_to_run)),
                     )
+                self.__set_data_processing_returns(inference_outputs)
             else:
-                inference_outputs = []
+                tasks = []
                 for i, req in enumerate(models_to_run):
                     (model_name, prompt_id, tag_ids) = (req.model, req.prompt_id, req.filter_ids)
-                    inference_outputs.append(
-                        run_inference(
-                            self.predict_function,
-                            self.zeno_options,
-                            model_name,
-                            self.prompts[prompt_id],
-                            self.cache_path,
-                            self.df,
-                            self.batch_size,
-                            i,
-                            tag_ids,
-                        )
-                    )
-            self.__set_data_processing_returns(inference_outputs)
+                    tasks.append(partial(
+                        run_inference,
+                        self.predict_function,
+                        self.zeno_options,
+                        model_name,
+                        self.prompts[prompt_id],
+                        self.cache_path,
+                        # A view of its own, as other tasks add columns meanwhile.
+                        self.df.copy(deep=False),
+                        self.batch_size,
+                        i,
+                        tag_ids,
+                        chunk_size=self.params.inference_chunk_size,
+                        chunk_seconds=self.params.inference_chunk_seconds,
+                    ))
+                self.__run_jobs(tasks)
 
     def __postdistill(self) -> None:
         """Run distill functions dependent on model outputs."""
@@ -505,6 +686,132 @@ class ZenoBackend(object):
             self.__set_data_processing_returns(post_outputs)
 
     
+    def __output_keys(self, model_hash) -> Dict:
+        """Output keys of the rows with an output, hashing only outputs new since the last call.
+
+        Rows without an output have no key, as they share no verdict.
+        """
+        cache = self.__output_key_cache.setdefault(model_hash, {})
+        keys = {}
+        for i, output in self.df[model_hash].dropna().items():
+            cached = cache.get(i)
+            if cached is None or not (cached[0] is output or (isinstance(output, str) and cached[0] == output)):
+                cached = cache[i] = (output, output_key(output))
+            keys[i] = cached[1]
+        return keys
+
+    def __load_stored_evaluations(self, model_name, prompt_id, requirement_id) -> None:
+        """Set the score and rationale columns of a requirement from the evaluation store.
+
+        Rows whose output or requirement changed since their evaluation become
+        missing, so only they are evaluated again. Scores saved before the store
+        existed are taken over the first time. After the first call, only rows
+        without a score or with a new output are looked up.
+        """
+        score_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{requirement_id}", model=model_name, prompt_id=prompt_id
+        ))
+        rationale_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{requirement_id}Rationale", model=model_name, prompt_id=prompt_id
+        ))
+        model_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.OUTPUT, name="output", model=model_name, prompt_id=prompt_id
+        ))
+        if model_hash not in self.df.columns:
+            return
+
+        req_key = requirement_key(self.prompts[prompt_id].requirements[requirement_id], model_name)
+        with self.__df_lock:
+            keys = self.__output_keys(model_hash)
+            scores = self.df[score_hash]
+            rationales = self.df[rationale_hash]
+            if not self.llm_evaluations.adopted(score_hash):
+                self.llm_evaluations.adopt(score_hash, req_key, {
+                    keys[i]: (bool(scores[i]), rationales[i] if pd.notna(rationales[i]) else '')
+                    for i in scores.index[scores.notna()] if i in keys
+                })
+            checked = self.__checked_evaluations.get(score_hash)
+            if checked is not None and checked[0] == req_key:
+                missing = scores.isna()
+                rows = [i for i in scores.index if missing[i] or keys.get(i) != checked[1].get(i)]
+            else:
+                rows = list(scores.index)
+            self.__checked_evaluations[score_hash] = (req_key, keys)
+
+            stored = self.llm_evaluations.get(req_key)
+            changed = {}
+            for i in rows:
+                found = stored.get(keys[i]) if i in keys else None
+                old = None if pd.isna(scores[i]) else (bool(scores[i]), rationales[i])
+                if found != old:
+                    changed[i] = found
+            if len(changed) == 0:
+                return
+            scores = scores.astype(object)
+            rationales = rationales.astype(object)
+            for i, found in changed.items():
+                scores[i] = found[0] if found else None
+                rationales[i] = found[1] if found else None
+            self.df[score_hash] = scores
+            self.df[rationale_hash] = rationales
+            # Keep the saved columns in line with the store.
+            save_series(self.df[score_hash], Path(self.cache_path, score_hash + ".pickle"))
+            save_series(self.df[rationale_hash], Path(self.cache_path, rationale_hash + ".pickle"))
+
+    def __sample_order(self) -> List:
+        """Order in which sampled evaluation covers the rows, the same for every prompt."""
+        strata = None
+        if self.params.evaluation_sample_strata != "":
+            strata = self.df[self.params.evaluation_sample_strata]
+        return stratified_order(self.df.index, strata)
+
+    def __sample_ids(self, model_name, prompt_id, requirement_id, size, advance=False, exclude=()) -> List:
+        """Unevaluated rows among the first `size` rows of the sample order.
+
+        With advance, the next `size` unevaluated rows in sample order instead.
+        """
+        score_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{requirement_id}", model=model_name, prompt_id=prompt_id
+        ))
+        with self.__df_lock:
+            missing = set(self.df.index[self.df[score_hash].isna()])
+        order = self.__sample_order()
+        if not advance:
+            return [i for i in order[:size] if i in missing]
+        return [i for i in order if i in missing and i not in exclude][:size]
+
+    def __start_refinement(self, model_name, prompt_id, requirement_id):
+        """Refine a sampled evaluation in a job of its own, one per score column."""
+        self.start_job("refine_evaluation", InferenceRequest(model=model_name, prompt_id=prompt_id, requirement_id=requirement_id))
+
+    def __refine_evaluation(self, req: InferenceRequest):
+        """Evaluate more sample rows until the pass rate is precise enough."""
+        (model_name, prompt_id, requirement_id) = (req.model, req.prompt_id, req.requirement_id)
+        score_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{requirement_id}", model=model_name, prompt_id=prompt_id
+        ))
+        if score_hash not in self.df.columns:
+            # Resumed after a restart, before anything loaded the columns.
+            self.__inference([req], run_additional_inference=False)
+            self.__run_evaluation([req], run_additional_inference=False)
+        # Rows tried before, so rows that keep failing don't stall the loop.
+        tried = set()
+        while True:
+            jobs.checkpoint()
+            with self.__df_lock:
+                scores = self.df[score_hash].copy()
+            evaluated = scores.dropna().astype(bool)
+            low, high = proportion_interval(int(evaluated.sum()), len(evaluated), len(scores))
+            if (high - low) / 2 <= self.params.evaluation_target_ci:
+                break
+            ids = self.__sample_ids(model_name, prompt_id, requirement_id, self.params.evaluation_sample_size, advance=True, exclude=tried)
+            if len(ids) == 0:
+                break
+            tried.update(ids)
+            self.__set_data_processing_returns([
+                self.evaluate_requirement(model_name, prompt_id, requirement_id, FilterIds(ids=ids), lane=Lane.BACKGROUND)
+            ])
+
     def __run_evaluation(self, requests: List[InferenceRequest]=[], run_additional_inference=True) -> None:
         
         evaluations_to_run = []
@@ -517,7 +824,7 @@ class ZenoBackend(object):
             ]
         
         for req in requests:
-            (model_name, prompt_id, requirement_id, tag_ids) = (req.model, req.prompt_id, req.requirement_id, req.filter_ids)
+            (model_name, prompt_id, requirement_id) = (req.model, req.prompt_id, req.requirement_id)
 
             # print(f"Running evaluation for model {model_name} on prompt {prompt_id} and requirement {requirement_id}")
             
@@ -530,8 +837,10 @@ class ZenoBackend(object):
             score_hash = str(score_col)
             rationale_hash = str(rationale_col)
 
-            load_series(self.df, score_col, Path(self.cache_path, score_hash + ".pickle"))
-            load_series(self.df, rationale_col, Path(self.cache_path, rationale_hash + ".pickle"))
+            with self.__df_lock:
+                load_series(self.df, score_col, Path(self.cache_path, score_hash + ".pickle"))
+                load_series(self.df, rationale_col, Path(self.cache_path, rationale_hash + ".pickle"))
+                self.__load_stored_evaluations(model_name, prompt_id, requirement_id)
 
             if (self.df[score_hash].isna().any() or self.df[rationale_hash].isna().any()) and run_additional_inference:
                 evaluations_to_run.append(req)
@@ -546,16 +855,52 @@ class ZenoBackend(object):
                 if rationale_col not in self.complete_columns:
                     self.complete_columns.append(rationale_col)
 
+        # Evaluate a sample now and refine it in the background once it is done.
+        to_refine = []
+        if self.params.evaluation_sample_size > 0:
+            sampled = []
+            for req in evaluations_to_run:
+                if req.filter_ids is not None:
+                    sampled.append(req)
+                    continue
+                to_refine.append(req)
+                ids = self.__sample_ids(req.model, req.prompt_id, req.requirement_id, self.params.evaluation_sample_size)
+                if len(ids) > 0:
+                    sampled.append(req.copy(update={"filter_ids": FilterIds(ids=ids)}))
+            evaluations_to_run = sampled
+
         if len(evaluations_to_run) > 0:
-            inference_outputs = []
-            for i, req in enumerate(evaluations_to_run):
+            self.__run_jobs(self.__evaluation_tasks(evaluations_to_run))
+
+        for req in to_refine:
+            self.__start_refinement(req.model, req.prompt_id, req.requirement_id)
+
+    def __evaluation_tasks(self, requests: List[InferenceRequest]) -> List[Callable[[], List[DataProcessingReturn]]]:
+        """Tasks evaluating the requirements of the requests, for __run_jobs."""
+        tasks = []
+        if self.params.evaluation_combine_requirements:
+            # One call per row judges every requirement of the same output.
+            groups: Dict[tuple, List[InferenceRequest]] = {}
+            for req in requests:
+                if self.prompts[req.prompt_id].requirements[req.requirement_id].evaluator is not None:
+                    # Code evaluators don't need the LLM.
+                    tasks.append(partial(self.evaluate_requirement, req.model, req.prompt_id, req.requirement_id, req.filter_ids))
+                    continue
+                ids = tuple(req.filter_ids.ids) if req.filter_ids is not None else None
+                groups.setdefault((req.model, req.prompt_id, ids), []).append(req)
+            for group in groups.values():
+                req = group[0]
+                tasks.append(
+                    partial(self.evaluate_requirements, req.model, req.prompt_id, [r.requirement_id for r in group], req.filter_ids)
+                )
+        else:
+            for req in requests:
                 (model_name, prompt_id, requirement_id, tag_ids) = (req.model, req.prompt_id, req.requirement_id, req.filter_ids)
 
-                inference_outputs.append(
-                    self.evaluate_requirement(model_name, prompt_id, requirement_id, tag_ids)
+                tasks.append(
+                    partial(self.evaluate_requirement, model_name, prompt_id, requirement_id, tag_ids)
                 )
-
-            self.__set_data_processing_returns(inference_outputs)
+        return tasks
 
     def get_metrics_for_slices(
         self,
@@ -581,7 +926,18 @@ class ZenoBackend(object):
                 metric = self.calculate_metric(
                     filt_df, metric_key.model, metric_key.metric, metric_key.prompt_id, metric_key.requirement_id
                 )
-                return_metrics.append(GroupMetric(metric=metric, size=filt_df.shape[0]))
+                group_metric = GroupMetric(metric=metric, size=filt_df.shape[0])
+                score_hash = str(ZenoColumn(
+                    column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{metric_key.requirement_id}", model=metric_key.model, prompt_id=metric_key.prompt_id
+                ))
+                if metric is not None and score_hash in filt_df.columns:
+                    # How precise the pass rate is, as only a sample may be evaluated.
+                    evaluated = filt_df[score_hash].dropna().astype(bool)
+                    group_metric.evaluated_size = len(evaluated)
+                    group_metric.ci_low, group_metric.ci_high = proportion_interval(
+                        int(evaluated.sum()), len(evaluated), filt_df.shape[0]
+                    )
+                return_metrics.append(group_metric)
         return return_metrics
 
     def get_metrics_for_slices_and_tags(
@@ -692,6 +1048,12 @@ class ZenoBackend(object):
         with open(os.path.join(self.cache_path, "folders.pickle"), "wb") as f:
             pickle.dump(self.folders, f)
 
+    def __trusted_evaluators(self) -> List[CodeEvaluator]:
+        """Evaluators of the project config, the only ones allowed to run code."""
+        return [
+            r.evaluator for p in self.params.prompts.values() for r in p.requirements.values() if r.evaluator is not None
+        ]
+
     def get_new_prompt_version(self,):
         prompt_versions = list(self.prompts.keys())
         prompt_versions = [int(x[1:]) for x in prompt_versions]
@@ -700,6 +1062,8 @@ class ZenoBackend(object):
     def create_new_prompt(self, req: Prompt):
         if not self.editable:
             return
+        # Code evaluators only come from the project config.
+        reject_untrusted_code(req.requirements.values(), self.__trusted_evaluators())
         new_version = self.get_new_prompt_version()
         req.version = new_version
         self.prompts[new_version] = req
@@ -725,15 +1089,244 @@ class ZenoBackend(object):
             pickle.dump(self.prompts, f)
         return self.prompts[new_version]
 
+    def resume_evaluation(self, req: InferenceRequest):
+        """Evaluate only the rows of a prompt that are missing or failed before.
+
+        Runs every requirement of the prompt, or only req.requirement_id, on
+        req.filter_ids (all rows if unset).
+        """
+        requirement_ids = (
+            [req.requirement_id]
+            if req.requirement_id is not None
+            else list(self.prompts[req.prompt_id].requirements.keys())
+        )
+        tasks = []
+        for requirement_id in requirement_ids:
+            score_col = ZenoColumn(
+                column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{requirement_id}", model=req.model, prompt_id=req.prompt_id
+            )
+            if str(score_col) not in self.df.columns:
+                # Never evaluated, run_prompt sets the columns up.
+                continue
+            missing = self.df[str(score_col)].isna()
+            if req.filter_ids is not None:
+                missing = missing & self.df.index.isin(req.filter_ids.ids)
+            ids = self.df.index[missing].tolist()
+            if len(ids) == 0:
+                self.llm_dead_letters.discard(str(score_col))
+                continue
+            tasks.append(
+                partial(self.evaluate_requirement, req.model, req.prompt_id, requirement_id, FilterIds(ids=ids))
+            )
+        self.__run_jobs(tasks)
+
     def run_prompt(self, req: InferenceRequest):
-        self.__inference([req])
         requests_with_requirement = []
         for requirement_id in self.prompts[req.prompt_id].requirements.keys():
             innerdict = req.dict()
             innerdict.update({"requirement_id": requirement_id})
             requests_with_requirement.append(InferenceRequest(**innerdict))
+        if self.params.pipeline_chunk_size > 0:
+            self.__run_pipeline(req, requests_with_requirement)
+        else:
+            self.__inference([req])
+        # Rows with earlier outputs, and the rest of a sampled evaluation.
         self.__run_evaluation(requests_with_requirement)
-    
+
+    def __run_pipeline(self, req: InferenceRequest, evaluations: List[InferenceRequest]):
+        """Infer the missing outputs of a prompt in chunks, evaluating each chunk once it is inferred.
+
+        Evaluating a chunk overlaps with inferring the next one, so the first
+        scores arrive after one chunk instead of the whole dataset. Chunks follow
+        the sample order, after the rows the user is looking at. With
+        evaluation_sample_size set, only rows of the sample are evaluated here.
+        Each chunk only appends its own rows to the saved columns, which are
+        saved whole once at the end.
+        """
+        model_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.OUTPUT, name="output", model=req.model, prompt_id=req.prompt_id
+        ))
+        # Load what was inferred and evaluated before, and take over stored
+        # evaluations of the outputs there are.
+        self.__inference([req], run_additional_inference=False)
+        self.__run_evaluation(evaluations, run_additional_inference=False)
+        if self.predict_function is None:
+            return
+
+        with self.__df_lock:
+            missing = set(self.df.index[self.df[model_hash].isna()])
+        if req.filter_ids is not None:
+            missing &= set(req.filter_ids.ids)
+        if len(missing) == 0:
+            return
+        order = self.__sample_order()
+        sample = set(order[:self.params.evaluation_sample_size]) if self.params.evaluation_sample_size > 0 else None
+        # Rows on screen first, the next chunk is taken as the user moves on.
+        order = self.priority.ordered([i for i in order if i in missing])
+
+        jobs.add_total(len(missing))
+        jobs.checkpoint()
+        prompt = self.prompts[req.prompt_id]
+        model_fn, options = load_model_fn(self.predict_function, self.zeno_options, req.model, prompt, self.cache_path)
+        size = self.params.pipeline_chunk_size
+        inferred: List[ZenoColumn] = []
+        # One chunk is evaluated at a time, as every chunk sets the same score columns.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            evaluated = []
+            try:
+                while True:
+                    jobs.checkpoint()
+                    chunk = list(itertools.islice(order, size))
+                    if len(chunk) == 0:
+                        break
+                    for column in self.__infer_rows(model_fn, options, req.model, prompt, chunk):
+                        if column not in inferred:
+                            inferred.append(column)
+                    if sample is not None:
+                        chunk = [i for i in chunk if i in sample]
+                    if len(chunk) == 0:
+                        continue
+                    evaluated.append(executor.submit(
+                        contextvars.copy_context().run,
+                        self.__run_jobs,
+                        self.__evaluation_tasks([e.copy(update={"filter_ids": FilterIds(ids=chunk)}) for e in evaluations]),
+                    ))
+            finally:
+                self.__save_columns(inferred)
+            for future in evaluated:
+                future.result()
+
+    def __infer_rows(self, model_fn, options, model_name, prompt: Prompt, ids) -> List[ZenoColumn]:
+        """Infer some rows with a model function from load_model_fn.
+
+        The rows are set in self.df and appended to the saved columns. Returns
+        the columns, for __save_columns to save whole once all rows are done.
+        """
+        with self.__df_lock:
+            rows = self.df.loc[ids]
+        outputs = infer_rows(model_fn, options, model_name, prompt, rows)
+        # The output last, as rows with an output are skipped on a rerun.
+        for out in reversed(outputs):
+            append_series(out.output, Path(self.cache_path, str(out.column) + ".pickle"))
+        self.__set_data_processing_returns([outputs])
+        jobs.advance(len(ids))
+        return [out.column for out in outputs]
+
+    def __save_columns(self, columns: List[ZenoColumn]):
+        with self.__df_lock:
+            for column in columns:
+                save_series(self.df[str(column)], Path(self.cache_path, str(column) + ".pickle"))
+
+    def compare_prompts(self, req: PromptComparisonRequest) -> PromptComparison:
+        """Run two prompt versions on the same rows until their difference is decided.
+
+        Rows are taken in sample order, comparison_batch_size at a time. Each batch
+        is inferred and evaluated for both prompts wherever results are missing.
+        Then a paired sequential test runs on the pass rates of every
+        requirement the prompts share. The comparison stops once every
+        requirement is decided, or as soon as the candidate is worse on one.
+        """
+        requirement_ids = [
+            r for r in self.prompts[req.candidate_prompt_id].requirements.keys()
+            if r in self.prompts[req.baseline_prompt_id].requirements
+        ]
+        prompt_ids = [req.baseline_prompt_id, req.candidate_prompt_id]
+        order = self.__sample_order()
+        batch_size = max(1, self.params.comparison_batch_size)
+
+        def column(name, prompt_id, column_type=ZenoColumnType.POSTDISTILL):
+            return str(ZenoColumn(column_type=column_type, name=name, model=req.model, prompt_id=prompt_id))
+
+        def missing(col, ids):
+            with self.__df_lock:
+                values = self.df.loc[ids, col]
+            return list(values.index[values.isna()])
+
+        # Load what was inferred and evaluated before, once. Batches then
+        # only infer and evaluate their own rows.
+        for prompt_id in prompt_ids:
+            self.__inference([InferenceRequest(model=req.model, prompt_id=prompt_id)], run_additional_inference=False)
+            self.__run_evaluation([
+                InferenceRequest(model=req.model, prompt_id=prompt_id, requirement_id=r) for r in requirement_ids
+            ], run_additional_inference=False)
+
+        rows = 0
+        # Per requirement, rows evaluated with both prompts, passes of each, and
+        # rows only the candidate or only the baseline passes.
+        totals = {r: Counter() for r in requirement_ids}
+        decisions = {r: sequential.UNDECIDED for r in requirement_ids}
+        comparisons: List[RequirementComparison] = []
+        models = {}
+        inferred: List[ZenoColumn] = []
+        try:
+            while rows < len(order):
+                jobs.checkpoint()
+                batch = order[rows:rows + batch_size]
+                rows += len(batch)
+                for prompt_id in prompt_ids:
+                    ids = missing(column("output", prompt_id, ZenoColumnType.OUTPUT), batch)
+                    if len(ids) == 0 or self.predict_function is None:
+                        continue
+                    jobs.add_total(len(ids))
+                    prompt = self.prompts[prompt_id]
+                    if prompt_id not in models:
+                        models[prompt_id] = load_model_fn(self.predict_function, self.zeno_options, req.model, prompt, self.cache_path)
+                    for c in self.__infer_rows(*models[prompt_id], req.model, prompt, ids):
+                        if c not in inferred:
+                            inferred.append(c)
+                evaluations = []
+                for prompt_id in prompt_ids:
+                    for r in requirement_ids:
+                        ids = missing(column(f"evalR{r}", prompt_id), batch)
+                        if len(ids) > 0:
+                            evaluations.append(InferenceRequest(model=req.model, prompt_id=prompt_id, requirement_id=r, filter_ids=FilterIds(ids=ids)))
+                if len(evaluations) > 0:
+                    self.__run_jobs(self.__evaluation_tasks(evaluations))
+
+                comparisons = []
+                with self.__df_lock:
+                    for r in requirement_ids:
+                        scores = self.df.loc[batch, [column(f"evalR{r}", p) for p in prompt_ids]].dropna().astype(bool)
+                        baseline, candidate = scores.iloc[:, 0], scores.iloc[:, 1]
+                        totals[r].update({
+                            "rows": len(scores),
+                            "baseline": int(baseline.sum()),
+                            "candidate": int(candidate.sum()),
+                            "better": int((candidate & ~baseline).sum()),
+                            "worse": int((baseline & ~candidate).sum()),
+                        })
+                        decisions[r] = sequential.paired_sequential_test(
+                            totals[r]["better"],
+                            totals[r]["worse"],
+                            self.params.comparison_effect,
+                            self.params.comparison_alpha,
+                            self.params.comparison_beta,
+                            rows=totals[r]["rows"],
+                            margin=self.params.comparison_margin,
+                            population=len(order),
+                        )
+                        comparisons.append(RequirementComparison(
+                            requirement_id=r,
+                            rows=totals[r]["rows"],
+                            baseline_passes=totals[r]["baseline"],
+                            candidate_passes=totals[r]["candidate"],
+                            decision=decisions[r],
+                        ))
+                if sequential.WORSE in decisions.values() or sequential.UNDECIDED not in decisions.values():
+                    break
+        finally:
+            self.__save_columns(inferred)
+
+        return PromptComparison(
+            model=req.model,
+            baseline_prompt_id=req.baseline_prompt_id,
+            candidate_prompt_id=req.candidate_prompt_id,
+            rows=rows,
+            total_rows=len(order),
+            stopped_early=rows < len(order),
+            requirements=comparisons,
+        )
+
     def find_best_match(self, prompt, snippet):
         normalized_snippet = " ".join(snippet.split())
         prompt_length = len(prompt)
@@ -790,7 +1383,7 @@ class ZenoBackend(object):
             'response_format': {"type": "json_object"}  
         }
 
-        client = OpenAIMultiClient()
+        client = self.llm_pool.client(caller="extract_requirements", lane=Lane.INTERACTIVE)
 
         client.request(
             data=payload,
@@ -852,7 +1445,7 @@ class ZenoBackend(object):
             'response_format': {"type": "json_object"}  
         }
 
-        client = OpenAIMultiClient()
+        client = self.llm_pool.client(caller="update_req", lane=Lane.INTERACTIVE)
 
         client.request(
             data=payload,
@@ -908,7 +1501,7 @@ class ZenoBackend(object):
             'response_format': {"type": "json_object"}  
         }
 
-        client = OpenAIMultiClient()
+        client = self.llm_pool.client(caller="optimize_requirement", lane=Lane.INTERACTIVE)
 
         client.request(
             data=payload,
@@ -972,11 +1565,14 @@ class ZenoBackend(object):
         }
 
 
-        client = OpenAIMultiClient()
+        client = self.llm_pool.client(caller="compile_prompt", lane=Lane.INTERACTIVE)
+        stream = self.llm_streams.open("compile_prompt", prompt_id)
 
         client.request(
             data=payload,
-            endpoint="chat.completions"
+            endpoint="chat.completions",
+            on_delta=stream.send,
+            callback=lambda _: stream.close()
         )
 
         for response in client:
@@ -1006,7 +1602,7 @@ class ZenoBackend(object):
         self.prompts[prompt_id].text = prompt
 
 
-    def evaluate_requirement(self, model_name, prompt_id, requirement_id, to_predict_indices: Optional[FilterIds] = None,):
+    def evaluate_requirement(self, model_name, prompt_id, requirement_id, to_predict_indices: Optional[FilterIds] = None, lane: int = Lane.FOREGROUND):
         ''' Use LLM to evaluate prompt outputs based on requirements
 
         Input: model_name, prompt_id, requirement_id, to_predict_indices
@@ -1030,13 +1626,15 @@ class ZenoBackend(object):
         )
         score_hash = str(score_col_obj)
         rationale_hash = str(rationale_col_obj)
-        score_col = self.df[score_hash].copy()
-        rationale_col = self.df[rationale_hash].copy()
+        with self.__df_lock:
+            score_col = self.df[score_hash].copy()
+            rationale_col = self.df[rationale_hash].copy()
 
         if to_predict_indices is None:
             to_predict_indices = score_col.loc[pd.isna(score_col)].index
         else:
             to_predict_indices = pd.Index(to_predict_indices.ids)
+        jobs.add_total(len(to_predict_indices))
 
         requirement = self.prompts[prompt_id].requirements[requirement_id]
 
@@ -1044,32 +1642,75 @@ class ZenoBackend(object):
             column_type=ZenoColumnType.OUTPUT, name="output", model=model_name, prompt_id=prompt_id
         )
         model_hash = str(model_col_obj)
-        model_col = self.df[model_hash].copy()
-
-        client = OpenAIMultiClient(endpoint="chats", data_template={"model": model_name})
-
-        def chat_completion(indices):
-            for i in indices:
-                model_ouput = model_col[i]
-                api_prompt = REQUIREMENT_EVALUATION_PROMPT.format(prompt=self.prompts[prompt_id].text, requirement = requirement.description,evaluation_method=requirement.evaluation_method, modelOutput=model_ouput)
+        with self.__df_lock:
+            model_col = self.df[model_hash].copy()
+
+        # Rows whose requirement and output were evaluated before, e.g. for
+        # another prompt version, reuse that verdict.
+        req_key = requirement_key(requirement, model_name)
+        # Rows without an output have no key, so none shares their verdict.
+        output_keys = model_col.loc[list(to_predict_indices)].dropna().map(output_key).to_dict()
+        stored = self.llm_evaluations.get(req_key)
+        new_evaluations = {}
+        evaluated = []
+        for i in to_predict_indices:
+            if output_keys.get(i) in stored:
+                score_col[i], rationale_col[i] = stored[output_keys[i]]
+                evaluated.append(i)
+        jobs.advance(len(evaluated))
+        to_predict_indices = [i for i in to_predict_indices if output_keys.get(i) not in stored]
+
+        def new_client():
+            if self.params.llm_batch:
+                return BatchClient(
+                    self.llm_batch_backend,
+                    os.path.join(self.cache_path, "batches"),
+                    endpoint="chats",
+                    data_template={"model": model_name},
+                    poll_interval=self.params.llm_batch_poll_interval,
+                    cache=self.llm_cache,
+                )
+            client = self.llm_pool.client(caller="evaluate_requirement", lane=lane, endpoint="chats", data_template={"model": model_name})
+            jobs.track(client)
+            return client
+
+        # Shared by every row, so it is sent first as a cacheable prefix.
+        api_prompt = REQUIREMENT_EVALUATION_PROMPT.format(prompt=self.prompts[prompt_id].text, requirement = requirement.description,evaluation_method=requirement.evaluation_method, examples=examples_to_str(requirement.examples))
+
+        def output_prompt(nums):
+            if len(nums) == 1:
+                return REQUIREMENT_EVALUATION_OUTPUT_PROMPT.format(modelOutput=model_col[nums[0]])
+            return REQUIREMENT_EVALUATION_PACKED_PROMPT.format(modelOutputs="\n".join(
+                REQUIREMENT_EVALUATION_PACKED_OUTPUT_PROMPT.format(id=i, modelOutput=model_col[i]) for i in nums
+            ))
+
+        def chat_completion(client, packs):
+            for nums in self.priority.ordered(packs, key=lambda nums: nums[0]):
                 client.request(
                     data={
                         "messages": [
                             {"role": "system", "content": 'You are a helpful assistant. Please return the response as valid JSON.'},
-                            {"role": "user", "content": api_prompt}
+                            {"role": "user", "content": api_prompt},
+                            {"role": "user", "content": output_prompt(nums)}
                         ],
-                        'response_format': {"type": "json_object"}  
-                    }, metadata={'num': i}, endpoint = "chat.completions"
+                        'response_format': {"type": "json_object"}
+                    }, metadata={'nums': nums}, endpoint = "chat.completions"
                 )
 
-        client.run_request_function(chat_completion,to_predict_indices)
-        count = 0
-        for result in client:
-            num = result.metadata['num']
-            response = result.response.choices[0].message.content
+        # Rows evaluated since the last flush.
+        unsaved = list(evaluated)
 
-            evaluation_res = json.loads(response)
+        def flush():
+            self.llm_evaluations.put(req_key, new_evaluations)
+            new_evaluations.clear()
+            # Show the rows done so far, the ones on screen come first.
+            self.__save_evaluations([
+                DataProcessingReturn(column=score_col_obj, output=score_col.loc[unsaved]),
+                DataProcessingReturn(column=rationale_col_obj, output=rationale_col.loc[unsaved])
+            ])
+            unsaved.clear()
 
+        def set_result(num, evaluation_res):
             str_score = int(evaluation_res.get('pass/fail', '0'))
             if str_score == 1:
                 score_col[num] = True
@@ -1077,18 +1718,275 @@ class ZenoBackend(object):
                 score_col[num] = False
 
             rationale_col[num] = evaluation_res.get('rationale', '')
-            count += 1
-            if count == len(to_predict_indices):
-                break
-
-        score_col.to_pickle(os.path.join(self.cache_path, score_hash + ".pickle"))
-        rationale_col.to_pickle(os.path.join(self.cache_path, rationale_hash + ".pickle"))
-                        
+            if num in output_keys:
+                new_evaluations[output_keys[num]] = (bool(score_col[num]), rationale_col[num])
+            evaluated.append(num)
+            unsaved.append(num)
+            jobs.advance()
+            if len(evaluated) % self.params.evaluation_flush_every == 0:
+                flush()
+
+        def fail(result, num, error):
+            # Leave the row unevaluated so resume_evaluation retries it.
+            print(f"Failed to evaluate row {num} for requirement {requirement_id}: {error}")
+            self.llm_dead_letters.add(score_hash, result, str(error), caller="evaluate_requirement", num=num)
+            jobs.advance()
+
+        def run(packs):
+            """Evaluate the packs of rows, returning rows of packs to retry one by one.
+
+            Rows of single-row packs are not retried, they are dead-lettered.
+            """
+            if len(packs) == 0:
+                return []
+            jobs.checkpoint()
+            client = new_client()
+            client.run_request_function(chat_completion, client, packs)
+            retry = []
+            count = 0
+            for result in client:
+                jobs.checkpoint()
+                nums = result.metadata['nums']
+                count += 1
+                try:
+                    if result.failed:
+                        raise RuntimeError(result.error or "LLM request failed")
+                    response = result.response.choices[0].message.content
+                    if len(nums) == 1:
+                        evaluation_res = {nums[0]: json.loads(response)}
+                        int(evaluation_res[nums[0]].get('pass/fail', '0'))
+                    else:
+                        evaluation_res = parse_packed(response, nums)
+                except Exception as e:
+                    if not result.failed and self.llm_cache is not None:
+                        # Don't replay an unusable response on resume.
+                        self.llm_cache.delete(payload_key(result.endpoint, result.data))
+                    if len(nums) > 1:
+                        retry.extend(nums)
+                    else:
+                        fail(result, nums[0], e)
+                else:
+                    for num in nums:
+                        error = f"Response is missing row {num}"
+                        if num in evaluation_res:
+                            try:
+                                set_result(num, evaluation_res[num])
+                                continue
+                            except (AttributeError, TypeError, ValueError) as e:
+                                error = f"Invalid result for row {num}: {e!r}"
+                        if len(nums) > 1:
+                            retry.append(num)
+                        else:
+                            fail(result, num, error)
+                if count == len(packs):
+                    break
+            return retry
+
+        if requirement.evaluator is not None:
+            # Deterministic checks decide rows without the LLM, which only gets
+            # the undecided rows if the evaluator falls back to it. Prompts are
+            # also changed by requirement updates and loaded from the cache, so
+            # code is checked against the config again before it runs.
+            reject_untrusted_code([requirement], self.__trusted_evaluators())
+            scores, rationales = run_code_evaluator(requirement.evaluator, model_col.loc[to_predict_indices])
+            decided = scores.index[scores.notna()]
+            score_col.loc[decided] = scores.loc[decided]
+            rationale_col.loc[decided] = rationales.loc[decided]
+            new_evaluations.update({output_keys[i]: (bool(scores[i]), rationales[i]) for i in decided if i in output_keys})
+            evaluated.extend(decided)
+            unsaved.extend(decided)
+            to_predict_indices = list(scores.index[scores.isna()]) if requirement.evaluator.llm_fallback else []
+            jobs.advance(len(scores) - len(to_predict_indices))
+
+        # Pack several rows into one request when a token budget is set, and
+        # fall back to one request per row for rows a packed response misses.
+        # Packs of rows on screen are sent first.
+        to_predict_indices = self.priority.sort(to_predict_indices)
+        if self.params.evaluation_pack_tokens > 0:
+            packs = pack_rows(to_predict_indices, [model_col[i] for i in to_predict_indices], self.params.evaluation_pack_tokens, self.params.evaluation_pack_max_rows)
+        else:
+            packs = [[i] for i in to_predict_indices]
+        try:
+            retry = run(packs)
+            run([[i] for i in retry])
+        except jobs.JobCancelledError:
+            # Keep what was evaluated before the job was cancelled.
+            flush()
+            raise
+
+        flush()
+        self.llm_dead_letters.discard(score_hash, evaluated)
+
+        # Only the rows evaluated here, see __save_evaluations.
         return [
-            DataProcessingReturn(column=score_col_obj, output=score_col),
-            DataProcessingReturn(column=rationale_col_obj, output=rationale_col)
+            DataProcessingReturn(column=score_col_obj, output=score_col.loc[evaluated]),
+            DataProcessingReturn(column=rationale_col_obj, output=rationale_col.loc[evaluated])
         ]
 
+    def evaluate_requirements(self, model_name, prompt_id, requirement_ids: List[str], to_predict_indices: Optional[FilterIds] = None, lane: int = Lane.FOREGROUND) -> List[DataProcessingReturn]:
+        ''' Use LLM to evaluate prompt outputs on several requirements at once
+
+        Each row is judged on every requirement in one call, and the results are
+        split into the evalR{id} score and rationale columns of each requirement.
+        Requirements a response misses are evaluated with evaluate_requirement.
+
+        Input: model_name, prompt_id, requirement_ids, to_predict_indices
+        Output: score and rationale DataProcessingReturns of every requirement
+        '''
+        requirements = [self.prompts[prompt_id].requirements[r] for r in requirement_ids]
+        score_objs = {}
+        rationale_objs = {}
+        score_cols = {}
+        rationale_cols = {}
+        # Rows whose result is written, per requirement.
+        targets = {}
+        for r in requirement_ids:
+            score_objs[r] = ZenoColumn(
+                column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{r}", model=model_name, prompt_id=prompt_id
+            )
+            rationale_objs[r] = ZenoColumn(
+                column_type=ZenoColumnType.POSTDISTILL, name=f"evalR{r}Rationale", model=model_name, prompt_id=prompt_id
+            )
+            with self.__df_lock:
+                score_cols[r] = self.df[str(score_objs[r])].copy()
+                rationale_cols[r] = self.df[str(rationale_objs[r])].copy()
+            if to_predict_indices is None:
+                targets[r] = set(score_cols[r].loc[pd.isna(score_cols[r])].index)
+            else:
+                targets[r] = set(to_predict_indices.ids)
+        # Progress counts rows of every requirement.
+        jobs.add_total(sum(len(rows) for rows in targets.values()))
+
+        model_col_obj = ZenoColumn(
+            column_type=ZenoColumnType.OUTPUT, name="output", model=model_name, prompt_id=prompt_id
+        )
+        with self.__df_lock:
+            model_col = self.df[str(model_col_obj)].copy()
+
+        # Reuse verdicts of unchanged requirements on identical outputs.
+        req_keys = {r: requirement_key(req, model_name) for r, req in zip(requirement_ids, requirements)}
+        output_keys = model_col.loc[list(set().union(*targets.values()))].dropna().map(output_key).to_dict()
+        new_evaluations = {r: {} for r in requirement_ids}
+        evaluated = {r: [] for r in requirement_ids}
+        for r in requirement_ids:
+            stored = self.llm_evaluations.get(req_keys[r])
+            for i in list(targets[r]):
+                if output_keys.get(i) in stored:
+                    score_cols[r][i], rationale_cols[r][i] = stored[output_keys[i]]
+                    targets[r].discard(i)
+                    evaluated[r].append(i)
+            jobs.advance(len(evaluated[r]))
+        to_predict = [i for i in self.df.index if any(i in rows for rows in targets.values())]
+
+        if self.params.llm_batch:
+            client = BatchClient(
+                self.llm_batch_backend,
+                os.path.join(self.cache_path, "batches"),
+                endpoint="chats",
+                data_template={"model": model_name},
+                poll_interval=self.params.llm_batch_poll_interval,
+                cache=self.llm_cache,
+            )
+        else:
+            client = self.llm_pool.client(caller="evaluate_requirements", lane=lane, endpoint="chats", data_template={"model": model_name})
+            jobs.track(client)
+
+        # Shared by every row, so it is sent first as a cacheable prefix.
+        api_prompt = REQUIREMENTS_EVALUATION_PROMPT.format(prompt=self.prompts[prompt_id].text, requirements=requirements_to_eval_str(requirements))
+
+        def chat_completion(indices):
+            for i in self.priority.ordered(indices):
+                client.request(
+                    data={
+                        "messages": [
+                            {"role": "system", "content": 'You are a helpful assistant. Please return the response as valid JSON.'},
+                            {"role": "user", "content": api_prompt},
+                            {"role": "user", "content": REQUIREMENT_EVALUATION_OUTPUT_PROMPT.format(modelOutput=model_col[i])}
+                        ],
+                        'response_format': {"type": "json_object"}
+                    }, metadata={'num': i}, endpoint = "chat.completions"
+                )
+
+        # Rows evaluated since the last flush, per requirement.
+        unsaved = {r: list(evaluated[r]) for r in requirement_ids}
+
+        def flush():
+            for r in requirement_ids:
+                self.llm_evaluations.put(req_keys[r], new_evaluations[r])
+                new_evaluations[r].clear()
+            # Show the rows done so far, the ones on screen come first.
+            self.__save_evaluations([
+                DataProcessingReturn(column=c, output=cols[r].loc[unsaved[r]])
+                for r in requirement_ids
+                for c, cols in ((score_objs[r], score_cols), (rationale_objs[r], rationale_cols))
+            ])
+            for r in requirement_ids:
+                unsaved[r].clear()
+
+        count = 0
+        retry = {r: [] for r in requirement_ids}
+        if len(to_predict) > 0:
+            jobs.checkpoint()
+            client.run_request_function(chat_completion, to_predict)
+            # Also cancelled while waiting for results, e.g. for a batch.
+            try:
+                for result in client:
+                    jobs.checkpoint()
+                    num = result.metadata['num']
+                    count += 1
+                    results = {}
+                    try:
+                        if result.failed:
+                            raise RuntimeError(result.error or "LLM request failed")
+                        results = parse_packed(result.response.choices[0].message.content, requirement_ids)
+                    except Exception as e:
+                        print(f"Failed to evaluate row {num} for prompt {prompt_id}: {e}")
+                        if not result.failed and self.llm_cache is not None:
+                            # Don't replay an unusable response.
+                            self.llm_cache.delete(payload_key(result.endpoint, result.data))
+
+                    for r in requirement_ids:
+                        if num not in targets[r]:
+                            continue
+                        try:
+                            str_score = int(results[r].get('pass/fail', '0'))
+                        except (KeyError, TypeError, ValueError):
+                            retry[r].append(num)
+                            continue
+                        score_cols[r][num] = str_score == 1
+                        rationale_cols[r][num] = results[r].get('rationale', '')
+                        if num in output_keys:
+                            new_evaluations[r][output_keys[num]] = (str_score == 1, rationale_cols[r][num])
+                        evaluated[r].append(num)
+                        unsaved[r].append(num)
+                        jobs.advance()
+                    if count % self.params.evaluation_flush_every == 0:
+                        flush()
+                    if count == len(to_predict):
+                        break
+            except jobs.JobCancelledError:
+                # Keep what was evaluated before the job was cancelled.
+                flush()
+                raise
+
+        flush()
+        outputs = []
+        for r in requirement_ids:
+            self.llm_dead_letters.discard(str(score_objs[r]), evaluated[r])
+            if len(retry[r]) > 0:
+                # Counted again by evaluate_requirement.
+                jobs.add_total(-len(retry[r]))
+                retried = self.evaluate_requirement(model_name, prompt_id, r, FilterIds(ids=retry[r]), lane=lane)
+                score_cols[r].loc[retried[0].output.index] = retried[0].output
+                rationale_cols[r].loc[retried[1].output.index] = retried[1].output
+                evaluated[r].extend(retried[0].output.index)
+            # Only the rows evaluated here, see __save_evaluations.
+            outputs.extend([
+                DataProcessingReturn(column=score_objs[r], output=score_cols[r].loc[evaluated[r]]),
+                DataProcessingReturn(column=rationale_objs[r], output=rationale_cols[r].loc[evaluated[r]])
+            ])
+        return outputs
+
     def update_evaluator(self, feedback: EvaluatorFeedback)-> Dict[str, Requirement]:
         # Your logic to modify the custom prompt
         print("update evaluator feedback")
@@ -1141,7 +2039,8 @@ class ZenoBackend(object):
 
         api_prompt = REQUIREMENT_SUGGESTION_PROMPT.format(prompt=self.prompts[cur_info.prompt_id].text, current_requirements = requirements,input_data=input_data, model_output=output_data)
 
-        client = OpenAIMultiClient(endpoint="chats", data_template={"model": cur_info.model})
+        client = self.llm_pool.client(caller="suggest_requirements", lane=Lane.INTERACTIVE, endpoint="chats", data_template={"model": cur_info.model})
+        stream = self.llm_streams.open("suggest_requirements", cur_info.prompt_id)
 
         def chat_completion():
             client.request(
@@ -1151,7 +2050,9 @@ class ZenoBackend(object):
                         {"role": "user", "content": api_prompt}
                     ],
                     'response_format': {"type": "json_object"}
-                }
+                },
+                on_delta=stream.send,
+                callback=lambda _: stream.close()
             )
 
         client.run_request_function(chat_completion)
@@ -1304,7 +2205,8 @@ class ZenoBackend(object):
         )
 
         # Send the API request to OpenAI
-        client = OpenAIMultiClient(endpoint="chats", data_template={"model": req.model})
+        client = self.llm_pool.client(caller="suggest_requirement_updates", lane=Lane.INTERACTIVE, endpoint="chats", data_template={"model": req.model})
+        stream = self.llm_streams.open("suggest_requirement_updates", req.prompt_id)
 
         def chat_completion():
             client.request(
@@ -1314,7 +2216,9 @@ class ZenoBackend(object):
                         {"role": "user", "content": api_prompt}
                     ],
                     'response_format': {"type": "json_object"}
-                }
+                },
+                on_delta=stream.send,
+                callback=lambda _: stream.close()
             )
 
         client.run_request_function(chat_completion)
@@ -1435,7 +2339,9 @@ class ZenoBackend(object):
             req_columns.append("diff")
         if req.sort[0]:
             filt_df = filt_df.sort_values(str(req.sort[0]), ascending=req.sort[1])
+        focused = filt_df.index if len(filt_df) < len(self.df) else []
         filt_df = filt_df.iloc[req.slice_range[0] : req.slice_range[1]].copy()
+        self.priority.update(filt_df.index, focused)
         if self.data_prefix != "":
             # Add data prefix to data column depending on type of data_path.
             filt_df.loc[:, str(self.data_column)] = (
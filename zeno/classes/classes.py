@@ -1,6 +1,6 @@
 """Internal classes for Zeno."""
 
-from typing import List, Optional, Tuple, Union, Dict
+from typing import Any, List, Optional, Tuple, Union, Dict
 
 from pydantic import BaseModel
 
@@ -30,6 +30,97 @@ class StatusResponse(CamelModel):
     complete_columns: List[ZenoColumn]
 
 
+class LLMStreamEvent(CamelModel):
+    stream_id: str
+    kind: str
+    prompt_id: str = ""
+    delta: str = ""
+    done: bool = False
+
+
+class ModelRateLimitState(CamelModel):
+    requests_available: Optional[float] = None
+    tokens_available: Optional[float] = None
+
+
+class RateLimitState(CamelModel):
+    concurrency: int
+    max_concurrency: int
+    active: int
+    waiting: int
+    latency: Optional[float] = None
+    rate_limited: int
+    completed: int
+    paused_for: float
+    models: Dict[str, ModelRateLimitState]
+
+
+class LLMEndpointState(CamelModel):
+    name: str
+    base_url: Optional[str] = None
+    weight: float
+    healthy: bool
+    consecutive_failures: int
+    requests: int
+    failures: int
+    rate_limit: Optional[RateLimitState] = None
+
+
+class DeadLetter(CamelModel):
+    group: str
+    num: Optional[Any] = None
+    endpoint: str
+    data: Dict[str, Any]
+    error: str
+    attempts: int
+    caller: str = ""
+    time: float
+
+
+class JobInfo(CamelModel):
+    id: str
+    # What the job runs, e.g. "run_prompt", and the request it runs.
+    kind: str
+    request: Dict[str, Any] = {}
+    # "queued", "running", "paused", "cancelled", "done" or "failed".
+    status: str
+    rows_done: int = 0
+    rows_total: int = 0
+    calls_in_flight: int = 0
+    error: Optional[str] = None
+    # The job that started this one, which cancels, pauses and resumes it too.
+    parent_id: Optional[str] = None
+    # What a finished job returned, e.g. the PromptComparison of "compare_prompts".
+    result: Optional[Dict[str, Any]] = None
+    created_at: float
+    started_at: Optional[float] = None
+    ended_at: Optional[float] = None
+
+
+class Percentiles(CamelModel):
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+class LLMTelemetryRollup(CamelModel):
+    endpoint: str
+    model: str
+    caller: str
+    count: int
+    failed: int
+    cached: int
+    retries: int
+    # Seconds between enqueueing and a worker picking the payload up.
+    queue_wait: Percentiles
+    # Seconds a worker spent on the payload, including retries.
+    service_time: Percentiles
+    latency: Percentiles
+    prompt_tokens: int
+    completion_tokens: int
+
+
 class MetricKey(CamelModel):
     sli: Slice
     model: str
@@ -50,6 +141,29 @@ class InferenceRequest(CamelModel):
     filter_ids: Optional[FilterIds] = None
     requirement_id: Optional[str] = None
 
+class PromptComparisonRequest(CamelModel):
+    model: str
+    baseline_prompt_id: str
+    candidate_prompt_id: str
+
+class RequirementComparison(CamelModel):
+    requirement_id: str
+    # Rows evaluated with both prompts, and the passes of each.
+    rows: int
+    baseline_passes: int
+    candidate_passes: int
+    # "better", "worse", "same" or "undecided" for the candidate.
+    decision: str
+
+class PromptComparison(CamelModel):
+    model: str
+    baseline_prompt_id: str
+    candidate_prompt_id: str
+    rows: int
+    total_rows: int
+    stopped_early: bool
+    requirements: List[RequirementComparison]
+
 class FeedbackRequest(CamelModel):
     model: str
     prompt_id: str
@@ -122,6 +236,34 @@ class Example(CamelModel):
     is_positive: bool
     feedback: Optional[str] = ""
 
+class CodeEvaluator(CamelModel):
+    """Deterministic check of model outputs, run instead of the LLM judge.
+
+    kind is one of:
+    - "regex": passes if pattern is found in the output, or is not with negate.
+    - "length": passes if the output has min_length to max_length units,
+      counted in unit ("chars" or "words").
+    - "json": passes if the output is valid JSON.
+    - "json_schema": passes if the output is JSON valid against json_schema.
+      Needs the jsonschema package.
+    - "python": code is an expression of `output` returning True or False, or
+      None to leave the row undecided. It can use re, json and basic builtins,
+      and is only accepted from the project config.
+
+    Undecided rows are sent to the LLM judge if llm_fallback is set.
+    """
+
+    kind: str
+    pattern: Optional[str] = None
+    ignore_case: bool = False
+    negate: bool = False
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    unit: str = "chars"
+    json_schema: Optional[Dict[str, Any]] = None
+    code: Optional[str] = None
+    llm_fallback: bool = False
+
 class Requirement(CamelModel):
     id: str
     name: str
@@ -130,6 +272,7 @@ class Requirement(CamelModel):
     evaluation_method: str
     examples: List[Example] = []
     implementationUpdateFlag: Optional[bool] = False
+    evaluator: Optional[CodeEvaluator] = None
 
 class Prompt(CamelModel):
     text: str
@@ -30,3 +30,7 @@ class Slice(CamelModel):
 class GroupMetric(CamelModel):
     metric: Union[float, None]
     size: int
+    # Pass rate interval of a requirement while only a sample is evaluated.
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    evaluated_size: Optional[int] = None
@@ -0,0 +1,334 @@
+"""Offline batch execution of LLM requests.
+
+Instead of calling the API once per payload, a `BatchClient` writes all of its
+requests to a JSONL file, submits the file to a `BatchBackend`, polls until the
+result file is ready and then yields the payloads with their responses, just
+like `OpenAIMultiClient` does. This trades latency for cheaper bulk throughput
+that is not subject to the interactive rate limits.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from openai import OpenAI
+from openai.types import Completion, CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion
+
+from zeno.llm.cache import ENDPOINT_ALIASES, ResponseCache, payload_key
+from zeno.openai_client import Payload
+from zeno.processing import jobs
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_URLS = {
+    "chat.completions": "/v1/chat/completions",
+    "completions": "/v1/completions",
+    "embeddings": "/v1/embeddings",
+}
+
+RESPONSE_TYPES: Dict[str, Any] = {
+    "chat.completions": ChatCompletion,
+    "completions": Completion,
+    "embeddings": CreateEmbeddingResponse,
+}
+
+
+def _endpoint(name: str) -> str:
+    return ENDPOINT_ALIASES.get(name, name)
+
+
+class BatchBackend:
+    """Executes a JSONL file of requests in the OpenAI batch format."""
+
+    def submit(self, input_path: Path, endpoint: str) -> str:
+        """Start a batch and return its id."""
+        raise NotImplementedError
+
+    def poll(self, batch_id: str, output_dir: Path) -> Optional[Path]:
+        """Return the path of the result file once the batch is done, else None."""
+        raise NotImplementedError
+
+    def cancel(self, batch_id: str):
+        """Stop a batch whose results are no longer needed, if the backend can."""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Runs batches through the OpenAI Batch API."""
+
+    def __init__(self, client: Optional[OpenAI] = None, completion_window="24h"):
+        self._client = client
+        self.completion_window = completion_window
+
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            self._client = OpenAI()
+        return self._client
+
+    def submit(self, input_path: Path, endpoint: str) -> str:
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=ENDPOINT_URLS[_endpoint(endpoint)],  # type: ignore
+            completion_window=self.completion_window,  # type: ignore
+        )
+        return batch.id
+
+    def cancel(self, batch_id: str):
+        self.client.batches.cancel(batch_id)
+
+    def poll(self, batch_id: str, output_dir: Path) -> Optional[Path]:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} {batch.status}: {batch.errors}")
+        if batch.status != "completed":
+            return None
+
+        output_path = Path(output_dir, batch_id + "_output.jsonl")
+        with open(output_path, "wb") as f:
+            if batch.output_file_id:
+                f.write(self.client.files.content(batch.output_file_id).content)
+            if batch.error_file_id:
+                f.write(self.client.files.content(batch.error_file_id).content)
+        return output_path
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in that answers batches with `custom_api` in a thread.
+
+    `custom_api` has the same signature as for `OpenAIMultiClient`, an async
+    function taking a `Payload` and returning a response.
+    """
+
+    def __init__(self, custom_api):
+        self._custom_api = custom_api
+        self._threads: Dict[str, threading.Thread] = {}
+        self._outputs: Dict[str, Path] = {}
+
+    def submit(self, input_path: Path, endpoint: str) -> str:
+        batch_id = "batch_" + uuid.uuid4().hex
+        output_path = Path(input_path.parent, batch_id + "_output.jsonl")
+        thread = threading.Thread(
+            target=asyncio.run,
+            args=(self._run(input_path, output_path, endpoint),),
+            daemon=True,
+        )
+        self._threads[batch_id] = thread
+        self._outputs[batch_id] = output_path
+        thread.start()
+        return batch_id
+
+    async def _run(self, input_path: Path, output_path: Path, endpoint: str):
+        lines = []
+        with open(input_path) as f:
+            for line in f:
+                request = json.loads(line)
+                payload = Payload(
+                    endpoint=endpoint,
+                    data=request["body"],
+                    metadata={},
+                    max_retries=1,
+                    retry_multiplier=1,
+                    retry_max=1,
+                )
+                result: Dict[str, Any] = {"custom_id": request["custom_id"]}
+                try:
+                    response = await self._custom_api(payload)
+                    body = (
+                        response.model_dump()
+                        if hasattr(response, "model_dump")
+                        else response
+                    )
+                    result["response"] = {"status_code": 200, "body": body}
+                    result["error"] = None
+                except Exception as e:
+                    result["response"] = None
+                    result["error"] = {"message": str(e)}
+                lines.append(json.dumps(result))
+
+        tmp_path = output_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, output_path)
+
+    def poll(self, batch_id: str, output_dir: Path) -> Optional[Path]:
+        if self._threads[batch_id].is_alive():
+            return None
+        if not self._outputs[batch_id].exists():
+            raise RuntimeError(f"Batch {batch_id} failed")
+        return self._outputs[batch_id]
+
+
+class BatchClient:
+    """Drop-in replacement for `OpenAIMultiClient` that runs requests as a batch.
+
+    Requests are collected until `close()`. Iterating then submits the batch,
+    blocks until it is done and yields every payload, with `failed` set for
+    payloads without a valid response, e.g. all of them if the batch failed or
+    expired. Responses are read from and written to `cache` like the
+    interactive client does. Inside a job, waiting for the batch stops at
+    checkpoints, and cancelling the job cancels the batch.
+    """
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        work_dir: str,
+        endpoint: Optional[str] = None,
+        data_template: Optional[dict] = None,
+        metadata_template: Optional[dict] = None,
+        poll_interval: float = 60,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self._backend = backend
+        self._work_dir = Path(work_dir)
+        self._endpoint = endpoint
+        self._data_template = data_template or {}
+        self._metadata_template = metadata_template or {}
+        self._poll_interval = poll_interval
+        self._cache = cache
+        self._payloads: List[Payload] = []
+        self._closed = threading.Event()
+        self._results: Optional[Iterator[Payload]] = None
+        os.makedirs(self._work_dir, exist_ok=True)
+
+    def request(
+        self,
+        data: dict,
+        endpoint: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        callback: Any = None,
+        cache: bool = True,
+        **kwargs,
+    ):
+        self._payloads.append(
+            Payload(
+                endpoint=endpoint or self._endpoint or "",
+                data={**self._data_template, **data},
+                metadata={**self._metadata_template, **(metadata or {})},
+                callback=callback,
+                max_retries=1,
+                retry_multiplier=1,
+                retry_max=1,
+                cache=cache,
+            )
+        )
+
+    def run_request_function(self, input_function, *args, stop_at_end=True, **kwargs):
+        input_function(*args, **kwargs)
+        if stop_at_end:
+            self.close()
+
+    def close(self):
+        self._closed.set()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Payload:
+        if self._results is None:
+            self._closed.wait()
+            self._results = self._run()
+        out = next(self._results)
+        out.call_callback()
+        return out
+
+    def pull_all(self):
+        for _ in self:
+            pass
+
+    def _run(self) -> Iterator[Payload]:
+        to_submit: Dict[str, List[Payload]] = {}
+        for payload in self._payloads:
+            payload.endpoint = _endpoint(payload.endpoint)
+            key = payload_key(payload.endpoint, payload.data)
+            if self._cache is not None and payload.cache:
+                response = self._cache.get(key)
+                if response is not None:
+                    payload.response = response
+                    payload.cached = True
+                    yield payload
+                    continue
+            # Identical payloads are only sent once, unless they skip the cache.
+            custom_id = key if payload.cache else f"{key}_{len(to_submit)}"
+            to_submit.setdefault(custom_id, []).append(payload)
+
+        by_endpoint: Dict[str, Dict[str, List[Payload]]] = {}
+        for key, payloads in to_submit.items():
+            by_endpoint.setdefault(payloads[0].endpoint, {})[key] = payloads
+        for endpoint, requests in by_endpoint.items():
+            yield from self._run_batch(endpoint, requests)
+
+    def _run_batch(
+        self, endpoint: str, requests: Dict[str, List[Payload]]
+    ) -> Iterator[Payload]:
+        input_path = Path(self._work_dir, f"batch_{uuid.uuid4().hex}_input.jsonl")
+        with open(input_path, "w") as f:
+            for key, payloads in requests.items():
+                line = {
+                    "custom_id": key,
+                    "method": "POST",
+                    "url": ENDPOINT_URLS[endpoint],
+                    "body": payloads[0].data,
+                }
+                f.write(json.dumps(line) + "\n")
+
+        batch_id = self._backend.submit(input_path, endpoint)
+        logger.info(f"Submitted batch {batch_id} with {len(requests)} requests")
+        error = "Missing or invalid batch result"
+        output_path: Optional[Path] = None
+        try:
+            while True:
+                jobs.checkpoint()
+                output_path = self._backend.poll(batch_id, self._work_dir)
+                if output_path is not None:
+                    break
+                time.sleep(self._poll_interval)
+        except jobs.JobCancelledError:
+            self._backend.cancel(batch_id)
+            raise
+        except Exception as e:
+            # Every payload fails, so callers dead-letter or retry them.
+            logger.exception(f"Batch {batch_id} failed")
+            error = f"Batch failed: {e}"
+
+        responses = {} if output_path is None else self._read(output_path, endpoint)
+        for key, payloads in requests.items():
+            response = responses.get(key)
+            if response is not None and self._cache is not None and payloads[0].cache:
+                self._cache.put(key, response)
+            for payload in payloads:
+                payload.attempt = 1
+                payload.response = response
+                payload.failed = response is None
+                if response is None:
+                    payload.error = error
+                yield payload
+
+    def _read(self, output_path: Path, endpoint: str) -> Dict[str, Any]:
+        """Valid responses of a result file, by custom_id."""
+        responses: Dict[str, Any] = {}
+        with open(output_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") != 200:
+                    logger.error(f"Batch request failed: {result}")
+                    continue
+                try:
+                    responses[result["custom_id"]] = RESPONSE_TYPES[
+                        endpoint
+                    ].model_validate(response["body"])
+                except Exception:
+                    logger.exception(f"Invalid batch response: {result}")
+        return responses
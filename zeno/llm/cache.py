@@ -0,0 +1,126 @@
+"""Persistent, content-addressed cache for LLM responses."""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Endpoint names that map to the same OpenAI API call.
+ENDPOINT_ALIASES = {"chats": "chat.completions"}
+
+
+def payload_key(endpoint: str, data: dict) -> str:
+    """Canonical hash of an API call. Key order and endpoint aliases are ignored."""
+    canonical = json.dumps(
+        {"endpoint": ENDPOINT_ALIASES.get(endpoint, endpoint), "data": data},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk store of API responses keyed by `payload_key`.
+
+    Every entry is its own file, written to a temporary file and atomically
+    renamed into place, so several processes can share one directory. Entries
+    older than `max_age` seconds are dropped, and once the directory grows past
+    `max_size` bytes the least recently read entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: Optional[int] = 2 * 1024**3,
+        max_age: Optional[float] = 30 * 24 * 60 * 60,
+        evict_every: int = 200,
+    ):
+        self.path = Path(os.path.expanduser(path))
+        self.max_size = max_size
+        self.max_age = max_age
+        self._evict_every = evict_every
+        self._puts = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def _entry_path(self, key: str) -> Path:
+        return Path(self.path, key[:2], key + ".pickle")
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entry_path(key)
+        try:
+            stat = entry.stat()
+            if self.max_age is not None and time.time() - stat.st_mtime > self.max_age:
+                entry.unlink(missing_ok=True)
+                return None
+            with open(entry, "rb") as f:
+                value = pickle.load(f)
+            # Access time tracks recency for eviction, mtime keeps the write time.
+            os.utime(entry, (time.time(), stat.st_mtime))
+            return value
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            logger.warning(f"Dropping unreadable cache entry {entry}")
+            entry.unlink(missing_ok=True)
+            return None
+
+    def put(self, key: str, value: Any):
+        entry = self._entry_path(key)
+        os.makedirs(entry.parent, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f)
+            os.replace(tmp_path, entry)
+        except Exception:
+            logger.exception(f"Failed to write cache entry {entry}")
+            Path(tmp_path).unlink(missing_ok=True)
+            return
+
+        self._puts += 1
+        if self._puts % self._evict_every == 0:
+            self.evict()
+
+    def delete(self, key: str):
+        self._entry_path(key).unlink(missing_ok=True)
+
+    def evict(self):
+        """Remove expired entries, then least recently read ones above max_size."""
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in self.path.glob("*/*.pickle"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Removed by another process.
+                continue
+            if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                entry.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry))
+            total += stat.st_size
+
+        if self.max_size is None or total <= self.max_size:
+            return
+
+        # Evict down to 90% of the limit so we don't evict on every put.
+        target = self.max_size * 0.9
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= target:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for entry in self.path.glob("*/*.pickle"):
+            entry.unlink(missing_ok=True)
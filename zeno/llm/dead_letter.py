@@ -0,0 +1,91 @@
+"""Store of LLM payloads that could not be completed, for inspection and resume."""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from zeno.classes.classes import DeadLetter
+
+
+class DeadLetterStore:
+    """Failed payloads as one JSON Lines file per group.
+
+    A group is whatever unit a caller resumes, e.g. the score column of one
+    requirement evaluation. A row keeps only its latest failure.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(os.path.expanduser(path))
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _group_path(self, group: str) -> Path:
+        return Path(self.path, group + ".jsonl")
+
+    def _read(self, group: str) -> List[DeadLetter]:
+        try:
+            with open(self._group_path(group)) as f:
+                return [
+                    DeadLetter.model_validate_json(line) for line in f if line.strip()
+                ]
+        except FileNotFoundError:
+            return []
+
+    def _write(self, group: str, letters: List[DeadLetter]):
+        path = self._group_path(group)
+        if len(letters) == 0:
+            path.unlink(missing_ok=True)
+            return
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            for letter in letters:
+                f.write(letter.model_dump_json() + "\n")
+        os.replace(tmp_path, path)
+
+    def add(self, group: str, payload, error: str, caller: str = "", num=None):
+        """Record a failed payload for row `num`, defaulting to its metadata num."""
+        if num is None:
+            num = (payload.metadata or {}).get("num")
+        if hasattr(num, "item"):
+            # Numpy scalars from a dataframe index.
+            num = num.item()
+        letter = DeadLetter(
+            group=group,
+            num=num,
+            endpoint=payload.endpoint,
+            data=payload.data,
+            error=error,
+            attempts=payload.attempt,
+            caller=caller,
+            time=time.time(),
+        )
+        with self._lock:
+            letters = [
+                d for d in self._read(group) if d.num is None or d.num != letter.num
+            ]
+            letters.append(letter)
+            self._write(group, letters)
+
+    def get(self, group: Optional[str] = None) -> List[DeadLetter]:
+        with self._lock:
+            if group is not None:
+                return self._read(group)
+            return [
+                letter
+                for path in sorted(self.path.glob("*.jsonl"))
+                for letter in self._read(path.stem)
+            ]
+
+    def discard(self, group: str, nums: Optional[Iterable] = None):
+        """Remove the letters of rows `nums`, or the whole group."""
+        with self._lock:
+            if nums is None:
+                self._write(group, [])
+                return
+            done = set(nums)
+            letters = self._read(group)
+            remaining = [d for d in letters if d.num not in done]
+            if len(remaining) != len(letters):
+                self._write(group, remaining)
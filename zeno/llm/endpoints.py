@@ -0,0 +1,236 @@
+"""Load balancing of LLM calls across API keys and OpenAI-compatible servers."""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from zeno.classes.classes import LLMEndpointState
+from zeno.llm.rate_limit import RateLimiter
+from zeno.llm.transport import HTTPTransport
+
+logger = logging.getLogger(__name__)
+
+
+def _counts_against_endpoint(error: Exception) -> bool:
+    """Whether an error says something about the endpoint rather than the request."""
+    status = getattr(error, "status_code", None)
+    return status is None or status == 429 or status >= 500 or status in (401, 403)
+
+
+class APIEndpoint:
+    """One API key and base URL, with its own rate limits and health.
+
+    Args:
+        name (str): Identifier used in logs, telemetry and the server API.
+        api_key (str | None): Defaults to the OPENAI_API_KEY environment variable.
+        base_url (str | None): Defaults to the OpenAI API.
+        weight (float): Relative share of traffic the endpoint should take.
+        models (list[str] | None): Models served, None for any model.
+        rate_limiter (RateLimiter | None): Limits of this key.
+        failure_threshold (int): Consecutive failures before the endpoint is
+            taken out of rotation.
+        cooldown (float): Seconds out of rotation after reaching the threshold,
+            doubled for every further failure up to max_cooldown.
+        transport (HTTPTransport | None): Connection settings of the HTTP client.
+        concurrency (int | None): Requests in flight at once without a rate
+            limiter, set by the client pool if None. Sizes the connection pool.
+    """
+
+    def __init__(
+        self,
+        name: str = "default",
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        weight: float = 1.0,
+        models: Optional[List[str]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        failure_threshold: int = 3,
+        cooldown: float = 5.0,
+        max_cooldown: float = 300.0,
+        transport: Optional[HTTPTransport] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.weight = max(weight, 1e-6)
+        self.models = models
+        self.rate_limiter = rate_limiter
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.transport = transport or HTTPTransport()
+        self.concurrency = concurrency
+
+        self._client: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def max_concurrency(self) -> int:
+        """Most requests this endpoint can have in flight at once."""
+        if self.rate_limiter is not None:
+            return self.rate_limiter.max_concurrency
+        return self.concurrency or 10
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self.transport.client(self.max_concurrency),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def serves(self, model: str) -> bool:
+        return self.models is None or model in self.models
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def load(self) -> float:
+        """Share of capacity in use, relative to the weight of the endpoint."""
+        if self.rate_limiter is not None:
+            load = self.rate_limiter.load()
+        else:
+            load = self._in_flight
+        return load / self.weight
+
+    def start(self):
+        with self._lock:
+            self._in_flight += 1
+            self.requests += 1
+
+    def report_success(self):
+        with self._lock:
+            self._in_flight -= 1
+            self.consecutive_failures = 0
+            self.unhealthy_until = 0.0
+
+    def report_cancelled(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def report_failure(self, error: Exception):
+        with self._lock:
+            self._in_flight -= 1
+            self.failures += 1
+            if not _counts_against_endpoint(error):
+                return
+            self.consecutive_failures += 1
+            excess = self.consecutive_failures - self.failure_threshold
+            if excess >= 0:
+                cooldown = min(self.cooldown * 2**excess, self.max_cooldown)
+                self.unhealthy_until = time.monotonic() + cooldown
+                logger.warning(
+                    f"Taking LLM endpoint {self.name} out of rotation for {cooldown:.0f}s"
+                )
+
+    def state(self) -> LLMEndpointState:
+        return LLMEndpointState(
+            name=self.name,
+            base_url=self.base_url,
+            weight=self.weight,
+            healthy=self.healthy(),
+            consecutive_failures=self.consecutive_failures,
+            requests=self.requests,
+            failures=self.failures,
+            rate_limit=self.rate_limiter.state() if self.rate_limiter else None,
+        )
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict[str, Any],
+        rate_limiter_defaults: Dict[str, Any],
+        transport: Optional[HTTPTransport] = None,
+    ) -> "APIEndpoint":
+        """Build an endpoint from a ZenoParameters.llm_endpoints entry.
+
+        Transport keys of the entry, e.g. "http2" or "timeout", override
+        `transport`.
+        """
+        limits = {
+            "rpm": config.get("rpm"),
+            "tpm": config.get("tpm"),
+            "limits": config.get("limits"),
+            "initial_concurrency": config.get("concurrency"),
+            "max_concurrency": config.get("max_concurrency"),
+        }
+        limits = {k: v for k, v in limits.items() if v is not None}
+        return cls(
+            name=config.get("name", config.get("base_url") or "default"),
+            api_key=config.get("api_key"),
+            base_url=config.get("base_url"),
+            weight=config.get("weight", 1.0),
+            models=config.get("models"),
+            rate_limiter=RateLimiter(**{**rate_limiter_defaults, **limits}),
+            transport=(transport or HTTPTransport()).updated(config),
+        )
+
+
+class EndpointPool:
+    """Chooses the endpoint for each call.
+
+    Healthy endpoints serving the model are preferred, and among those the one
+    with the lowest weighted load. A retry avoids the endpoint that just failed
+    when another one is available.
+    """
+
+    def __init__(self, endpoints: List[APIEndpoint]):
+        if len(endpoints) == 0:
+            raise ValueError("At least one LLM endpoint is required")
+        names = [e.name for e in endpoints]
+        if len(set(names)) != len(names):
+            raise ValueError(f"LLM endpoint names must be unique: {names}")
+        self.endpoints = endpoints
+
+    @property
+    def max_concurrency(self) -> Optional[int]:
+        """Total concurrency of all endpoints, None if any is unlimited."""
+        limiters = [e.rate_limiter for e in self.endpoints]
+        if any(limiter is None for limiter in limiters):
+            return None
+        return sum(limiter.max_concurrency for limiter in limiters)  # type: ignore
+
+    def choose(self, model: str, avoid: Optional[str] = None) -> APIEndpoint:
+        candidates = [e for e in self.endpoints if e.serves(model)] or self.endpoints
+        if len(candidates) > 1 and avoid is not None:
+            candidates = [e for e in candidates if e.name != avoid] or candidates
+        healthy = [e for e in candidates if e.healthy()]
+        if not healthy:
+            # Everything is failing, try the endpoint that recovers first.
+            return min(candidates, key=lambda e: e.unhealthy_until)
+
+        def score(endpoint: APIEndpoint):
+            limiter = endpoint.rate_limiter
+            paused = limiter.paused_for() if limiter is not None else 0.0
+            return (paused > 0, endpoint.load())
+
+        return min(healthy, key=score)
+
+    def get(self, name: str) -> Optional[APIEndpoint]:
+        for endpoint in self.endpoints:
+            if endpoint.name == name:
+                return endpoint
+        return None
+
+    def states(self) -> List[LLMEndpointState]:
+        return [e.state() for e in self.endpoints]
+
+    async def close(self):
+        for endpoint in self.endpoints:
+            await endpoint.close()
@@ -0,0 +1,154 @@
+"""Requirement evaluations keyed by the content they depend on.
+
+A verdict depends on the requirement (description, evaluation method and
+labeled examples), the judge model and the model output, not on which prompt
+version or row produced the output. Storing verdicts under hashes of those
+inputs means editing a requirement invalidates its old verdicts, while an
+unchanged requirement reuses them for every identical output, across prompt
+versions.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+# A verdict and its rationale.
+Evaluation = Tuple[bool, str]
+
+
+def _hash(value: Any) -> str:
+    canonical = json.dumps(
+        value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def requirement_key(requirement, judge_model: str) -> str:
+    """Hash of everything about a requirement that affects its verdicts."""
+    content = {
+        "description": requirement.description,
+        "evaluation_method": requirement.evaluation_method,
+        "examples": [
+            [ex.input, ex.output, ex.is_positive, ex.feedback]
+            for ex in requirement.examples
+        ],
+        "model": judge_model,
+    }
+    evaluator = getattr(requirement, "evaluator", None)
+    if evaluator is not None:
+        # Only when set, so keys of LLM-judged requirements stay the same.
+        content["evaluator"] = evaluator.model_dump()
+    return _hash(content)
+
+
+def output_key(output: Any) -> str:
+    return _hash(str(output))
+
+
+class EvaluationStore:
+    """Verdicts by requirement key and output key, one pickle per requirement key.
+
+    Files are loaded on first use. `put` appends the new verdicts to a log
+    next to the pickle, and rewrites the pickle atomically, clearing the log,
+    once the log holds more verdicts than the pickle.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(os.path.expanduser(path))
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, Dict[str, Evaluation]] = {}
+        # Verdicts in the log of each requirement key.
+        self._appended: Dict[str, int] = {}
+        self._columns: Optional[Set[str]] = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def _read(self, name: str, default):
+        try:
+            with open(Path(self.path, name + ".pickle"), "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def _write(self, name: str, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, Path(self.path, name + ".pickle"))
+
+    def _log_path(self, name: str) -> Path:
+        return Path(self.path, name + ".pickle.rows")
+
+    def _evaluations(self, req_key: str) -> Dict[str, Evaluation]:
+        if req_key not in self._loaded:
+            evaluations = self._read(req_key, {})
+            self._appended[req_key] = 0
+            try:
+                with open(self._log_path(req_key), "rb") as f:
+                    while True:
+                        appended = pickle.load(f)
+                        evaluations.update(appended)
+                        self._appended[req_key] += len(appended)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                # No log, its end, or verdicts cut off by a crash while appending.
+                pass
+            self._loaded[req_key] = evaluations
+        return self._loaded[req_key]
+
+    def _save(self, req_key: str):
+        self._write(req_key, self._loaded[req_key])
+        self._appended[req_key] = 0
+        try:
+            os.remove(self._log_path(req_key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, req_key: str) -> Dict[str, Evaluation]:
+        """Verdicts of a requirement by output key. Do not modify.
+
+        Later puts add to the returned dict.
+        """
+        with self._lock:
+            return self._evaluations(req_key)
+
+    def put(self, req_key: str, evaluations: Dict[str, Evaluation]):
+        if len(evaluations) == 0:
+            return
+        with self._lock:
+            merged = self._evaluations(req_key)
+            merged.update(evaluations)
+            self._appended[req_key] += len(evaluations)
+            if self._appended[req_key] > len(merged):
+                self._save(req_key)
+            else:
+                with open(self._log_path(req_key), "ab") as f:
+                    pickle.dump(evaluations, f)
+
+    def adopted(self, column: str) -> bool:
+        """Whether the verdicts of a score column were taken over already."""
+        with self._lock:
+            if self._columns is None:
+                self._columns = self._read("columns", set())
+            return column in self._columns
+
+    def adopt(self, column: str, req_key: str, evaluations: Dict[str, Evaluation]):
+        """Take over the verdicts of a score column saved before this store.
+
+        Only the first call per column has an effect, later verdicts of the
+        column come from the store.
+        """
+        with self._lock:
+            if self._columns is None:
+                self._columns = self._read("columns", set())
+            if column in self._columns:
+                return
+            merged = {**evaluations, **self._evaluations(req_key)}
+            if len(evaluations) > 0:
+                self._loaded[req_key] = merged
+                self._save(req_key)
+            self._columns.add(column)
+            self._write("columns", self._columns)
@@ -0,0 +1,410 @@
+"""Deterministic local stand-in for the OpenAI API.
+
+`MockLLM` answers chat, completion and embedding requests without network
+access. It can be passed as `custom_api` to `OpenAIMultiClient` (or as
+`llm_custom_api` to Zeno), or served as an OpenAI-compatible HTTP endpoint for
+model functions that create their own OpenAI client:
+
+    python -m zeno.llm.mock --port 8100 --latency 0.5 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=mock zeno config.toml
+
+Responses, latencies and injected errors only depend on the request content,
+the number of times it has been sent and the seed, so runs are reproducible
+regardless of how requests are scheduled.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+from openai import InternalServerError, RateLimitError
+from openai.types import Completion, CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from zeno.llm.cache import ENDPOINT_ALIASES, payload_key
+from zeno.llm.rate_limit import CHARS_PER_TOKEN
+
+LatencyFn = Callable[[random.Random], float]
+Responder = Union[str, Callable[[dict], str]]
+
+
+def constant(seconds: float) -> LatencyFn:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> LatencyFn:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> LatencyFn:
+    """Long-tailed latency, typical of LLM APIs."""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def _content(data: dict) -> str:
+    """Text of the user messages, or the completion prompt."""
+    messages = [m for m in data.get("messages", []) if m.get("role", "user") == "user"]
+    if messages:
+        return "\n".join(str(m.get("content", "")) for m in messages)
+    prompt = data.get("prompt", "")
+    return prompt if isinstance(prompt, str) else " ".join(map(str, prompt))
+
+
+def _quoted(text: str, label: str) -> str:
+    """Value quoted with ''' after `label` in a prompt template."""
+    match = re.search(re.escape(label) + r"\s*'''\$?(.*?)'''", text, re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+
+class MockLLM:
+    """Deterministic fake LLM backend.
+
+    Args:
+        latency (float | Callable[[random.Random], float]): Seconds per call, or
+            a distribution such as `lognormal(0.5)`.
+        rate_limit_rate (float): Probability that a call fails with a 429.
+        server_error_rate (float): Probability that a call fails with a 500.
+        retry_after (float | None): Retry-After header sent with 429 errors.
+        pass_rate (float): Share of requirement evaluations that pass.
+        seed (int): Seed for latencies, errors and scripted outputs.
+        responders (list[tuple[str, str | Callable[[dict], str]]]): Extra
+            scripted outputs, as (regex, response). The first regex matching
+            the request content wins, before the built-in scripts.
+        embedding_dim (int): Size of returned embeddings.
+        stream_chunk_size (int): Characters per delta of streamed responses.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, LatencyFn] = 0.0,
+        rate_limit_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        retry_after: Optional[float] = None,
+        pass_rate: float = 0.5,
+        seed: int = 0,
+        responders: Optional[List[Tuple[str, Responder]]] = None,
+        embedding_dim: int = 8,
+        stream_chunk_size: int = 8,
+    ):
+        self.latency = (
+            constant(latency) if isinstance(latency, (int, float)) else latency
+        )
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.pass_rate = pass_rate
+        self.seed = seed
+        self.responders = [(re.compile(p, re.DOTALL), r) for p, r in responders or []]
+        self.embedding_dim = embedding_dim
+        self.stream_chunk_size = stream_chunk_size
+
+        self._lock = threading.Lock()
+        self._sent: Dict[str, int] = {}
+        self.calls = 0
+        self.errors = 0
+
+    def _rng(self, key: str, *salt: Any) -> random.Random:
+        digest = hashlib.sha256(repr((self.seed, key) + salt).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _error(self, key: str, attempt: int) -> Optional[int]:
+        """Status code of the error injected into this attempt, if any."""
+        draw = self._rng(key, "error", attempt).random()
+        if draw < self.rate_limit_rate:
+            return 429
+        if draw < self.rate_limit_rate + self.server_error_rate:
+            return 500
+        return None
+
+    def _next_attempt(self, key: str) -> int:
+        with self._lock:
+            self.calls += 1
+            self._sent[key] = self._sent.get(key, 0) + 1
+            return self._sent[key]
+
+    def text(self, data: dict) -> str:
+        """Scripted output for a chat or completion request."""
+        content = _content(data)
+        for pattern, responder in self.responders:
+            if pattern.search(content):
+                return responder(data) if callable(responder) else responder
+
+        if "Answer 1 for yes and 0 for no, for each requirement" in content:
+            return json.dumps(self._requirements_evaluation(content))
+        if "Answer 1 for yes and 0 for no" in content:
+            if "Evaluate each of the following model outputs" in content:
+                return json.dumps(self._packed_evaluation(data))
+            return json.dumps(self._evaluation(content))
+        if "extract a series of success criteria" in content:
+            return json.dumps(self._requirements(_quoted(content, "Prompt:")))
+        if (data.get("response_format") or {}).get("type") == "json_object":
+            return "{}"
+        return "Mock response: " + content[-200:]
+
+    def _evaluation(self, content: str) -> dict:
+        output = _quoted(content, "Model Output:")
+        passed = self._rng(content, "pass").random() < self.pass_rate
+        return {
+            "modelOutput": output,
+            "pass/fail": int(passed),
+            "rationale": "The output "
+            + ("meets" if passed else "does not meet")
+            + " the requirement.",
+        }
+
+    def _packed_evaluation(self, data: dict) -> dict:
+        """Results of a packed evaluation, each as if its row was sent alone."""
+        messages = [
+            m for m in data.get("messages", []) if m.get("role", "user") == "user"
+        ]
+        prefix = "\n".join(str(m.get("content", "")) for m in messages[:-1])
+        results = []
+        for row_id, output in re.findall(
+            r"Model Output (\S+): '''(.*?) '''", _content(data), re.DOTALL
+        ):
+            content = f"{prefix}\nModel Output: '''{output} '''"
+            results.append({"id": row_id, **self._evaluation(content)})
+        return {"results": results}
+
+    def _requirements_evaluation(self, content: str) -> dict:
+        """Results of evaluating one output against several requirements."""
+        results = []
+        for requirement_id in re.findall(r"^Requirement (\S+): ", content, re.M):
+            evaluation = self._evaluation(content + "\n" + requirement_id)
+            results.append(
+                {
+                    "id": requirement_id,
+                    "pass/fail": evaluation["pass/fail"],
+                    "rationale": evaluation["rationale"],
+                }
+            )
+        return {"results": results}
+
+    def _requirements(self, prompt: str) -> dict:
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", prompt) if s.strip()]
+        requirements = []
+        for i, sentence in enumerate(sentences[:5]):
+            words = re.findall(r"[a-z]+", sentence.lower())[:3]
+            requirements.append(
+                {
+                    "name": "-".join(words) or f"requirement-{i}",
+                    "description": sentence,
+                    "evaluation_method": f"Check if the output follows: {sentence} "
+                    "If yes, return 'Yes'. If no, return 'No'.",
+                    "prompt_snippet": sentence,
+                }
+            )
+        return {"requirements": requirements}
+
+    def embedding(self, text: str) -> List[float]:
+        rng = self._rng(text, "embedding")
+        return [rng.uniform(-1, 1) for _ in range(self.embedding_dim)]
+
+    def respond(self, endpoint: str, data: dict) -> dict:
+        """OpenAI-style response body for a request, without latency or errors."""
+        endpoint = ENDPOINT_ALIASES.get(endpoint, endpoint)
+        model = data.get("model", "mock")
+        created = 0
+        response_id = "mock-" + payload_key(endpoint, data)[:24]
+
+        if endpoint == "embeddings":
+            inputs = data.get("input", "")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            return {
+                "object": "list",
+                "model": model,
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": self.embedding(str(x)),
+                    }
+                    for i, x in enumerate(inputs)
+                ],
+                "usage": {
+                    "prompt_tokens": sum(len(str(x)) for x in inputs)
+                    // CHARS_PER_TOKEN,
+                    "total_tokens": sum(len(str(x)) for x in inputs) // CHARS_PER_TOKEN,
+                },
+            }
+
+        text = self.text(data)
+        prompt_tokens = (
+            len(json.dumps(data.get("messages", data.get("prompt", ""))))
+            // CHARS_PER_TOKEN
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // CHARS_PER_TOKEN,
+            "total_tokens": prompt_tokens + len(text) // CHARS_PER_TOKEN,
+        }
+        if endpoint == "completions":
+            return {
+                "id": response_id,
+                "object": "text_completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "text": text, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+        if endpoint == "chat.completions":
+            return {
+                "id": response_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": text},
+                    }
+                ],
+                "usage": usage,
+            }
+        raise ValueError(f"Unsupported endpoint {endpoint}")
+
+    def _chunks(self, body: dict) -> List[dict]:
+        text = body["choices"][0]["message"]["content"]
+        size = self.stream_chunk_size
+        pieces = [text[i : i + size] for i in range(0, len(text), size)] or [""]
+        return [
+            {
+                "id": body["id"],
+                "object": "chat.completion.chunk",
+                "created": body["created"],
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": piece},
+                        "finish_reason": "stop" if i == len(pieces) - 1 else None,
+                    }
+                ],
+            }
+            for i, piece in enumerate(pieces)
+        ]
+
+    async def _call(self, endpoint: str, data: dict) -> Tuple[Optional[int], dict]:
+        """Simulate one call. Returns an injected error status or None, and the body."""
+        endpoint = ENDPOINT_ALIASES.get(endpoint, endpoint)
+        key = payload_key(endpoint, data)
+        attempt = self._next_attempt(key)
+        await asyncio.sleep(max(0.0, self.latency(self._rng(key, "latency", attempt))))
+        status = self._error(key, attempt)
+        if status is not None:
+            with self._lock:
+                self.errors += 1
+            message = "Rate limit reached" if status == 429 else "Internal server error"
+            return status, {"error": {"message": message, "type": "mock_error"}}
+        return None, self.respond(endpoint, data)
+
+    async def __call__(self, payload) -> Any:
+        """`custom_api` hook for `OpenAIMultiClient`."""
+        status, body = await self._call(payload.endpoint, payload.data)
+        if status is not None:
+            headers = {}
+            if status == 429 and self.retry_after is not None:
+                headers["retry-after"] = str(self.retry_after)
+            response = httpx.Response(
+                status,
+                headers=headers,
+                json=body,
+                request=httpx.Request("POST", "http://mock/v1/" + payload.endpoint),
+            )
+            error = RateLimitError if status == 429 else InternalServerError
+            raise error(body["error"]["message"], response=response, body=body)
+
+        endpoint = ENDPOINT_ALIASES.get(payload.endpoint, payload.endpoint)
+        if endpoint == "embeddings":
+            return CreateEmbeddingResponse.model_validate(body)
+        if endpoint == "completions":
+            return Completion.model_validate(body)
+        if getattr(payload, "on_delta", None):
+            return self._stream(body)
+        return ChatCompletion.model_validate(body)
+
+    async def _stream(self, body: dict) -> AsyncIterator[ChatCompletionChunk]:
+        for chunk in self._chunks(body):
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    def app(self):
+        """FastAPI app serving the mock under the OpenAI REST paths."""
+        from fastapi import FastAPI, Request
+        from fastapi.responses import JSONResponse, StreamingResponse
+
+        app = FastAPI(title="Mock LLM")
+
+        async def handle(endpoint: str, request: Request):
+            data = await request.json()
+            stream = bool(data.pop("stream", False))
+            data.pop("stream_options", None)
+            status, body = await self._call(endpoint, data)
+            if status is not None:
+                headers = {}
+                if status == 429 and self.retry_after is not None:
+                    headers["retry-after"] = str(self.retry_after)
+                return JSONResponse(body, status_code=status, headers=headers)
+            if stream and endpoint == "chat.completions":
+                events = [f"data: {json.dumps(c)}\n\n" for c in self._chunks(body)]
+                return StreamingResponse(
+                    iter(events + ["data: [DONE]\n\n"]), media_type="text/event-stream"
+                )
+            return JSONResponse(body)
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            return await handle("chat.completions", request)
+
+        @app.post("/v1/completions")
+        async def completions(request: Request):
+            return await handle("completions", request)
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: Request):
+            return await handle("embeddings", request)
+
+        return app
+
+    def serve(self, host: str = "localhost", port: int = 8100):
+        import uvicorn
+
+        uvicorn.run(self.app(), host=host, port=port, log_level="error")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI API.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Median seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--pass-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latency: Union[float, LatencyFn] = args.latency
+    if args.latency > 0 and args.latency_sigma > 0:
+        latency = lognormal(args.latency, args.latency_sigma)
+    print(f"Serving mock OpenAI API on http://{args.host}:{args.port}/v1")
+    MockLLM(
+        latency=latency,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=args.retry_after,
+        pass_rate=args.pass_rate,
+        seed=args.seed,
+    ).serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
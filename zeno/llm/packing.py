@@ -0,0 +1,67 @@
+"""Packing several rows into one LLM request.
+
+Per-row requests repeat the same instructions for every row. Packing K rows
+into one request sends them once, with the rows listed by id and the model
+asked for a JSON list of results keyed by that id.
+"""
+
+import json
+from typing import Any, Dict, Hashable, List, Sequence
+
+from zeno.llm.rate_limit import CHARS_PER_TOKEN
+
+# Estimated tokens each packed row adds besides its text, for its id and quotes.
+ROW_OVERHEAD_TOKENS = 8
+
+
+def pack_rows(
+    ids: Sequence[Hashable],
+    texts: Sequence[Any],
+    token_budget: int,
+    max_rows: int,
+) -> List[List[Hashable]]:
+    """Group ids, in order, so the texts of a group fit into `token_budget`.
+
+    A group holds at most `max_rows` ids. A text larger than the budget gets a
+    group of its own.
+    """
+    packs: List[List[Hashable]] = []
+    pack: List[Hashable] = []
+    tokens = 0
+    for i, text in zip(ids, texts):
+        row_tokens = len(str(text)) // CHARS_PER_TOKEN + ROW_OVERHEAD_TOKENS
+        if pack and (tokens + row_tokens > token_budget or len(pack) >= max_rows):
+            packs.append(pack)
+            pack, tokens = [], 0
+        pack.append(i)
+        tokens += row_tokens
+    if pack:
+        packs.append(pack)
+    return packs
+
+
+def parse_packed(content: str, ids: Sequence[Hashable]) -> Dict[Hashable, dict]:
+    """Results of a packed response by id, for the ids it answers.
+
+    The response is a JSON object with a "results" list of objects with an
+    "id" each. Unknown ids and malformed entries are left out, so callers can
+    retry the rows that are missing. Raises ValueError if it is not JSON.
+    """
+    try:
+        results = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Packed response is not JSON: {e}") from e
+    if isinstance(results, dict):
+        results = results.get("results", [])
+    if not isinstance(results, list):
+        raise ValueError("Packed response has no list of results")
+
+    by_key = {str(i): i for i in ids}
+    parsed: Dict[Hashable, dict] = {}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        key = str(result.get("id"))
+        if key in by_key and by_key[key] not in parsed:
+            parsed[by_key[key]] = result
+    return parsed
@@ -0,0 +1,283 @@
+"""Client-side rate limiting for LLM calls.
+
+Requests-per-minute and tokens-per-minute are tracked with one token bucket per
+model, and the number of concurrent calls is adapted with AIMD: grow by one
+after every window of successful calls, halve on a 429 and shrink when latency
+degrades. Latency is compared per model and per token against a baseline that
+slowly follows the latency seen, so calls that are slower because they are
+larger, or go to a slower model, are not taken for congestion. The limiter is
+shared by every worker, across threads and event loops.
+
+Callers pass a priority (the lane of the payload, lower is more urgent). Waiting
+higher-priority calls hold back lower-priority ones, and priority 0 calls are
+not bound by the adaptive concurrency, only by the per-model budgets.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from zeno.classes.classes import ModelRateLimitState, RateLimitState
+
+logger = logging.getLogger(__name__)
+
+# Rough number of characters per token, used to estimate request sizes.
+CHARS_PER_TOKEN = 4
+# Completion size assumed when a request does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 256
+# Share by which the latency baseline of a model may rise per call, so a lasting
+# change of the workload becomes the new normal instead of shrinking concurrency
+# for good.
+BASELINE_DRIFT = 0.02
+
+
+def estimate_tokens(data: dict) -> int:
+    """Estimate prompt plus completion tokens of a request before sending it."""
+    chars = 0
+    for message in data.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(str(part.get("text", "")) for part in content)
+        chars += len(str(content))
+    for field in ("prompt", "input"):
+        value = data.get(field, "")
+        values = value if isinstance(value, list) else [value]
+        chars += sum(len(str(v)) for v in values)
+    completion = data.get("max_tokens") or (
+        DEFAULT_COMPLETION_TOKENS if "input" not in data else 0
+    )
+    return chars // CHARS_PER_TOKEN + completion
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = float(per_minute)
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Give back (positive) or charge (negative) units after the fact."""
+        self._refill()
+        self.available = min(self.capacity, self.available + amount)
+
+
+class RateLimiter:
+    """Adaptive limiter shared by all workers of the LLM client.
+
+    Args:
+        rpm (int | None): Default requests per minute for every model.
+        tpm (int | None): Default tokens per minute for every model.
+        limits (dict[str, dict[str, int]] | None): Per-model overrides, as
+            {"model": {"rpm": ..., "tpm": ...}}.
+        initial_concurrency (int): Number of concurrent calls to start with.
+        min_concurrency (int): Lower bound for the adaptive concurrency.
+        max_concurrency (int): Upper bound for the adaptive concurrency.
+        latency_tolerance (float): Shrink concurrency once the average latency
+            per token of a model exceeds this multiple of its baseline.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+        initial_concurrency: int = 10,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        latency_tolerance: float = 3.0,
+        poll_interval: float = 0.02,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.limits = limits or {}
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.concurrency = min(
+            max(initial_concurrency, min_concurrency), self.max_concurrency
+        )
+        self.latency_tolerance = latency_tolerance
+        self._poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._requests: Dict[str, Optional[TokenBucket]] = {}
+        self._tokens: Dict[str, Optional[TokenBucket]] = {}
+        self._active = 0
+        self._waiting: Dict[int, int] = {}
+        self._window_successes = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.latency: Optional[float] = None
+        # Average and baseline seconds per token, by model.
+        self._token_latency: Dict[str, float] = {}
+        self._baseline: Dict[str, float] = {}
+        self.rate_limited = 0
+        self.completed = 0
+
+    def _buckets(self, model: str):
+        if model not in self._requests:
+            limits = self.limits.get(model, {})
+            rpm = limits.get("rpm", self.rpm)
+            tpm = limits.get("tpm", self.tpm)
+            self._requests[model] = TokenBucket(rpm) if rpm else None
+            self._tokens[model] = TokenBucket(tpm) if tpm else None
+        return self._requests[model], self._tokens[model]
+
+    def _try_acquire(self, model: str, tokens: int, priority: int) -> float:
+        """Take a slot and bucket capacity, or return how long to wait."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if any(n > 0 for p, n in self._waiting.items() if p < priority):
+            return self._poll_interval
+        if priority > 0 and self._active >= self.concurrency:
+            return self._poll_interval
+        requests, token_bucket = self._buckets(model)
+        wait = max(
+            requests.delay(1) if requests else 0.0,
+            token_bucket.delay(tokens) if token_bucket else 0.0,
+        )
+        if wait > 0:
+            return wait
+        if requests:
+            requests.consume(1)
+        if token_bucket:
+            token_bucket.consume(tokens)
+        self._active += 1
+        return 0.0
+
+    async def acquire(self, model: str, tokens: int, priority: int = 1):
+        """Wait for a concurrency slot and enough per-model budget."""
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_acquire(model, tokens, priority)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting[priority] -= 1
+
+    def release(
+        self,
+        model: str,
+        latency: Optional[float] = None,
+        estimated_tokens: int = 0,
+        used_tokens: Optional[int] = None,
+    ):
+        """Record a successful call and adapt concurrency."""
+        with self._lock:
+            self._active -= 1
+            self.completed += 1
+            _, token_bucket = self._buckets(model)
+            if token_bucket and used_tokens is not None:
+                token_bucket.adjust(estimated_tokens - used_tokens)
+
+            if latency is not None:
+                self.latency = (
+                    latency
+                    if self.latency is None
+                    else 0.8 * self.latency + 0.2 * latency
+                )
+                per_token = latency / max(1, used_tokens or estimated_tokens)
+                average = self._token_latency.get(model, per_token)
+                average = 0.8 * average + 0.2 * per_token
+                self._token_latency[model] = average
+                baseline = self._baseline.get(model, average)
+                baseline = min(average, baseline * (1 + BASELINE_DRIFT))
+                self._baseline[model] = baseline
+                if average > baseline * self.latency_tolerance:
+                    self._decrease(0.9)
+                    return
+
+            self._window_successes += 1
+            if self._window_successes >= self.concurrency:
+                self._window_successes = 0
+                if self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+
+    def release_failed(
+        self,
+        model: str,
+        rate_limited: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        """Record a failed call. Rate limit errors halve concurrency and pause."""
+        with self._lock:
+            self._active -= 1
+            if not rate_limited:
+                return
+            self.rate_limited += 1
+            self._decrease(0.5)
+            pause = retry_after if retry_after is not None else 1.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def _decrease(self, factor: float):
+        # Calls that were in flight before the last decrease report the same
+        # congestion, so only back off once per latency interval.
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 1.0):
+            return
+        self._last_decrease = now
+        self._window_successes = 0
+        new = max(self.min_concurrency, int(self.concurrency * factor))
+        if new < self.concurrency:
+            logger.info(f"Reducing LLM concurrency to {new}")
+        self.concurrency = new
+
+    def load(self) -> float:
+        """Active and waiting calls relative to the current concurrency."""
+        with self._lock:
+            return (self._active + sum(self._waiting.values())) / self.concurrency
+
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def state(self) -> RateLimitState:
+        with self._lock:
+            models = {}
+            for model in self._requests:
+                requests, token_bucket = self._buckets(model)
+                if requests:
+                    requests._refill()
+                if token_bucket:
+                    token_bucket._refill()
+                models[model] = ModelRateLimitState(
+                    requests_available=requests.available if requests else None,
+                    tokens_available=token_bucket.available if token_bucket else None,
+                )
+            return RateLimitState(
+                concurrency=self.concurrency,
+                max_concurrency=self.max_concurrency,
+                active=self._active,
+                waiting=sum(self._waiting.values()),
+                latency=self.latency,
+                rate_limited=self.rate_limited,
+                completed=self.completed,
+                paused_for=max(0.0, self._paused_until - time.monotonic()),
+                models=models,
+            )
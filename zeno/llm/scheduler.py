@@ -0,0 +1,160 @@
+"""Priority lanes for the LLM client pool.
+
+Every payload belongs to a lane. Workers pick the next payload either strictly
+by lane (a lower lane always goes first) or by weighted round-robin between the
+lanes with pending work, so UI-triggered calls do not wait behind thousands of
+queued evaluation payloads.
+
+Within a lane, payloads sharing a prompt prefix (`prefix_key`) are sent back to
+back so provider-side prompt caching can reuse the prefix.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional
+
+
+class Lane(IntEnum):
+    # Calls a user is actively waiting for, e.g. suggesting requirements.
+    INTERACTIVE = 0
+    # Evaluation of the rows and prompts currently being looked at.
+    FOREGROUND = 1
+    # Bulk sweeps that can run whenever capacity is free.
+    BACKGROUND = 2
+
+
+DEFAULT_LANE_WEIGHTS = {
+    Lane.INTERACTIVE: 16,
+    Lane.FOREGROUND: 4,
+    Lane.BACKGROUND: 1,
+}
+
+
+class LaneQueue:
+    """Drop-in replacement for `asyncio.Queue` with one FIFO per lane.
+
+    Items are payloads with `lane` and `prefix_key` attributes. `None` is a stop
+    sentinel for workers and is only returned once every lane is empty. Each
+    lane except the interactive one holds at most `maxsize` items, so bulk
+    producers block without ever blocking interactive calls.
+
+    A lane is a FIFO of prefix groups: the oldest group is drained first, for at
+    most `max_group_run` items in a row before the next group gets a turn.
+
+    Must be created and used on the event loop of the pool.
+
+    Args:
+        maxsize (int): Capacity of each non-interactive lane, 0 for unbounded.
+        policy (str): "strict" or "weighted".
+        weights (dict[int, int] | None): Relative share of each lane under the
+            weighted policy.
+        max_group_run (int): Items taken from one prefix group in a row.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        policy: str = "weighted",
+        weights: Optional[Dict[int, int]] = None,
+        max_group_run: int = 256,
+    ):
+        if policy not in ("strict", "weighted"):
+            raise ValueError(f"Unknown scheduling policy {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        weights = {**DEFAULT_LANE_WEIGHTS, **(weights or {})}
+        self._weights: List[int] = [max(1, weights[lane]) for lane in Lane]
+        self._credits: List[int] = [0 for _ in Lane]
+        self.max_group_run = max_group_run
+        self._lanes: List["OrderedDict[Optional[str], Deque]"] = [
+            OrderedDict() for _ in Lane
+        ]
+        self._sizes: List[int] = [0 for _ in Lane]
+        self._runs: List[int] = [0 for _ in Lane]
+        self._sentinels = 0
+        self._unfinished = 0
+        lock = asyncio.Lock()
+        self._not_empty = asyncio.Condition(lock)
+        self._not_full = asyncio.Condition(lock)
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self, lane: Optional[int] = None) -> int:
+        if lane is not None:
+            return self._sizes[lane]
+        return sum(self._sizes)
+
+    def _full(self, lane: int) -> bool:
+        return (
+            self.maxsize > 0
+            and lane != Lane.INTERACTIVE
+            and self._sizes[lane] >= self.maxsize
+        )
+
+    async def put(self, item):
+        async with self._not_empty:
+            if item is None:
+                self._sentinels += 1
+            else:
+                lane = min(max(int(item.lane), 0), len(self._lanes) - 1)
+                await self._not_full.wait_for(lambda: not self._full(lane))
+                key = getattr(item, "prefix_key", None)
+                self._lanes[lane].setdefault(key, deque()).append(item)
+                self._sizes[lane] += 1
+            self._unfinished += 1
+            self._finished.clear()
+            self._not_empty.notify()
+
+    async def get(self):
+        async with self._not_empty:
+            await self._not_empty.wait_for(
+                lambda: self.qsize() > 0 or self._sentinels > 0
+            )
+            item = self._pop()
+            # Producers wait on different lanes, so wake all of them.
+            self._not_full.notify_all()
+            return item
+
+    def _pop(self):
+        pending = [lane for lane, size in enumerate(self._sizes) if size > 0]
+        if not pending:
+            self._sentinels -= 1
+            return None
+        if self.policy == "strict":
+            return self._pop_lane(pending[0])
+
+        # Smooth weighted round-robin between the lanes with pending items.
+        # Idle lanes do not bank credit for later bursts.
+        for lane in range(len(self._lanes)):
+            if lane not in pending:
+                self._credits[lane] = 0
+        total = 0
+        for lane in pending:
+            self._credits[lane] += self._weights[lane]
+            total += self._weights[lane]
+        lane = max(pending, key=lambda lane: (self._credits[lane], -lane))
+        self._credits[lane] -= total
+        return self._pop_lane(lane)
+
+    def _pop_lane(self, lane: int):
+        groups = self._lanes[lane]
+        key, items = next(iter(groups.items()))
+        item = items.popleft()
+        self._sizes[lane] -= 1
+        self._runs[lane] += 1
+        if not items:
+            del groups[key]
+            self._runs[lane] = 0
+        elif self._runs[lane] >= self.max_group_run:
+            groups.move_to_end(key)
+            self._runs[lane] = 0
+        return item
+
+    def task_done(self):
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
@@ -0,0 +1,70 @@
+"""Fan-out of streamed LLM output to the websocket clients of the server."""
+
+import asyncio
+import threading
+import uuid
+from typing import List, Tuple
+
+from zeno.classes.classes import LLMStreamEvent
+
+
+class LLMStream:
+    """One streamed completion, e.g. a single suggest_requirements call."""
+
+    def __init__(self, broker: "StreamBroker", kind: str, prompt_id: str = ""):
+        self._broker = broker
+        self.stream_id = uuid.uuid4().hex
+        self.kind = kind
+        self.prompt_id = prompt_id
+
+    def send(self, delta: str):
+        self._broker.publish(
+            LLMStreamEvent(
+                stream_id=self.stream_id,
+                kind=self.kind,
+                prompt_id=self.prompt_id,
+                delta=delta,
+            )
+        )
+
+    def close(self):
+        self._broker.publish(
+            LLMStreamEvent(
+                stream_id=self.stream_id,
+                kind=self.kind,
+                prompt_id=self.prompt_id,
+                done=True,
+            )
+        )
+
+
+class StreamBroker:
+    """Delivers stream events from any thread to subscribers on any event loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    def open(self, kind: str, prompt_id: str = "") -> LLMStream:
+        return LLMStream(self, kind, prompt_id)
+
+    def subscribe(self) -> "asyncio.Queue[LLMStreamEvent]":
+        """Return a queue receiving every event, bound to the running loop."""
+        queue: "asyncio.Queue[LLMStreamEvent]" = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[1] is not queue]
+
+    def publish(self, event: LLMStreamEvent):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has been closed.
+                self.unsubscribe(queue)
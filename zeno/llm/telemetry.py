@@ -0,0 +1,127 @@
+"""Per-request timing and token usage of LLM calls, rolled up into percentiles."""
+
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict, List, Tuple
+
+import numpy as np
+
+from zeno.classes.classes import LLMTelemetryRollup, Percentiles
+from zeno.llm.cache import ENDPOINT_ALIASES
+
+
+@dataclass
+class RequestRecord:
+    endpoint: str
+    model: str
+    caller: str
+    enqueued_at: float
+    started_at: float
+    ended_at: float
+    attempts: int
+    failed: bool
+    cached: bool
+    coalesced: bool
+    prompt_tokens: int
+    completion_tokens: int
+    api_endpoint: str = ""
+
+    @property
+    def queue_wait(self) -> float:
+        return self.started_at - self.enqueued_at
+
+    @property
+    def service_time(self) -> float:
+        return self.ended_at - self.started_at
+
+    @property
+    def latency(self) -> float:
+        return self.ended_at - self.enqueued_at
+
+
+def _percentiles(values: List[float]) -> Percentiles:
+    if len(values) == 0:
+        return Percentiles(p50=0, p90=0, p99=0, max=0)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return Percentiles(p50=p50, p90=p90, p99=p99, max=max(values))
+
+
+class Telemetry:
+    """Keeps the most recent `max_records` request records.
+
+    Records are added from the client pool's event loop thread and read from
+    the server, so all access goes through a lock.
+    """
+
+    def __init__(self, max_records: int = 100_000):
+        self._lock = threading.Lock()
+        self._records: Deque[RequestRecord] = deque(maxlen=max_records)
+
+    def record(self, payload, caller: str = ""):
+        usage = getattr(payload.response, "usage", None)
+        # Cached and coalesced responses did not spend any tokens.
+        spent = usage is not None and not (payload.cached or payload.coalesced)
+        record = RequestRecord(
+            endpoint=ENDPOINT_ALIASES.get(payload.endpoint, payload.endpoint),
+            model=payload.data.get("model", ""),
+            caller=caller,
+            enqueued_at=payload.enqueued_at,
+            started_at=payload.started_at,
+            ended_at=payload.ended_at,
+            attempts=payload.attempt,
+            failed=payload.failed,
+            cached=payload.cached,
+            coalesced=payload.coalesced,
+            prompt_tokens=(getattr(usage, "prompt_tokens", None) or 0) if spent else 0,
+            completion_tokens=(getattr(usage, "completion_tokens", None) or 0)
+            if spent
+            else 0,
+            api_endpoint=payload.api_endpoint,
+        )
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[RequestRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def rollup(self) -> List[LLMTelemetryRollup]:
+        """Percentiles per endpoint, model and calling backend method."""
+        groups: Dict[Tuple[str, str, str], List[RequestRecord]] = {}
+        for record in self.records():
+            key = (record.endpoint, record.model, record.caller)
+            groups.setdefault(key, []).append(record)
+
+        return [
+            LLMTelemetryRollup(
+                endpoint=endpoint,
+                model=model,
+                caller=caller,
+                count=len(records),
+                failed=sum(r.failed for r in records),
+                cached=sum(r.cached or r.coalesced for r in records),
+                retries=sum(max(0, r.attempts - 1) for r in records),
+                queue_wait=_percentiles([r.queue_wait for r in records]),
+                service_time=_percentiles([r.service_time for r in records]),
+                latency=_percentiles([r.latency for r in records]),
+                prompt_tokens=sum(r.prompt_tokens for r in records),
+                completion_tokens=sum(r.completion_tokens for r in records),
+            )
+            for (endpoint, model, caller), records in sorted(groups.items())
+        ]
+
+    def dump(self, path: str, records: bool = True):
+        """Write the rollups, and optionally every record, to a JSON file."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        out = {"rollups": [r.model_dump(by_alias=True) for r in self.rollup()]}
+        if records:
+            out["records"] = [asdict(r) for r in self.records()]
+        with open(path, "w") as f:
+            json.dump(out, f, indent=2)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
@@ -0,0 +1,77 @@
+"""HTTP connection pool settings for the LLM clients.
+
+The OpenAI SDK keeps at most 100 idle connections for 5 seconds. Sweeps with
+more workers than that, or with pauses between bursts, keep closing connections
+and paying for new TLS handshakes. `HTTPTransport` sizes the pool from the
+concurrency of the endpoint it serves instead.
+"""
+
+import importlib.util
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+logger = logging.getLogger(__name__)
+
+
+def _has_h2() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class HTTPTransport:
+    """Connection pool, keep-alive, HTTP/2 and timeouts of one endpoint.
+
+    Args:
+        max_connections (int | None): Connections open at once, None to size
+            from the concurrency of the endpoint.
+        keepalive_expiry (float): Seconds an idle connection is kept open.
+        http2 (bool): Multiplex requests over HTTP/2. Needs the h2 package
+            (`pip install httpx[http2]`), falls back to HTTP/1.1 without it.
+        timeout (float): Seconds to wait for a response.
+        connect_timeout (float): Seconds to wait for a connection.
+    """
+
+    max_connections: Optional[int] = None
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    timeout: float = 600.0
+    connect_timeout: float = 10.0
+
+    def limits(self, concurrency: int) -> httpx.Limits:
+        max_connections = self.max_connections
+        if max_connections is None:
+            # Headroom for requests still draining while a retry goes out.
+            max_connections = concurrency + max(4, concurrency // 8)
+        return httpx.Limits(
+            max_connections=max_connections,
+            # Keep every connection warm, closing idle ones only on expiry.
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def client(self, concurrency: int) -> httpx.AsyncClient:
+        """An HTTP client for `concurrency` requests in flight at once."""
+        http2 = self.http2
+        if http2 and not _has_h2():
+            logger.warning("HTTP/2 needs the h2 package, using HTTP/1.1")
+            http2 = False
+        return DefaultAsyncHttpxClient(
+            limits=self.limits(concurrency),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            http2=http2,
+        )
+
+    def updated(self, config: Dict[str, Any]) -> "HTTPTransport":
+        """A copy with the transport keys of an llm_endpoints entry applied."""
+        keys = (
+            "max_connections",
+            "keepalive_expiry",
+            "http2",
+            "timeout",
+            "connect_timeout",
+        )
+        return replace(self, **{k: config[k] for k in keys if k in config})
@@ -1,17 +1,27 @@
 # code from https://github.com/cozodb/openai-multi-client
+import hashlib
+import itertools
+import json
 import logging
 import asyncio
+import time
+import weakref
 from dataclasses import dataclass
-from threading import Thread
-from typing import Any, Optional
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional
 
-from aioprocessing import AioJoinableQueue, AioQueue
 from tenacity import wait_random_exponential, stop_after_attempt, AsyncRetrying, RetryError
-from openai import AsyncOpenAI
+from openai import APIStatusError
+from openai.types.chat import ChatCompletion
+
+from zeno.llm.cache import ResponseCache, payload_key
+from zeno.llm.endpoints import APIEndpoint, EndpointPool
+from zeno.llm.rate_limit import RateLimiter, estimate_tokens
+from zeno.llm.scheduler import Lane, LaneQueue
+from zeno.llm.telemetry import Telemetry
 
 logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI()
 
 @dataclass
 class Payload:
@@ -23,51 +33,191 @@ class Payload:
     retry_max: float
     attempt: int = 0
     failed: bool = False
+    # Last error of a failed payload.
+    error: Optional[str] = None
     response: Any = None
     callback: Any = None
+    cache: bool = True
+    cached: bool = False
+    coalesced: bool = False
+    job_id: int = -1
+    # Streams the completion when set, calling it with every text delta.
+    on_delta: Optional[Callable[[str], None]] = None
+    # Wall-clock times of entering the queue, being picked up by a worker
+    # and being delivered, recorded for telemetry.
+    enqueued_at: float = 0.0
+    started_at: float = 0.0
+    ended_at: float = 0.0
+    lane: int = Lane.FOREGROUND
+    # Name of the APIEndpoint that served (or last failed) the payload.
+    api_endpoint: str = ""
+    # Payloads with the same prompt prefix are scheduled back to back.
+    prefix_key: Optional[str] = None
 
     def call_callback(self):
         if self.callback:
             self.callback(self)
 
 
-class OpenAIMultiClient:
+def prefix_key(data: dict) -> Optional[str]:
+    """Hash of the model and all but the last message of a chat request."""
+    messages = data.get("messages") or []
+    if len(messages) < 2:
+        return None
+    prefix = json.dumps([data.get("model"), messages[:-1]], sort_keys=True, default=str)
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    if not isinstance(error, APIStatusError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+async def _collect_stream(chunks, on_delta: Callable[[str], None]) -> ChatCompletion:
+    """Forward the text deltas of a chat completion stream and assemble the response."""
+    first = None
+    usage = None
+    contents: Dict[int, list] = {}
+    finish_reasons: Dict[int, Optional[str]] = {}
+    async for chunk in chunks:
+        first = first or chunk
+        usage = getattr(chunk, "usage", None) or usage
+        for choice in chunk.choices:
+            contents.setdefault(choice.index, [])
+            finish_reasons[choice.index] = choice.finish_reason or finish_reasons.get(choice.index)
+            if choice.delta.content:
+                contents[choice.index].append(choice.delta.content)
+                if choice.index == 0:
+                    on_delta(choice.delta.content)
+    if first is None:
+        raise ValueError("Empty completion stream")
+    return ChatCompletion.model_validate({
+        "id": first.id,
+        "object": "chat.completion",
+        "created": first.created,
+        "model": first.model,
+        "choices": [
+            {
+                "index": index,
+                "finish_reason": finish_reasons[index] or "stop",
+                "message": {"role": "assistant", "content": "".join(content)},
+            }
+            for index, content in sorted(contents.items())
+        ],
+        "usage": usage.model_dump() if usage is not None else None,
+    })
+
+
+def _replay_stream(payload: Payload):
+    """Send a response that did not come from a stream as a single delta."""
+    try:
+        content = payload.response.choices[0].message.content
+    except (AttributeError, IndexError):
+        return
+    if content:
+        payload.on_delta(content)
+
+
+async def _new_queue(maxsize: int = 0) -> asyncio.Queue:
+    # Queues are created on the pool's loop so they bind to it on any Python version.
+    return asyncio.Queue(maxsize=maxsize)
+
+
+async def _new_lane_queue(maxsize: int, policy: str, weights: Optional[Dict[int, int]]) -> LaneQueue:
+    return LaneQueue(maxsize=maxsize, policy=policy, weights=weights)
+
+
+class OpenAIClientPool:
+    """Long-lived event loop, API client and workers shared by many jobs.
+
+    Every job is an `OpenAIMultiClient` created with `pool.client(...)`. Jobs
+    only own their result queue, so creating one is cheap and the HTTP
+    connection pool, cache and rate limiter are reused across all of them.
+
+    Payloads are scheduled by the `Lane` of their job, either strictly by lane
+    or by weighted round-robin (`scheduling="strict"` or `"weighted"`).
+
+    Calls are spread over `endpoints`, API keys or OpenAI-compatible servers
+    with their own limits. Without endpoints, a single default endpoint using
+    the environment's API key and `rate_limiter` is used.
+    """
+
     def __init__(self,
                  concurrency: int = 10,
-                 max_retries: int = 10,
                  wait_interval: float = 0,
-                 retry_multiplier: float = 1,
-                 retry_max: float = 60,
-                 endpoint: Optional[str] = None,
-                 data_template: Optional[dict] = None,
-                 metadata_template: Optional[dict] = None,
-                 custom_api=None):
-        self._endpoint = endpoint
+                 custom_api=None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 scheduling: str = "weighted",
+                 lane_weights: Optional[Dict[int, int]] = None,
+                 endpoints: Optional[List[APIEndpoint]] = None):
         self._wait_interval = wait_interval
-        self._data_template = data_template or {}
-        self._metadata_template = metadata_template or {}
-        self._max_retries = max_retries
-        self._retry_multiplier = retry_multiplier
-        self._retry_max = retry_max
+        self._mock_api = custom_api
+        self._cache = cache
+        self.telemetry = telemetry
+        if endpoints is None:
+            endpoints = [APIEndpoint(rate_limiter=rate_limiter)]
+        self.endpoints = EndpointPool(endpoints)
+        # With rate limiters, spawn enough workers for their highest concurrency
+        # and let them decide how many of them are active.
+        if self.endpoints.max_concurrency is not None:
+            concurrency = self.endpoints.max_concurrency
         self._concurrency = concurrency
+        for endpoint in endpoints:
+            if endpoint.concurrency is None:
+                # Endpoints without a limiter may get every worker at once.
+                endpoint.concurrency = concurrency
+        # Futures of calls in flight, by payload key, for identical payloads to join.
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._jobs: "weakref.WeakValueDictionary[int, OpenAIMultiClient]" = weakref.WeakValueDictionary()
+        self._job_ids = itertools.count()
+        self._closed = False
         self._loop = asyncio.new_event_loop()
-        self._in_queue = AioJoinableQueue(maxsize=concurrency)
-        self._out_queue = AioQueue(maxsize=concurrency)
-        self._event_loop_thread = Thread(target=self._run_event_loop)
+        self._event_loop_thread = Thread(target=self._run_event_loop, daemon=True)
         self._event_loop_thread.start()
-        self._mock_api = custom_api
+        self._in_queue: LaneQueue = self.run(
+            _new_lane_queue(concurrency, scheduling, lane_weights)
+        )
         for i in range(concurrency):
             asyncio.run_coroutine_threadsafe(self._worker(i), self._loop)
 
-    def run_request_function(self, input_function, *args, stop_at_end=True, **kwargs):
-        if stop_at_end:
-            def f(*args, **kwargs):
-                input_function(*args, **kwargs)
-                self.close()
-        else:
-            f = input_function
-        input_thread = Thread(target=f, args=args, kwargs=kwargs)
-        input_thread.start()
+    def client(self, **kwargs) -> "OpenAIMultiClient":
+        """Create a job handle that sends its requests through this pool."""
+        return OpenAIMultiClient(pool=self, **kwargs)
+
+    def _register(self, job: "OpenAIMultiClient") -> int:
+        job_id = next(self._job_ids)
+        self._jobs[job_id] = job
+        return job_id
+
+    def run(self, coro):
+        """Run a coroutine on the pool's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def arun(self, coro):
+        """Await a coroutine on the pool's event loop from any event loop."""
+        if asyncio.get_running_loop() is self._loop:
+            return await coro
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, self._loop)
+        )
+
+    def submit(self, payload: Payload):
+        payload.enqueued_at = time.time()
+        self.run(self._in_queue.put(payload))
+
+    async def asubmit(self, payload: Payload):
+        payload.enqueued_at = time.time()
+        await self.arun(self._in_queue.put(payload))
 
     def _run_event_loop(self):
         asyncio.set_event_loop(self._loop)
@@ -75,34 +225,142 @@ class OpenAIMultiClient:
 
     async def _process_payload(self, payload: Payload) -> Payload:
         logger.debug(f"Processing {payload}")
+        # Payloads opting out of the cache (e.g. sampling) are never shared either.
+        if not payload.cache:
+            payload.response = await self._fetch(payload)
+            logger.debug(f"Processed {payload}")
+            return payload
+
+        key = payload_key(payload.endpoint, payload.data)
+        leader = self._inflight.get(key)
+        if leader is not None:
+            # An identical payload is in flight, possibly from another job.
+            payload.response = await asyncio.shield(leader)
+            payload.coalesced = True
+            if payload.on_delta:
+                _replay_stream(payload)
+            logger.debug(f"Coalesced {payload}")
+            return payload
+
+        future = self._loop.create_future()
+        self._inflight[key] = future
+        try:
+            if self._cache is not None:
+                response = await asyncio.to_thread(self._cache.get, key)
+                if response is not None:
+                    payload.response = response
+                    payload.cached = True
+                    future.set_result(response)
+                    if payload.on_delta:
+                        _replay_stream(payload)
+                    logger.debug(f"Cache hit {payload}")
+                    return payload
+            payload.response = await self._fetch(payload)
+            if self._cache is not None:
+                await asyncio.to_thread(self._cache.put, key, payload.response)
+            future.set_result(payload.response)
+        except BaseException as e:
+            # Waiters retry on their own, so mark the error as retrieved.
+            if not isinstance(e, Exception):
+                e = RuntimeError(f"Identical request was interrupted: {e!r}")
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        logger.debug(f"Processed {payload}")
+        return payload
+
+    async def _fetch(self, payload: Payload) -> Any:
+        # Retries fail over to another endpoint when there is one.
+        endpoint = self.endpoints.choose(
+            payload.data.get("model", ""),
+            avoid=payload.api_endpoint if payload.attempt > 1 else None,
+        )
+        payload.api_endpoint = endpoint.name
+        endpoint.start()
+        try:
+            if endpoint.rate_limiter is None:
+                response = await self._call_api(payload, endpoint)
+            else:
+                response = await self._call_api_limited(payload, endpoint, endpoint.rate_limiter)
+        except Exception as e:
+            endpoint.report_failure(e)
+            raise
+        except BaseException:
+            endpoint.report_cancelled()
+            raise
+        endpoint.report_success()
+        return response
+
+    async def _call_api(self, payload: Payload, endpoint: APIEndpoint) -> Any:
         if self._mock_api:
-            payload.response = await self._mock_api(payload)
-        elif payload.endpoint == "completions":
-            payload.response = await client.completions.create(**payload.data)
+            response = await self._mock_api(payload)
+            if payload.on_delta and hasattr(response, "__aiter__"):
+                return await _collect_stream(response, payload.on_delta)
+            return response
+        client = endpoint.client
+        if payload.endpoint == "completions":
+            return await client.completions.create(**payload.data)
         elif payload.endpoint == "chat.completions" or payload.endpoint == "chats":
-            payload.response = await client.chat.completions.create(**payload.data)
+            if payload.on_delta:
+                chunks = await client.chat.completions.create(
+                    **payload.data, stream=True, stream_options={"include_usage": True}
+                )
+                return await _collect_stream(chunks, payload.on_delta)
+            return await client.chat.completions.create(**payload.data)
         elif payload.endpoint == "embeddings":
-            payload.response = await client.embeddings.create(**payload.data)
+            return await client.embeddings.create(**payload.data)
         elif payload.endpoint == "edits":
-            payload.response = await client.edits.create(**payload.data)
+            return await client.edits.create(**payload.data)
         elif payload.endpoint == "images":
-            payload.response = await client.images.create(**payload.data)
+            return await client.images.create(**payload.data)
         elif payload.endpoint == "fine-tunes":
-            payload.response = await client.fine_tunes.create(**payload.data)
+            return await client.fine_tunes.create(**payload.data)
         else:
             raise ValueError(f"Unknown endpoint {payload.endpoint}")
-        logger.debug(f"Processed {payload}")
-        return payload
+
+    async def _call_api_limited(self, payload: Payload, endpoint: APIEndpoint, limiter: RateLimiter) -> Any:
+        model = payload.data.get("model", "")
+        estimated_tokens = estimate_tokens(payload.data)
+        await limiter.acquire(model, estimated_tokens, priority=payload.lane)
+        start = time.monotonic()
+        try:
+            response = await self._call_api(payload, endpoint)
+        except Exception as e:
+            limiter.release_failed(
+                model, rate_limited=_is_rate_limit(e), retry_after=_retry_after(e)
+            )
+            raise
+        except BaseException:
+            # Cancelled calls give back their slot too, or the pool stalls.
+            limiter.release_failed(model)
+            raise
+        usage = getattr(response, "usage", None)
+        limiter.release(
+            model,
+            latency=time.monotonic() - start,
+            estimated_tokens=estimated_tokens,
+            used_tokens=getattr(usage, "total_tokens", None),
+        )
+        return response
 
     async def _worker(self, i):
         while True:
-            payload = await self._in_queue.coro_get()
+            payload = await self._in_queue.get()
 
             if payload is None:
                 logger.debug(f"Exiting worker {i}")
                 self._in_queue.task_done()
                 break
 
+            job = self._jobs.get(payload.job_id)
+            if job is not None and job._hold(payload):
+                # Paused or cancelled, the job resubmits or drops it.
+                self._in_queue.task_done()
+                continue
+
+            payload.started_at = time.time()
             try:
                 async for attempt in AsyncRetrying(
                         wait=wait_random_exponential(multiplier=payload.retry_multiplier, max=payload.retry_max),
@@ -111,57 +369,264 @@ class OpenAIMultiClient:
                         try:
                             payload.attempt = attempt.retry_state.attempt_number
                             payload = await self._process_payload(payload)
-                            await self._out_queue.coro_put(payload)
-                            self._in_queue.task_done()
                         except Exception:
                             logger.exception(f"Error processing {payload}")
                             raise
-            except RetryError:
+            except RetryError as e:
                 payload.failed = True
+                payload.error = repr(e.last_attempt.exception())
                 logger.error(f"Failed to process {payload}")
-                await self._out_queue.coro_put(payload)
-                self._in_queue.task_done()
+            payload.ended_at = time.time()
+            await self._deliver(payload)
+            self._in_queue.task_done()
             await asyncio.sleep(self._wait_interval)
 
+    async def _deliver(self, payload: Payload):
+        job = self._jobs.get(payload.job_id)
+        if self.telemetry is not None:
+            self.telemetry.record(payload, caller=job.caller if job is not None else "")
+        if job is None:
+            logger.debug(f"Dropping result of discarded job {payload}")
+            return
+        await job._put_result(payload)
+
     def close(self):
+        if self._closed:
+            return
+        self._closed = True
         try:
             for i in range(self._concurrency):
-                self._in_queue.put(None)
-            self._in_queue.join()
-            self._out_queue.put(None)
+                self.run(self._in_queue.put(None))
+            self.run(self._in_queue.join())
+            self.run(self.endpoints.close())
             self._loop.call_soon_threadsafe(self._loop.stop)
             self._event_loop_thread.join()
         except Exception as e:
             logger.error(f"Error closing: {e}")
 
+
+class OpenAIMultiClient:
+    """A job sending requests through an `OpenAIClientPool`.
+
+    Without a pool, the client starts (and closes) a private one. Results can be
+    consumed with a plain `for` loop from any thread, or with `async for` from
+    inside an event loop such as the FastAPI server's.
+    """
+
+    def __init__(self,
+                 concurrency: int = 10,
+                 max_retries: int = 10,
+                 wait_interval: float = 0,
+                 retry_multiplier: float = 1,
+                 retry_max: float = 60,
+                 endpoint: Optional[str] = None,
+                 data_template: Optional[dict] = None,
+                 metadata_template: Optional[dict] = None,
+                 custom_api=None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 pool: Optional[OpenAIClientPool] = None,
+                 endpoints: Optional[List[APIEndpoint]] = None,
+                 caller: str = "",
+                 lane: int = Lane.FOREGROUND):
+        # Name of the calling backend method, to group telemetry by.
+        self.caller = caller
+        self.lane = lane
+        self._endpoint = endpoint
+        self._data_template = data_template or {}
+        self._metadata_template = metadata_template or {}
+        self._max_retries = max_retries
+        self._retry_multiplier = retry_multiplier
+        self._retry_max = retry_max
+        self._owns_pool = pool is None
+        if pool is None:
+            pool = OpenAIClientPool(
+                concurrency=concurrency,
+                wait_interval=wait_interval,
+                custom_api=custom_api,
+                cache=cache,
+                rate_limiter=rate_limiter,
+                endpoints=endpoints,
+            )
+        self._pool = pool
+        self._out_queue: "asyncio.Queue[Optional[Payload]]" = pool.run(_new_queue())
+        self._lock = Lock()
+        self._pending = 0
+        self._closing = False
+        self._finished = False
+        self._paused = False
+        self._cancelled = False
+        # Payloads taken off the pool's queue while paused.
+        self._held: List[Payload] = []
+        self._job_id = pool._register(self)
+
+    def run_request_function(self, input_function, *args, stop_at_end=True, **kwargs):
+        if stop_at_end:
+            def f(*args, **kwargs):
+                input_function(*args, **kwargs)
+                self.close()
+        else:
+            f = input_function
+        input_thread = Thread(target=f, args=args, kwargs=kwargs)
+        input_thread.start()
+
+    async def _put_result(self, payload: Payload):
+        self._out_queue.put_nowait(payload)
+        with self._lock:
+            self._pending -= 1
+            done = self._closing and self._pending == 0 and not self._finished
+            if done:
+                self._finished = True
+        if done:
+            self._out_queue.put_nowait(None)
+
+    def close(self):
+        """Stop accepting requests. Iteration ends once pending results are out."""
+        with self._lock:
+            self._closing = True
+            done = self._pending == 0 and not self._finished
+            if done:
+                self._finished = True
+        if done:
+            self._pool._loop.call_soon_threadsafe(self._out_queue.put_nowait, None)
+
+    @property
+    def in_flight(self) -> int:
+        """Requests sent to the pool and not answered yet, excluding held ones."""
+        with self._lock:
+            return self._pending - len(self._held)
+
+    def _hold(self, payload: Payload) -> bool:
+        """Keep a payload back while paused, or drop it once cancelled."""
+        with self._lock:
+            if self._cancelled:
+                self._pending -= 1
+                done = self._closing and self._pending == 0 and not self._finished
+                if done:
+                    self._finished = True
+            elif self._paused:
+                self._held.append(payload)
+                return True
+            else:
+                return False
+        if done:
+            self._out_queue.put_nowait(None)
+        return True
+
+    def pause(self):
+        """Hold back requests that have not started. Calls in flight finish."""
+        with self._lock:
+            self._paused = True
+
+    def resume(self):
+        with self._lock:
+            self._paused = False
+            held, self._held = self._held, []
+
+        async def requeue():
+            for payload in held:
+                await self._pool.asubmit(payload)
+
+        # Without waiting, as the queue only takes as many as there are workers.
+        asyncio.run_coroutine_threadsafe(requeue(), self._pool._loop)
+
+    def cancel(self):
+        """Drop the requests that have not started.
+
+        Their results never arrive, so iteration ends after the calls in flight
+        if the client is closed.
+        """
+        with self._lock:
+            self._cancelled = True
+            self._pending -= len(self._held)
+            self._held = []
+            done = self._closing and self._pending == 0 and not self._finished
+            if done:
+                self._finished = True
+        if done:
+            self._pool._loop.call_soon_threadsafe(self._out_queue.put_nowait, None)
+
+    def _end_iteration(self):
+        # A private pool is closed once all results have been read from it.
+        if self._owns_pool:
+            self._pool.close()
+
     def __iter__(self):
         return self
 
     def __next__(self):
-        out = self._out_queue.get()
+        out = self._pool.run(self._out_queue.get())
         if out is None:
+            self._end_iteration()
             raise StopIteration
         out.call_callback()
         return out
 
-    def request(self,
-                data: dict,
-                endpoint: Optional[str] = None,
-                metadata: Optional[dict] = None,
-                callback: Any = None,
-                max_retries: Optional[int] = None,
-                retry_multiplier: Optional[float] = None,
-                retry_max: Optional[float] = None):
-        payload = Payload(
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        out = await self._pool.arun(self._out_queue.get())
+        if out is None:
+            await asyncio.to_thread(self._end_iteration)
+            raise StopAsyncIteration
+        out.call_callback()
+        return out
+
+    def _prepare(self, payload: Payload) -> Payload:
+        with self._lock:
+            self._pending += 1
+        payload.job_id = self._job_id
+        payload.lane = self.lane
+        if payload.prefix_key is None:
+            payload.prefix_key = prefix_key(payload.data)
+        return payload
+
+    def _submit(self, payload: Payload):
+        self._pool.submit(self._prepare(payload))
+
+    async def _asubmit(self, payload: Payload):
+        await self._pool.asubmit(self._prepare(payload))
+
+    def _new_payload(self,
+                     data: dict,
+                     endpoint: Optional[str] = None,
+                     metadata: Optional[dict] = None,
+                     callback: Any = None,
+                     max_retries: Optional[int] = None,
+                     retry_multiplier: Optional[float] = None,
+                     retry_max: Optional[float] = None,
+                     cache: bool = True,
+                     on_delta: Optional[Callable[[str], None]] = None) -> Payload:
+        return Payload(
             endpoint=endpoint or self._endpoint,
             data={**self._data_template, **data},
             metadata={**self._metadata_template, **(metadata or {})},
             callback=callback,
             max_retries=max_retries or self._max_retries,
             retry_multiplier=retry_multiplier or self._retry_multiplier,
-            retry_max=retry_max or self._retry_max
+            retry_max=retry_max or self._retry_max,
+            cache=cache,
+            on_delta=on_delta
         )
-        self._in_queue.put(payload)
+
+    def request(self,
+                data: dict,
+                endpoint: Optional[str] = None,
+                metadata: Optional[dict] = None,
+                callback: Any = None,
+                max_retries: Optional[int] = None,
+                retry_multiplier: Optional[float] = None,
+                retry_max: Optional[float] = None,
+                cache: bool = True,
+                on_delta: Optional[Callable[[str], None]] = None):
+        self._submit(self._new_payload(
+            data, endpoint, metadata, callback, max_retries, retry_multiplier, retry_max, cache, on_delta
+        ))
+
+    async def arequest(self, data: dict, **kwargs):
+        """Like `request`, for callers running inside an event loop."""
+        await self._asubmit(self._new_payload(data, **kwargs))
 
     def pull_all(self):
         for _ in self:
@@ -192,8 +657,10 @@ class OpenAIMultiOrderedClient(OpenAIMultiClient):
             if self._stopped:
                 out = None
             else:
-                out = self._out_queue.get()
+                out = self._pool.run(self._out_queue.get())
             if out is None:
+                if not self._stopped:
+                    self._end_iteration()
                 self._stopped = True
                 if self._get_counter == self._put_counter:
                     raise StopIteration
@@ -217,14 +684,16 @@ class OpenAIMultiOrderedClient(OpenAIMultiClient):
                 out.call_callback()
                 return out
 
-    def request(self,
-                data: dict,
-                endpoint: Optional[str] = None,
-                metadata: Optional[dict] = None,
-                callback: Any = None,
-                max_retries: Optional[int] = None,
-                retry_multiplier: Optional[float] = None,
-                retry_max: Optional[float] = None):
+    def _new_payload(self,
+                     data: dict,
+                     endpoint: Optional[str] = None,
+                     metadata: Optional[dict] = None,
+                     callback: Any = None,
+                     max_retries: Optional[int] = None,
+                     retry_multiplier: Optional[float] = None,
+                     retry_max: Optional[float] = None,
+                     cache: bool = True,
+                     on_delta: Optional[Callable[[str], None]] = None) -> Payload:
         payload = OrderedPayload(
             endpoint=endpoint or self._endpoint,
             data={**self._data_template, **data},
@@ -233,7 +702,9 @@ class OpenAIMultiOrderedClient(OpenAIMultiClient):
             max_retries=max_retries or self._max_retries,
             retry_multiplier=retry_multiplier or self._retry_multiplier,
             retry_max=retry_max or self._retry_max,
+            cache=cache,
+            on_delta=on_delta,
             put_counter=self._put_counter
         )
         self._put_counter += 1
-        self._in_queue.put(payload)
\ No newline at end of file
+        return payload
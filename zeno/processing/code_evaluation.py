@@ -0,0 +1,207 @@
+"""Deterministic requirement evaluators that run without an LLM."""
+
+import ast
+import builtins
+import json
+import re
+from types import SimpleNamespace
+from typing import Any, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from zeno.classes.classes import CodeEvaluator, Requirement
+
+# Kinds that run code from the evaluator, only accepted from the project config.
+# The limits on that code below keep it to checks of the output, they are no
+# sandbox for code from anyone else.
+CODE_KINDS = {"python"}
+
+# Names python evaluators can use besides `output`. Of `re` and `json` only
+# functions, as the modules lead on to the modules they import.
+SAFE_RE = SimpleNamespace(
+    **{
+        name: getattr(re, name)
+        for name in "search match fullmatch findall sub split escape compile".split()
+    },
+    IGNORECASE=re.IGNORECASE,
+    MULTILINE=re.MULTILINE,
+    DOTALL=re.DOTALL,
+)
+SAFE_JSON = SimpleNamespace(loads=json.loads, dumps=json.dumps)
+SAFE_BUILTINS = {
+    name: getattr(builtins, name)
+    for name in (
+        "abs all any bool dict enumerate float int isinstance len list max min "
+        "range round set sorted str sum tuple zip"
+    ).split()
+}
+
+
+def _parse_json(output: str) -> Tuple[bool, Any, str]:
+    try:
+        return True, json.loads(output), ""
+    except ValueError as e:
+        return False, None, f"Output is not valid JSON: {e}"
+
+
+def _regex(evaluator: CodeEvaluator, text: pd.Series):
+    flags = re.IGNORECASE if evaluator.ignore_case else 0
+    found = text.str.contains(evaluator.pattern or "", flags=flags, regex=True)
+    scores = ~found if evaluator.negate else found
+    rationales = found.map(
+        {
+            True: f"Output matches /{evaluator.pattern}/.",
+            False: f"Output does not match /{evaluator.pattern}/.",
+        }
+    )
+    return scores, rationales
+
+
+def _length(evaluator: CodeEvaluator, text: pd.Series):
+    if evaluator.unit == "words":
+        lengths = text.str.split().str.len()
+    elif evaluator.unit == "chars":
+        lengths = text.str.len()
+    else:
+        raise ValueError(f"Unknown length unit {evaluator.unit}")
+    scores = pd.Series(True, index=text.index)
+    if evaluator.min_length is not None:
+        scores &= lengths >= evaluator.min_length
+    if evaluator.max_length is not None:
+        scores &= lengths <= evaluator.max_length
+    bounds = f"{evaluator.min_length or 0} to {evaluator.max_length or 'any'}"
+    rationales = lengths.map(
+        lambda n: f"Output has {n} {evaluator.unit}, required {bounds}."
+    )
+    return scores, rationales
+
+
+def _json(evaluator: CodeEvaluator, text: pd.Series):
+    parsed = text.map(_parse_json)
+    scores = parsed.map(lambda p: p[0])
+    rationales = parsed.map(lambda p: p[2] or "Output is valid JSON.")
+    return scores, rationales
+
+
+def _json_schema(evaluator: CodeEvaluator, text: pd.Series):
+    try:
+        import jsonschema
+    except ImportError as e:
+        raise ImportError(
+            "JSON schema evaluators need the jsonschema package: "
+            "pip install jsonschema"
+        ) from e
+    schema = evaluator.json_schema or {}
+    validator = jsonschema.validators.validator_for(schema)(schema)
+
+    def check(output: str) -> Tuple[bool, str]:
+        valid, value, error = _parse_json(output)
+        if not valid:
+            return False, error
+        error = jsonschema.exceptions.best_match(validator.iter_errors(value))
+        if error is not None:
+            return False, f"Output does not match the schema: {error.message}"
+        return True, "Output matches the schema."
+
+    checked = text.map(check)
+    return checked.map(lambda c: c[0]), checked.map(lambda c: c[1])
+
+
+# Attributes of generators, coroutines, tracebacks and frames, which lead
+# to the frames of the caller and so to its globals and builtins.
+FRAME_ATTRIBUTES = {
+    "gi_frame",
+    "gi_code",
+    "gi_yieldfrom",
+    "cr_frame",
+    "cr_code",
+    "cr_await",
+    "ag_frame",
+    "ag_code",
+    "ag_await",
+    "tb_frame",
+    "tb_next",
+    "f_back",
+    "f_globals",
+    "f_locals",
+    "f_builtins",
+    "f_code",
+}
+
+
+def _compile_python(code: str):
+    tree = ast.parse(code, "<requirement evaluator>", "eval")
+    for node in ast.walk(tree):
+        # Private attributes, dunder names and frames lead back to the builtins.
+        if (
+            isinstance(node, ast.Attribute)
+            and (node.attr.startswith("_") or node.attr in FRAME_ATTRIBUTES)
+        ) or (isinstance(node, ast.Name) and node.id.startswith("__")):
+            raise ValueError(f"Python evaluators can't use private names: {code}")
+    return compile(tree, "<requirement evaluator>", "eval")
+
+
+def _python(evaluator: CodeEvaluator, text: pd.Series):
+    code = _compile_python(evaluator.code or "None")
+    scope = {"__builtins__": SAFE_BUILTINS, "re": SAFE_RE, "json": SAFE_JSON}
+
+    def check(output: str) -> Tuple[Optional[bool], str]:
+        try:
+            result = eval(code, scope, {"output": output})
+        except Exception as e:
+            return None, f"Evaluator failed: {e!r}"
+        if result is None:
+            return None, "Evaluator left the output undecided."
+        return bool(result), f"`{evaluator.code}` is {bool(result)}."
+
+    checked = text.map(check)
+    return checked.map(lambda c: c[0]), checked.map(lambda c: c[1])
+
+
+EVALUATORS = {
+    "regex": _regex,
+    "length": _length,
+    "json": _json,
+    "json_schema": _json_schema,
+    "python": _python,
+}
+
+
+def run_code_evaluator(
+    evaluator: CodeEvaluator, outputs: pd.Series
+) -> Tuple[pd.Series, pd.Series]:
+    """Evaluate a column of model outputs with a deterministic evaluator.
+
+    Returns:
+        Tuple[pd.Series, pd.Series]: Scores, True, False or None for undecided
+        rows, and rationales, both indexed like outputs.
+    """
+    if evaluator.kind not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator kind {evaluator.kind}")
+    # Missing outputs are evaluated like empty ones.
+    text = outputs.astype(object).where(outputs.notna(), "").astype(str)
+    scores, rationales = EVALUATORS[evaluator.kind](evaluator, text)
+    return scores.astype(object), rationales.astype(object)
+
+
+def reject_untrusted_code(
+    requirements: Iterable[Requirement], trusted: Iterable[CodeEvaluator]
+):
+    """Raise for requirements that bring evaluators running code of their own.
+
+    Evaluators equal to a trusted one, i.e. one of the project config, pass,
+    so clients can send requirements back. Checked both when clients send
+    requirements and before code evaluators run, whatever path set them.
+    """
+    trusted = [evaluator.model_dump() for evaluator in trusted]
+    for requirement in requirements:
+        evaluator = requirement.evaluator
+        if (
+            evaluator is not None
+            and evaluator.kind in CODE_KINDS
+            and evaluator.model_dump() not in trusted
+        ):
+            raise ValueError(
+                f"Requirement {requirement.id} has a {evaluator.kind} evaluator, "
+                "which can only be set in the project config"
+            )
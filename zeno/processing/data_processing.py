@@ -1,17 +1,19 @@
 """Parallel processing functions for distill and inference pipelines."""
 
 import os
+import time
 from inspect import getsource
 from pathlib import Path
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import pandas as pd
-from tqdm import trange
+from tqdm import tqdm, trange
 
 from zeno.api import DistillReturn, ModelReturn, ZenoOptions
 from zeno.classes.base import DataProcessingReturn, ZenoColumn, ZenoColumnType
 from zeno.classes.classes import FilterIds, Prompt
-from zeno.util import load_series
+from zeno.processing import jobs
+from zeno.util import load_series, save_series
 
 
 def predistill_data(
@@ -46,6 +48,85 @@ def predistill_data(
     return [DataProcessingReturn(column=column, output=col)]
 
 
+# Rows of the first call of a model function when the chunk size adapts.
+INITIAL_CHUNK_SIZE = 100
+
+
+def next_chunk_size(size: int, rows: int, seconds: float, target_seconds: float) -> int:
+    """Rows of the next chunk, for a chunk of `rows` rows that took `seconds`.
+
+    Aims at `target_seconds` per chunk, growing at most twofold per chunk so a
+    slow row does not make the next chunk too large to hold or lose.
+    """
+    if seconds <= 0:
+        return size * 2
+    return max(1, min(size * 2, int(rows * target_seconds / seconds)))
+
+
+def load_model_fn(
+    fn: Callable[[str], Callable[[pd.DataFrame, ZenoOptions], ModelReturn]],
+    options: ZenoOptions,
+    model_name: str,
+    prompt: Prompt,
+    cache_path: str,
+) -> Tuple[Callable[[pd.DataFrame, ZenoOptions], ModelReturn], ZenoOptions]:
+    """Build the model function of a prompt, and the options to call it with."""
+    model_fn = fn(model_name, prompt.text)
+
+    # Make output folder if function uses output_path
+    src = getsource(model_fn)
+    if "output_path" in src:
+        model_hash = str(ZenoColumn(
+            column_type=ZenoColumnType.OUTPUT, name="output", model=model_name, prompt_id=prompt.version
+        ))
+        file_cache_path = os.path.join(cache_path, model_hash)
+        os.makedirs(file_cache_path, exist_ok=True)
+        options = options.copy(update={"output_path": file_cache_path})
+    return model_fn, options
+
+
+def infer_rows(
+    model_fn: Callable[[pd.DataFrame, ZenoOptions], ModelReturn],
+    options: ZenoOptions,
+    model_name: str,
+    prompt: Prompt,
+    rows: pd.DataFrame,
+) -> List[DataProcessingReturn]:
+    """Run a model function built by load_model_fn on some rows.
+
+    Returns the output, embedding and other returns of those rows only.
+    """
+    out = model_fn(rows, options)
+    ret = [
+        DataProcessingReturn(
+            column=ZenoColumn(
+                column_type=ZenoColumnType.OUTPUT, name="output", model=model_name, prompt_id=prompt.version
+            ),
+            output=pd.Series(list(out.model_output), index=rows.index),
+        )
+    ]
+    if out.embedding is not None:
+        ret.append(
+            DataProcessingReturn(
+                column=ZenoColumn(
+                    column_type=ZenoColumnType.EMBEDDING, name="embedding", model=model_name, prompt_id=prompt.version
+                ),
+                output=pd.Series(list(out.embedding), index=rows.index),
+            )
+        )
+    if out.other_returns is not None:
+        for k, v in out.other_returns.items():
+            ret.append(
+                DataProcessingReturn(
+                    column=ZenoColumn(
+                        column_type=ZenoColumnType.POSTDISTILL, name=k, model=model_name
+                    ),
+                    output=pd.Series(list(v), index=rows.index),
+                )
+            )
+    return ret
+
+
 def run_inference(
     fn: Callable[[str], Callable[[pd.DataFrame, ZenoOptions], ModelReturn]],
     options: ZenoOptions,
@@ -56,7 +137,15 @@ def run_inference(
     batch_size: int,
     pos: int,
     to_predict_indices: Optional[FilterIds] = None,
+    chunk_size: int = 0,
+    chunk_seconds: float = 30.0,
 ) -> List[DataProcessingReturn]:
+    """Run a model on the rows without output, or on to_predict_indices.
+
+    Rows are passed to the model function in chunks of chunk_size rows, or of
+    an adapted size if it is 0. The outputs are saved after every chunk, so
+    a rerun after a crash starts from the first chunk that was not saved.
+    """
     model_col_obj = ZenoColumn(
         column_type=ZenoColumnType.OUTPUT, name="output", model=model_name, prompt_id=prompt.version
     )
@@ -77,72 +166,74 @@ def run_inference(
         to_predict_indices = pd.Index(to_predict_indices.ids)
 
     other_return_cols: Dict[str, ZenoColumn] = {}
+    other_cols: Dict[str, pd.Series] = {}
     if len(to_predict_indices) > 0:
-        model_fn = fn(model_name, prompt.text)
-
-        # Make output folder if function uses output_path
-        src = getsource(model_fn)
-        if "output_path" in src:
-            file_cache_path = os.path.join(cache_path, model_hash)
-            os.makedirs(file_cache_path, exist_ok=True)
-            options = options.copy(update={"output_path": file_cache_path})
-        
-
-        out = model_fn(df.loc[to_predict_indices], options)
-
-        # for i in trange(
-        #     0,
-        #     len(to_predict_indices),
-        #     batch_size,
-        #     desc="Inference on " + model_name,
-        #     position=pos,
-        # ):
-        #     out = model_fn(df.loc[to_predict_indices[i : i + batch_size]], options)
-
-        # Check if we also get embedding
-        if out.embedding is not None:
-            for j, idx in enumerate(to_predict_indices):
-                model_col.at[idx] = out.model_output[j]  # noqa: PD008
-                embedding_col.at[idx] = out.embedding[j]  # noqa: PD008
-
-            embedding_col.to_pickle(str(embedding_save_path))
-        else:
-            model_col.loc[to_predict_indices] = out.model_output
-
-        if out.other_returns is not None:
-            for k, v in out.other_returns.items():
-                if i == 0:
-                    postdistill_col_obj = ZenoColumn(
-                        column_type=ZenoColumnType.POSTDISTILL,
-                        name=k,
-                        model=model_name,
-                    )
-                    other_return_cols[k] = postdistill_col_obj
-                    if str(postdistill_col_obj) not in df.columns:
-                        load_series(
-                            df,
-                            postdistill_col_obj,
-                            Path(cache_path, str(postdistill_col_obj) + ".pickle"),
+        jobs.add_total(len(to_predict_indices))
+        jobs.checkpoint()
+        model_fn, options = load_model_fn(fn, options, model_name, prompt, cache_path)
+
+        size = chunk_size if chunk_size > 0 else INITIAL_CHUNK_SIZE
+        start = 0
+        progress = tqdm(
+            total=len(to_predict_indices),
+            desc="Inference on " + model_name,
+            position=pos,
+        )
+        while start < len(to_predict_indices):
+            jobs.checkpoint()
+            chunk = to_predict_indices[start : start + size]
+            started_at = time.time()
+            out = model_fn(df.loc[chunk], options)
+
+            # Check if we also get embedding
+            if out.embedding is not None:
+                for j, idx in enumerate(chunk):
+                    model_col.at[idx] = out.model_output[j]  # noqa: PD008
+                    embedding_col.at[idx] = out.embedding[j]  # noqa: PD008
+
+                save_series(embedding_col, embedding_save_path)
+            else:
+                model_col.loc[chunk] = out.model_output
+
+            if out.other_returns is not None:
+                for k, v in out.other_returns.items():
+                    if k not in other_return_cols:
+                        postdistill_col_obj = ZenoColumn(
+                            column_type=ZenoColumnType.POSTDISTILL,
+                            name=k,
+                            model=model_name,
                         )
+                        other_return_cols[k] = postdistill_col_obj
+                        if str(postdistill_col_obj) not in df.columns:
+                            load_series(
+                                df,
+                                postdistill_col_obj,
+                                Path(cache_path, str(postdistill_col_obj) + ".pickle"),
+                            )
+                        other_cols[k] = df[str(postdistill_col_obj)].copy()
+
+                    other_cols[k].loc[chunk] = v
+                    save_series(
+                        other_cols[k],
+                        Path(cache_path, str(other_return_cols[k]) + ".pickle"),
+                    )
 
-                postdistill_col_obj = other_return_cols[k]
-                postdistill_hash = str(postdistill_col_obj)
-                postdistill_col = df[postdistill_hash].copy(deep=False)
-                postdistill_col.loc[
-                    to_predict_indices
-                ] = out.other_returns[k]
-                postdistill_save_path = Path(
-                    cache_path, postdistill_hash + ".pickle"
+            # Saved last, as rows with an output are skipped on a rerun.
+            save_series(model_col, model_save_path)
+            jobs.advance(len(chunk))
+            progress.update(len(chunk))
+            start += len(chunk)
+            if chunk_size <= 0:
+                size = next_chunk_size(
+                    size, len(chunk), time.time() - started_at, chunk_seconds
                 )
-                postdistill_col.to_pickle(str(postdistill_save_path))
-
-        model_col.to_pickle(str(model_save_path))
+        progress.close()
 
     ret = [DataProcessingReturn(column=model_col_obj, output=model_col)]
     if not embedding_col.isna().to_numpy().any():  # type: ignore
         ret.append(DataProcessingReturn(column=embedding_col_obj, output=embedding_col))
     for k, v in other_return_cols.items():
-        ret.append(DataProcessingReturn(column=v, output=df[str(v)]))
+        ret.append(DataProcessingReturn(column=v, output=other_cols[k]))
 
     return ret
 
@@ -0,0 +1,338 @@
+"""Background jobs with progress, pause, cancellation and a journal to resume them.
+
+Jobs stop cooperatively: code running inside a job calls `checkpoint()` where
+it is safe to stop, which waits while the job is paused and raises
+`JobCancelledError` once it is cancelled. LLM clients registered with `track` also
+hold back or drop their requests that have not started. Outside of a job, the
+functions of this module do nothing, so the same code runs with or without one.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from zeno.classes.classes import JobInfo
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+FAILED = "failed"
+
+UNFINISHED = (QUEUED, RUNNING, PAUSED)
+
+
+class JobCancelledError(Exception):
+    """Raised inside a job at its next checkpoint once it is cancelled."""
+
+
+_current: contextvars.ContextVar[Optional["Job"]] = contextvars.ContextVar(
+    "zeno_job", default=None
+)
+
+
+def checkpoint():
+    """Wait while the current job is paused, raise if it is cancelled."""
+    job = _current.get()
+    if job is not None:
+        job.checkpoint()
+
+
+def add_total(rows: int):
+    """Add rows the current job has to process."""
+    job = _current.get()
+    if job is not None:
+        job.add_total(rows)
+
+
+def advance(rows: int = 1):
+    """Count rows of the current job as done."""
+    job = _current.get()
+    if job is not None:
+        job.advance(rows)
+
+
+def track(client):
+    """Pause and cancel an LLM client along with the current job."""
+    job = _current.get()
+    if job is not None:
+        job.track(client)
+
+
+class Job:
+    """A running job, its progress and the LLM clients it sends requests with."""
+
+    def __init__(self, info: JobInfo):
+        self.info = info
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._cancelled = threading.Event()
+        self._clients: "weakref.WeakSet" = weakref.WeakSet()
+        if info.status != PAUSED:
+            self._running.set()
+
+    @property
+    def id(self) -> str:
+        return self.info.id
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def add_total(self, rows: int):
+        with self._lock:
+            self.info.rows_total += rows
+
+    def advance(self, rows: int = 1):
+        with self._lock:
+            self.info.rows_done += rows
+
+    def track(self, client):
+        with self._lock:
+            self._clients.add(client)
+        if self.cancelled:
+            client.cancel()
+        elif not self._running.is_set():
+            client.pause()
+
+    def checkpoint(self):
+        self._running.wait()
+        if self.cancelled:
+            raise JobCancelledError(self.id)
+
+    def pause(self):
+        self._running.clear()
+        for client in list(self._clients):
+            client.pause()
+
+    def resume(self):
+        for client in list(self._clients):
+            client.resume()
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        for client in list(self._clients):
+            client.cancel()
+        # Let paused jobs reach their checkpoint and stop.
+        self._running.set()
+
+    def update(self, **changes) -> JobInfo:
+        with self._lock:
+            self.info = self.info.model_copy(update=changes)
+            return self.info
+
+    def set_status(self, status: str, keep=()) -> bool:
+        """Change the status of an unfinished job, unless it is one of `keep`."""
+        with self._lock:
+            if self.info.status not in UNFINISHED or self.info.status in keep:
+                return False
+            self.info = self.info.model_copy(update={"status": status})
+            return True
+
+    def state(self) -> JobInfo:
+        calls = sum(client.in_flight for client in list(self._clients))
+        with self._lock:
+            return self.info.model_copy(update={"calls_in_flight": calls})
+
+
+class JobManager:
+    """Runs jobs on threads of their own and journals them to a JSON Lines file.
+
+    The journal holds every job that is not finished and the latest `keep`
+    finished ones. After a restart, `resume_unfinished` starts the unfinished
+    jobs again. They are expected to skip work done before, e.g. rows whose
+    results are cached, and restart their progress counters.
+    """
+
+    def __init__(self, path: str, keep: int = 100):
+        self.path = Path(os.path.expanduser(path))
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._infos: Dict[str, JobInfo] = {info.id: info for info in self._read()}
+
+    def _read(self) -> List[JobInfo]:
+        try:
+            with open(self.path) as f:
+                return [JobInfo.model_validate_json(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _write(self):
+        finished = [i for i in self._infos.values() if i.status not in UNFINISHED]
+        finished.sort(key=lambda i: i.ended_at or 0)
+        for info in finished[: max(0, len(finished) - self.keep)]:
+            del self._infos[info.id]
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            for info in self._infos.values():
+                f.write(info.model_dump_json() + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _update(self, job: Job, **changes):
+        # Under the lock, so a status that is read is also journaled.
+        with self._lock:
+            self._infos[job.id] = job.update(**changes)
+            self._write()
+
+    def submit(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        target: Callable[[], Any],
+        persist: bool = True,
+        job_id: Optional[str] = None,
+        paused: bool = False,
+        created_at: Optional[float] = None,
+        parent_id: Optional[str] = None,
+    ) -> JobInfo:
+        """Run `target` as a job in the background.
+
+        While an identical job is unfinished, that job is returned instead. Jobs
+        that are not persisted are left out of the journal and never resumed.
+        What `target` returns becomes the result of the job, pydantic models as
+        JSON-compatible dicts.
+
+        New jobs submitted from within a job are its children, see `cancel`.
+        Resumed jobs, submitted with their `job_id`, keep their `parent_id`.
+        """
+        parent = _current.get()
+        if job_id is None and parent is not None:
+            parent_id = parent.id
+        with self._lock:
+            for job in self._jobs.values():
+                if (
+                    job.info.kind == kind
+                    and job.info.request == request
+                    and job.info.status in UNFINISHED
+                ):
+                    return job.state()
+            job = Job(
+                JobInfo(
+                    id=job_id or uuid.uuid4().hex[:12],
+                    kind=kind,
+                    request=request,
+                    status=PAUSED if paused else QUEUED,
+                    created_at=created_at or time.time(),
+                    parent_id=parent_id,
+                )
+            )
+            self._jobs[job.id] = job
+            if persist:
+                self._infos[job.id] = job.info
+                self._write()
+        thread = threading.Thread(
+            target=self._run, args=(job, target, persist), daemon=True
+        )
+        thread.start()
+        return job.state()
+
+    def _run(self, job: Job, target: Callable[[], Any], persist: bool):
+        update = self._update if persist else Job.update
+        _current.set(job)
+        try:
+            job.checkpoint()
+            update(job, status=RUNNING, started_at=time.time())
+            result = target()
+        except JobCancelledError:
+            update(job, status=CANCELLED, ended_at=time.time())
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.info.kind}) failed")
+            update(job, status=FAILED, error=repr(e), ended_at=time.time())
+        else:
+            # Cancelled after its last checkpoint, the job may have dropped requests.
+            status = CANCELLED if job.cancelled else DONE
+            if isinstance(result, BaseModel):
+                # As the API sends it, so clients read it like the direct response.
+                result = result.model_dump(mode="json", by_alias=True)
+            update(job, status=status, result=result, ended_at=time.time())
+
+    def resume_unfinished(self, targets: Dict[str, Callable[[Dict[str, Any]], Any]]):
+        """Start the unfinished jobs of the journal again, by kind.
+
+        Paused jobs stay paused. Jobs of a kind without a target fail.
+        """
+        with self._lock:
+            unfinished = [
+                info
+                for info in self._infos.values()
+                if info.status in UNFINISHED and info.id not in self._jobs
+            ]
+        for info in unfinished:
+            if info.kind not in targets:
+                with self._lock:
+                    self._infos[info.id] = info.model_copy(
+                        update=dict(
+                            status=FAILED,
+                            error=f"No job of kind {info.kind} to resume",
+                            ended_at=time.time(),
+                        )
+                    )
+                    self._write()
+                continue
+            logger.info(f"Resuming job {info.id} ({info.kind})")
+            self.submit(
+                info.kind,
+                info.request,
+                lambda target=targets[info.kind], request=info.request: target(request),
+                job_id=info.id,
+                paused=info.status == PAUSED,
+                created_at=info.created_at,
+                parent_id=info.parent_id,
+            )
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._infos.get(job_id)
+            return job.state()
+
+    def list(self) -> List[JobInfo]:
+        with self._lock:
+            infos = dict(self._infos)
+            for job in self._jobs.values():
+                infos[job.id] = job.state()
+        return sorted(infos.values(), key=lambda i: i.created_at)
+
+    def pause(self, job_id: str) -> Optional[JobInfo]:
+        return self._control(job_id, Job.pause, PAUSED)
+
+    def resume(self, job_id: str) -> Optional[JobInfo]:
+        # A queued job stays queued until its thread starts it.
+        return self._control(job_id, Job.resume, RUNNING, keep=(QUEUED,))
+
+    def cancel(self, job_id: str) -> Optional[JobInfo]:
+        """Cancel a job and the jobs it started, also once it is finished itself."""
+        return self._control(job_id, Job.cancel, None)
+
+    def _control(self, job_id: str, action, status: Optional[str], keep=()):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            children = [j.id for j in self._jobs.values() if j.info.parent_id == job_id]
+        for child in children:
+            self._control(child, action, status, keep)
+        if job is None:
+            return self.get(job_id)
+        if job.info.status not in UNFINISHED:
+            return job.state()
+        action(job)
+        if status is not None:
+            with self._lock:
+                if job.set_status(status, keep) and job.id in self._infos:
+                    self._infos[job.id] = job.info
+                    self._write()
+        return job.state()
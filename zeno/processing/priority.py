@@ -0,0 +1,60 @@
+"""Rows the user is looking at, to infer and evaluate before the others."""
+
+import threading
+from typing import Callable, Hashable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# Ranks of rows, lower first.
+DISPLAYED = 0
+FOCUSED = 1
+OTHER = 2
+
+
+class PriorityHints:
+    """Displayed rows, then rows of the active slice, then the rest.
+
+    `ordered` yields work in this order and re-sorts what is left whenever the
+    hints change, so work that is already running follows the user as well.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._displayed: frozenset = frozenset()
+        self._focused: frozenset = frozenset()
+        self.version = 0
+
+    def update(self, displayed: Iterable[Hashable], focused: Iterable[Hashable] = ()):
+        """Set the ids on screen and the ids of the slice or tags they are from."""
+        displayed = frozenset(displayed)
+        focused = frozenset(focused)
+        with self._lock:
+            if displayed == self._displayed and focused == self._focused:
+                return
+            self._displayed = displayed
+            self._focused = focused
+            self.version += 1
+
+    def rank(self, i: Hashable) -> int:
+        if i in self._displayed:
+            return DISPLAYED
+        if i in self._focused:
+            return FOCUSED
+        return OTHER
+
+    def sort(self, ids: Iterable[Hashable]) -> list:
+        """Ids by rank, keeping their order within a rank."""
+        return sorted(ids, key=self.rank)
+
+    def ordered(
+        self, items: Iterable[T], key: Callable[[T], Hashable] = lambda i: i
+    ) -> Iterator[T]:
+        """Yield items by the rank of their id, re-sorting when the hints change."""
+        # Reversed, so the next item is popped from the end.
+        remaining = list(enumerate(items))[::-1]
+        version = None
+        while remaining:
+            if version != self.version:
+                version = self.version
+                remaining.sort(key=lambda p: (self.rank(key(p[1])), p[0]), reverse=True)
+            yield remaining.pop()[1]
@@ -0,0 +1,63 @@
+"""Stratified sampling and confidence intervals for partial evaluations."""
+
+import math
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def stratified_order(
+    index: pd.Index, strata: Optional[pd.Series] = None, seed: int = 0
+) -> List[Hashable]:
+    """Random order of the rows in which every prefix is a stratified sample.
+
+    Each stratum is shuffled and spread evenly over the order, so the first k
+    rows hold about k * size / len(index) rows of a stratum. Without strata,
+    the rows are split into ten strata by their position, which keeps samples
+    spread over the dataset when its order is meaningful.
+    """
+    if len(index) == 0:
+        return []
+    rng = np.random.default_rng(seed)
+    if strata is None:
+        groups = pd.Series(np.arange(len(index)) * 10 // len(index), index=index)
+    else:
+        groups = strata.reindex(index).astype(str)
+
+    ids = []
+    positions = []
+    for _, members in groups.groupby(groups, sort=True):
+        members = members.index.to_numpy()
+        rng.shuffle(members)
+        ids.extend(members)
+        # Evenly spaced slots in [0, 1), jittered so strata interleave.
+        positions.extend((np.arange(len(members)) + rng.random()) / len(members))
+    order = np.argsort(np.array(positions), kind="stable")
+    return [ids[i] for i in order]
+
+
+def proportion_interval(
+    successes: int, n: int, population: Optional[int] = None, z: float = 1.96
+) -> Tuple[float, float]:
+    """Wilson interval of a pass rate, with finite population correction.
+
+    Once the sample covers the whole population the interval is the observed
+    pass rate itself.
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    if population is not None and n >= population:
+        return p, p
+    effective_n = float(n)
+    if population is not None and population > 1:
+        effective_n = n * (population - 1) / (population - n)
+    denominator = 1 + z**2 / effective_n
+    center = (p + z**2 / (2 * effective_n)) / denominator
+    spread = (
+        z
+        * math.sqrt(p * (1 - p) / effective_n + z**2 / (4 * effective_n**2))
+        / denominator
+    )
+    return max(0.0, center - spread), min(1.0, center + spread)
@@ -0,0 +1,70 @@
+"""Sequential test for comparing the pass rates of two prompt versions."""
+
+import math
+from statistics import NormalDist
+from typing import Optional
+
+from zeno.processing.sampling import proportion_interval
+
+BETTER = "better"
+WORSE = "worse"
+SAME = "same"
+UNDECIDED = "undecided"
+
+
+def paired_sequential_test(
+    better: int,
+    worse: int,
+    effect: float,
+    alpha: float,
+    beta: float,
+    rows: int = 0,
+    margin: float = 0.0,
+    population: Optional[int] = None,
+) -> str:
+    """Decide between two prompt versions evaluated on the same rows.
+
+    Only discordant rows carry information: `better` rows pass with the
+    candidate but fail with the baseline, `worse` rows the other way around.
+    Without a difference either kind is equally likely. Two one-sided Wald
+    SPRTs test this against the candidate winning a 0.5 + effect share of the
+    discordant rows, or losing it.
+
+    Prompts that rarely disagree leave both SPRTs undecided, so the versions
+    are also the same once the upper confidence bound of the share of
+    discordant rows among all `rows` paired rows is below `margin`.
+
+    Args:
+        better (int): Rows only the candidate passes.
+        worse (int): Rows only the baseline passes.
+        effect (float): Share above 0.5 of discordant rows that counts as a
+            difference, in (0, 0.5).
+        alpha (float): Error rate of calling a difference that is not there,
+            per direction.
+        beta (float): Error rate of missing a difference of `effect`.
+        rows (int): Rows evaluated with both prompts, discordant or not.
+        margin (float): Share of discordant rows below which the versions are
+            the same, 0 to only decide by the SPRTs.
+        population (int, optional): Rows there are to pair, for the finite
+            population correction of the bound.
+
+    Returns:
+        str: "better", "worse", "same" or "undecided" if more rows are needed.
+    """
+    p = 0.5 + effect
+    accept = math.log((1 - beta) / alpha)
+    reject = math.log(beta / (1 - alpha))
+    llr_better = better * math.log(p / 0.5) + worse * math.log((1 - p) / 0.5)
+    llr_worse = worse * math.log(p / 0.5) + better * math.log((1 - p) / 0.5)
+    if llr_better >= accept:
+        return BETTER
+    if llr_worse >= accept:
+        return WORSE
+    if llr_better <= reject and llr_worse <= reject:
+        return SAME
+    if rows > 0 and margin > 0:
+        z = NormalDist().inv_cdf(1 - alpha)
+        _, high = proportion_interval(better + worse, rows, population, z)
+        if high < margin:
+            return SAME
+    return UNDECIDED
@@ -105,18 +105,64 @@ Prompt: '''{prompt}'''
 Requirements:
 """
 
+# The evaluation prompt is split so that everything shared by the rows of one
+# requirement comes first and forms a stable prefix for provider-side prompt
+# caching. The model output is sent last, in its own message.
 REQUIREMENT_EVALUATION_PROMPT = """
 Answer 1 for yes and 0 for no. 
-Given the prompt '''${prompt}''' and requirement '''${requirement}''', follow the evaluation method to determine if the model output fulfills the requirement: '''${evaluation_method}'''? Give a rationale to explain your answer.
-Model Output: '''${modelOutput} '''
+Given the prompt '''{prompt}''' and requirement '''{requirement}''', follow the evaluation method to determine if the model output fulfills the requirement: '''{evaluation_method}'''? Give a rationale to explain your answer.
+{examples}
 The output format should be:
     {{ 
         "modelOutput": evaluated_model_output, 
         "pass/fail": 0 or 1
         "rationale":
     }}
+The model output to evaluate is given in the next message.
 """
 
+REQUIREMENT_EVALUATION_OUTPUT_PROMPT = """Model Output: '''{modelOutput} '''"""
+
+REQUIREMENT_EVALUATION_PACKED_PROMPT = """Evaluate each of the following model outputs separately, instead of the single model output described above.
+The output format should be:
+    {{
+        "results": [
+            {{
+                "id": id of the model output,
+                "pass/fail": 0 or 1,
+                "rationale":
+            }}
+        ]
+    }}
+with one result for every model output.
+
+{modelOutputs}"""
+
+REQUIREMENT_EVALUATION_PACKED_OUTPUT_PROMPT = """Model Output {id}: '''{modelOutput} '''"""
+
+REQUIREMENTS_EVALUATION_PROMPT = """
+Answer 1 for yes and 0 for no, for each requirement below.
+Given the prompt '''{prompt}''', follow the evaluation method of each requirement to determine if the model output fulfills the requirement. Give a rationale to explain each answer.
+
+{requirements}
+The output format should be:
+    {{
+        "results": [
+            {{
+                "id": id of the requirement,
+                "pass/fail": 0 or 1,
+                "rationale":
+            }}
+        ]
+    }}
+with one result for every requirement.
+The model output to evaluate is given in the next message.
+"""
+
+REQUIREMENTS_EVALUATION_ITEM_PROMPT = """Requirement {id}: '''{requirement}'''
+Evaluation method: '''{evaluation_method}'''
+{examples}"""
+
 REQUIREMENT_SUGGESTION_PROMPT = """You are an experienced requirement engineer for an LLM application. Given the prompt, current requirements, and example inputs and outputs, suggest new requirements.
 
 ---
@@ -5,9 +5,9 @@ and the static files for the frontend.
 
 import asyncio
 import os
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 
@@ -15,12 +15,19 @@ from zeno.backend import ZenoBackend
 from zeno.classes.base import ZenoColumn
 from zeno.classes.classes import (
     ColorsProjectRequest,
+    DeadLetter,
     EmbedProject2DRequest,
     EntryRequest,
     InferenceRequest,
+    JobInfo,
     FeedbackRequest,
+    LLMEndpointState,
+    LLMStreamEvent,
+    LLMTelemetryRollup,
     MetricRequest,
     PlotRequest,
+    PromptComparisonRequest,
+    RateLimitState,
     StatusResponse,
     TableRequest,
     ZenoSettings,
@@ -57,6 +64,12 @@ def custom_generate_unique_id(route: APIRoute):
     return route.name
 
 
+def job_or_404(job: Optional[JobInfo], job_id: str) -> JobInfo:
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job with id={job_id} not found")
+    return job
+
+
 def get_server(zeno: ZenoBackend):
     app = FastAPI(title="Frontend API")
     api_app = FastAPI(
@@ -129,12 +142,68 @@ def get_server(zeno: ZenoBackend):
 
     @api_app.post("/prompt", response_model=List[Prompt], tags=["zeno"])
     def create_new_prompt(req: Prompt):
-        prompt = zeno.create_new_prompt(req)
+        try:
+            prompt = zeno.create_new_prompt(req)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         return [prompt]
 
-    @api_app.post("/run-prompt", tags=["zeno"])
+    @api_app.post("/run-prompt", response_model=JobInfo, tags=["zeno"])
     def run_prompt(req: InferenceRequest):
-        zeno.run_prompt(req)
+        return zeno.start_job("run_prompt", req)
+
+    @api_app.get("/jobs", response_model=List[JobInfo], tags=["zeno"])
+    def get_jobs():
+        return zeno.jobs.list()
+
+    @api_app.get("/jobs/{job_id}", response_model=JobInfo, tags=["zeno"])
+    def get_job(job_id: str):
+        return job_or_404(zeno.jobs.get(job_id), job_id)
+
+    @api_app.post("/jobs/{job_id}/cancel", response_model=JobInfo, tags=["zeno"])
+    def cancel_job(job_id: str):
+        return job_or_404(zeno.jobs.cancel(job_id), job_id)
+
+    @api_app.post("/jobs/{job_id}/pause", response_model=JobInfo, tags=["zeno"])
+    def pause_job(job_id: str):
+        return job_or_404(zeno.jobs.pause(job_id), job_id)
+
+    @api_app.post("/jobs/{job_id}/resume", response_model=JobInfo, tags=["zeno"])
+    def resume_job(job_id: str):
+        return job_or_404(zeno.jobs.resume(job_id), job_id)
+
+    @api_app.post("/compare-prompts", response_model=JobInfo, tags=["zeno"])
+    def compare_prompts(req: PromptComparisonRequest):
+        # The PromptComparison is the result of the job.
+        return zeno.start_job("compare_prompts", req)
+
+    @api_app.get("/llm-rate-limit", response_model=RateLimitState, tags=["zeno"])
+    def get_llm_rate_limit():
+        return zeno.llm_rate_limiter.state()
+
+    @api_app.get(
+        "/llm-endpoints", response_model=List[LLMEndpointState], tags=["zeno"]
+    )
+    def get_llm_endpoints():
+        return zeno.llm_pool.endpoints.states()
+
+    @api_app.get(
+        "/llm-telemetry", response_model=List[LLMTelemetryRollup], tags=["zeno"]
+    )
+    def get_llm_telemetry():
+        return zeno.llm_telemetry.rollup()
+
+    @api_app.post("/llm-telemetry/dump", response_model=str, tags=["zeno"])
+    def dump_llm_telemetry():
+        return zeno.dump_llm_telemetry()
+
+    @api_app.get("/dead-letters", response_model=List[DeadLetter], tags=["zeno"])
+    def get_dead_letters():
+        return zeno.llm_dead_letters.get()
+
+    @api_app.post("/resume-evaluation", response_model=JobInfo, tags=["zeno"])
+    def resume_evaluation(req: InferenceRequest):
+        return zeno.start_job("resume_evaluation", req)
 
     @api_app.get("/requirements", response_model=Dict[str, Requirement], tags=["zeno"])
     def get_requirements():
@@ -307,4 +376,17 @@ def get_server(zeno: ZenoBackend):
                     ).json(by_alias=True)
                 )
 
+    @api_app.websocket("/llm-stream")
+    async def llm_stream_websocket(websocket: WebSocket):
+        await websocket.accept()
+        events = zeno.llm_streams.subscribe()
+        try:
+            while True:
+                event: LLMStreamEvent = await events.get()
+                await websocket.send_json(event.json(by_alias=True))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            zeno.llm_streams.unsubscribe(events)
+
     return app
@@ -0,0 +1,468 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from zeno.api import ModelReturn, ZenoParameters
+from zeno.backend import ZenoBackend
+from zeno.classes.classes import (
+    CodeEvaluator,
+    InferenceRequest,
+    Prompt,
+    PromptComparison,
+    PromptComparisonRequest,
+    Requirement,
+)
+from zeno.classes.slice import FilterIds
+from zeno.llm.evaluation_store import output_key
+from zeno.llm.mock import MockLLM
+from zeno.llm.scheduler import Lane
+from zeno.tests.test_code_evaluation import frame_escape
+from zeno.tests.test_openai_client import FailingBatchBackend
+from zeno.util import read_series, save_series
+
+ROWS = 40
+
+
+def predict(model, prompt):
+    def fn(df, ops):
+        return ModelReturn(model_output=[f"out {i}" for i in df.index])
+
+    return fn
+
+
+def make_backend(tmp_path, mock=None, requirements=2, **params):
+    metadata = pd.DataFrame(
+        {"id": range(ROWS), "text": [f"input {i}" for i in range(ROWS)]}
+    )
+    prompt = Prompt(
+        text="p",
+        version="v0",
+        requirements={
+            str(r): Requirement(
+                id=str(r),
+                name=f"r{r}",
+                description=f"requirement {r}",
+                prompt_snippet="",
+                evaluation_method="m",
+            )
+            for r in range(requirements)
+        },
+    )
+    backend = ZenoBackend(
+        ZenoParameters(
+            metadata=metadata,
+            view="text-classification",
+            data_column="text",
+            id_column="id",
+            cache_path=str(tmp_path),
+            models=["m"],
+            prompts={"v0": prompt},
+            llm_custom_api=mock or MockLLM(),
+            multiprocessing=False,
+            **params,
+        )
+    )
+    backend.predict_function = predict
+    return backend
+
+
+def wait_for_job(backend, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while backend.jobs.get(job_id).status not in ("done", "failed", "cancelled"):
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return backend.jobs.get(job_id)
+
+
+def scores(backend, requirement_id, prompt_id="v0"):
+    return backend.df[f"POSTDISTILLevalR{requirement_id}m_{prompt_id}"]
+
+
+@pytest.fixture()
+def close_backends():
+    backends = []
+    yield backends.append
+    for backend in backends:
+        backend.llm_pool.close()
+
+
+def test_rows_a_retry_cannot_evaluate_are_dead_lettered(tmp_path, close_backends):
+    mock = MockLLM(
+        responders=[
+            # Packs with row 3 miss it, and the single-row retry is invalid.
+            (r"Model Output 3: ", '{"results": []}'),
+            (r"Model Output: '''out 3 '''", '{"pass/fail": "maybe"}'),
+        ]
+    )
+    backend = make_backend(tmp_path, mock, requirements=1, evaluation_pack_tokens=1000)
+    close_backends(backend)
+
+    job = backend.start_job("run_prompt", InferenceRequest(model="m", prompt_id="v0"))
+    info = wait_for_job(backend, job.id)
+
+    assert info.status == "done"
+    assert info.rows_done == info.rows_total
+    assert list(scores(backend, "0").index[scores(backend, "0").isna()]) == [3]
+    letters = backend.llm_dead_letters.get("POSTDISTILLevalR0m_v0")
+    assert [letter.num for letter in letters] == [3]
+
+
+def test_concurrent_requirement_jobs_match_a_sequential_run(tmp_path, close_backends):
+    def evaluations(backend, path):
+        result = {}
+        for r in map(str, range(6)):
+            for name in (f"evalR{r}", f"evalR{r}Rationale"):
+                column = f"POSTDISTILL{name}m_v0"
+                saved = read_series(path / f"{column}.pickle", backend.df.index)
+                # The saved columns hold every result, not those of one job.
+                assert saved.tolist() == backend.df[column].tolist()
+                result[name] = saved.tolist()
+        return result
+
+    results = []
+    for parallel_jobs in (1, 6):
+        path = tmp_path / str(parallel_jobs)
+        backend = make_backend(
+            path,
+            MockLLM(latency=0.005),
+            requirements=6,
+            parallel_jobs=parallel_jobs,
+            evaluation_flush_every=3,
+            pipeline_chunk_size=0,
+        )
+        close_backends(backend)
+        backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+        results.append(evaluations(backend, path))
+
+    sequential, concurrent = results
+    for values in concurrent.values():
+        assert pd.notna(values).all()
+    assert concurrent == sequential
+    assert set(sequential["evalR0"]) == {True, False}
+
+
+def test_new_prompts_cannot_bring_their_own_code(tmp_path, close_backends):
+    backend = make_backend(tmp_path)
+    close_backends(backend)
+    prompt = backend.prompts["v0"].model_copy(deep=True)
+    prompt.requirements["0"].evaluator = CodeEvaluator(kind="python", code="True")
+
+    with pytest.raises(ValueError):
+        backend.create_new_prompt(prompt)
+    assert list(backend.prompts) == ["v0"]
+
+
+def test_code_outside_the_config_does_not_run(tmp_path, close_backends):
+    backend = make_backend(tmp_path, requirements=1)
+    close_backends(backend)
+    backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+    # E.g. set by a requirement update, or in a prompts.pickle of the cache.
+    path = tmp_path / "pwned"
+    evaluator = CodeEvaluator(kind="python", code=frame_escape(path))
+    backend.prompts["v0"].requirements["0"].evaluator = evaluator
+
+    with pytest.raises(ValueError):
+        backend.evaluate_requirement("m", "v0", "0", FilterIds(ids=[0]))
+    assert not path.exists()
+
+
+def test_concurrent_evaluations_of_a_requirement_keep_each_others_rows(
+    tmp_path, close_backends
+):
+    backend = make_backend(
+        tmp_path,
+        MockLLM(latency=0.002),
+        requirements=1,
+        evaluation_sample_size=4,
+        evaluation_target_ci=1.0,
+        evaluation_flush_every=2,
+        pipeline_chunk_size=0,
+    )
+    close_backends(backend)
+    backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+    assert scores(backend, "0").notna().sum() == 4
+
+    # E.g. a refinement in the background and rows the user runs.
+    missing = list(scores(backend, "0").index[scores(backend, "0").isna()])
+    threads = [
+        threading.Thread(
+            target=backend.evaluate_requirement,
+            args=("m", "v0", "0", FilterIds(ids=missing[i::2])),
+        )
+        for i in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for column in ("POSTDISTILLevalR0m_v0", "POSTDISTILLevalR0Rationalem_v0"):
+        assert backend.df[column].notna().all()
+        saved = read_series(tmp_path / f"{column}.pickle", backend.df.index)
+        assert saved.tolist() == backend.df[column].tolist()
+
+
+def test_prompt_comparisons_run_as_jobs(tmp_path, close_backends):
+    backend = make_backend(tmp_path, comparison_batch_size=10)
+    close_backends(backend)
+    backend.prompts["v1"] = backend.prompts["v0"].model_copy(
+        update={"text": "q", "version": "v1"}
+    )
+
+    job = backend.start_job(
+        "compare_prompts",
+        PromptComparisonRequest(
+            model="m", baseline_prompt_id="v0", candidate_prompt_id="v1"
+        ),
+    )
+    assert job.id in [j.id for j in backend.jobs.list()]
+    info = wait_for_job(backend, job.id)
+
+    assert info.status == "done"
+    comparison = PromptComparison.model_validate(info.result)
+    assert comparison.candidate_prompt_id == "v1"
+    assert [r.requirement_id for r in comparison.requirements] == ["0", "1"]
+    assert "candidatePromptId" in info.result
+
+
+def test_refinement_is_a_job_cancelled_with_the_run_that_started_it(
+    tmp_path, close_backends
+):
+    mock = MockLLM(latency=0.05)
+    backend = make_backend(
+        tmp_path, mock, requirements=1, evaluation_sample_size=2, parallel_jobs=1
+    )
+    close_backends(backend)
+
+    run = backend.start_job("run_prompt", InferenceRequest(model="m", prompt_id="v0"))
+    assert wait_for_job(backend, run.id).status == "done"
+    [refinement] = [j for j in backend.jobs.list() if j.kind == "refine_evaluation"]
+    assert refinement.parent_id == run.id
+
+    backend.jobs.cancel(run.id)
+    assert wait_for_job(backend, refinement.id).status == "cancelled"
+    calls = mock.calls
+    time.sleep(0.2)
+    assert mock.calls == calls
+    assert scores(backend, "0").isna().any()
+
+
+def test_pipelined_runs_match_unpipelined_runs(tmp_path, close_backends):
+    results = []
+    for chunk_size in (0, 7):
+        path = tmp_path / str(chunk_size)
+        backend = make_backend(path, pipeline_chunk_size=chunk_size)
+        close_backends(backend)
+        built = []
+
+        def counting_predict(model, prompt):
+            built.append(prompt)
+            return predict(model, prompt)
+
+        backend.predict_function = counting_predict
+        backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+
+        assert built == ["p"]
+        columns = ["OUTPUToutputm_v0"] + [
+            f"POSTDISTILL{name}m_v0"
+            for r in range(2)
+            for name in (f"evalR{r}", f"evalR{r}Rationale")
+        ]
+        for column in columns:
+            saved = read_series(path / f"{column}.pickle", backend.df.index)
+            assert saved.tolist() == backend.df[column].tolist()
+        assert not (path / "OUTPUToutputm_v0.pickle.rows").exists()
+        results.append(backend.df[columns])
+
+    unpipelined, pipelined = results
+    assert pipelined.notna().all().all()
+    pd.testing.assert_frame_equal(pipelined, unpipelined)
+
+
+def test_rows_without_output_share_no_verdict(tmp_path, close_backends):
+    backend = make_backend(tmp_path, requirements=1, pipeline_chunk_size=0)
+    close_backends(backend)
+    first = InferenceRequest(
+        model="m", prompt_id="v0", filter_ids=FilterIds(ids=[0, 1])
+    )
+    backend.run_prompt(first)
+    # A row evaluated before it has an output.
+    backend.evaluate_requirement("m", "v0", "0", FilterIds(ids=[2]))
+    [stored] = backend.llm_evaluations._loaded.values()
+    assert len(stored) == 2
+    assert output_key(pd.NA) not in stored
+
+    backend.prompts["v1"] = backend.prompts["v0"].model_copy(update={"version": "v1"})
+    backend.run_prompt(first.model_copy(update={"prompt_id": "v1"}))
+    assert scores(backend, "0", "v1").notna().tolist() == [True, True] + [False] * (
+        ROWS - 2
+    )
+
+
+def test_stored_evaluations_hash_outputs_once(tmp_path, close_backends, monkeypatch):
+    backend = make_backend(tmp_path, pipeline_chunk_size=0)
+    close_backends(backend)
+    backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+
+    hashed = []
+    monkeypatch.setattr(
+        "zeno.backend.output_key", lambda output: hashed.append(output) or "key"
+    )
+    for _ in range(3):
+        backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+    assert hashed == []
+    assert scores(backend, "0").notna().all()
+
+
+def test_comparisons_of_identical_prompts_stop_as_the_same(tmp_path, close_backends):
+    backend = make_backend(tmp_path, comparison_batch_size=10)
+    close_backends(backend)
+    built = []
+
+    def counting_predict(model, prompt):
+        built.append(prompt)
+        return predict(model, prompt)
+
+    backend.predict_function = counting_predict
+    backend.prompts["v1"] = backend.prompts["v0"].model_copy(update={"version": "v1"})
+
+    comparison = backend.compare_prompts(
+        PromptComparisonRequest(
+            model="m", baseline_prompt_id="v0", candidate_prompt_id="v1"
+        )
+    )
+
+    assert comparison.stopped_early
+    assert [r.decision for r in comparison.requirements] == ["same", "same"]
+    assert built == ["p", "p"]
+    saved = read_series(tmp_path / "OUTPUToutputm_v1.pickle", backend.df.index)
+    assert saved.notna().sum() == comparison.rows
+    assert not (tmp_path / "OUTPUToutputm_v1.pickle.rows").exists()
+
+
+def combined_results(backend, requirements=2):
+    columns = [
+        f"POSTDISTILL{name}m_v0"
+        for r in range(requirements)
+        for name in (f"evalR{r}", f"evalR{r}Rationale")
+    ]
+    return backend.df[columns]
+
+
+def test_combined_evaluations_fan_out_to_every_requirement(tmp_path, close_backends):
+    mock = MockLLM()
+    backend = make_backend(
+        tmp_path, mock, evaluation_combine_requirements=True, pipeline_chunk_size=0
+    )
+    close_backends(backend)
+    backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+
+    # One call per row judges both requirements.
+    assert mock.calls == ROWS
+    results = combined_results(backend)
+    assert results.notna().all().all()
+    assert set(scores(backend, "0")) == {True, False}
+    assert scores(backend, "0").tolist() != scores(backend, "1").tolist()
+    for column in results.columns:
+        saved = read_series(tmp_path / f"{column}.pickle", backend.df.index)
+        assert saved.tolist() == results[column].tolist()
+
+
+def test_combined_evaluations_fall_back_to_single_requirements(
+    tmp_path, close_backends
+):
+    mock = MockLLM(
+        responders=[(r"for each requirement.*Model Output: '''out 3 '''", "{oops")]
+    )
+    backend = make_backend(
+        tmp_path, mock, evaluation_combine_requirements=True, pipeline_chunk_size=0
+    )
+    close_backends(backend)
+    backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+
+    # Row 3 is evaluated once per requirement instead.
+    assert mock.calls == ROWS + 2
+    assert combined_results(backend).notna().all().all()
+    assert backend.llm_dead_letters.get("POSTDISTILLevalR0m_v0") == []
+
+
+def test_combined_evaluations_in_the_pipeline_match_unpipelined_runs(
+    tmp_path, close_backends
+):
+    results = []
+    for chunk_size in (0, 7):
+        backend = make_backend(
+            tmp_path / str(chunk_size),
+            evaluation_combine_requirements=True,
+            pipeline_chunk_size=chunk_size,
+        )
+        close_backends(backend)
+        backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+        results.append(combined_results(backend))
+
+    unpipelined, pipelined = results
+    assert pipelined.notna().all().all()
+    pd.testing.assert_frame_equal(pipelined, unpipelined)
+
+
+def test_combined_evaluations_keep_their_lane(tmp_path, close_backends):
+    backend = make_backend(tmp_path, evaluation_combine_requirements=True)
+    close_backends(backend)
+    backend.run_prompt(
+        InferenceRequest(model="m", prompt_id="v0", filter_ids=FilterIds(ids=[0]))
+    )
+    lanes = []
+    client = backend.llm_pool.client
+
+    def recording_client(*args, **kwargs):
+        lanes.append(kwargs["lane"])
+        return client(*args, **kwargs)
+
+    backend.llm_pool.client = recording_client
+    backend.evaluate_requirements(
+        "m", "v0", ["0", "1"], FilterIds(ids=[1, 2]), lane=Lane.BACKGROUND
+    )
+    assert lanes == [Lane.BACKGROUND]
+
+
+def test_rows_of_failed_batches_are_dead_lettered(tmp_path, close_backends):
+    backend = make_backend(
+        tmp_path,
+        requirements=1,
+        llm_batch=True,
+        llm_batch_backend=FailingBatchBackend(MockLLM()),
+        llm_batch_poll_interval=0.01,
+        pipeline_chunk_size=0,
+    )
+    close_backends(backend)
+    backend.run_prompt(
+        InferenceRequest(model="m", prompt_id="v0", filter_ids=FilterIds(ids=[0, 1]))
+    )
+
+    assert scores(backend, "0").isna().all()
+    letters = backend.llm_dead_letters.get("POSTDISTILLevalR0m_v0")
+    assert sorted(letter.num for letter in letters) == [0, 1]
+
+
+def test_flushes_only_save_the_rows_they_evaluated(
+    tmp_path, close_backends, monkeypatch
+):
+    backend = make_backend(
+        tmp_path, requirements=1, evaluation_flush_every=1, pipeline_chunk_size=0
+    )
+    close_backends(backend)
+    saved_whole = []
+    monkeypatch.setattr(
+        "zeno.backend.save_series",
+        lambda series, path: saved_whole.append(path) or save_series(series, path),
+    )
+    backend.run_prompt(InferenceRequest(model="m", prompt_id="v0"))
+    backend.resume_evaluation(InferenceRequest(model="m", prompt_id="v0"))
+
+    assert [p for p in saved_whole if "evalR0" in str(p)] == []
+    for column in ("POSTDISTILLevalR0m_v0", "POSTDISTILLevalR0Rationalem_v0"):
+        saved = read_series(tmp_path / f"{column}.pickle", backend.df.index)
+        assert saved.notna().all()
+        assert saved.tolist() == backend.df[column].tolist()
@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+from zeno.classes.classes import CodeEvaluator, Requirement
+from zeno.processing.code_evaluation import reject_untrusted_code, run_code_evaluator
+
+OUTPUTS = pd.Series(
+    ['{"a": 1}', "Hello world, nice to meet you", None, "[1, 2"], index=[3, 5, 7, 9]
+)
+
+
+def evaluate(**kwargs):
+    scores, rationales = run_code_evaluator(CodeEvaluator(**kwargs), OUTPUTS)
+    assert list(scores.index) == list(OUTPUTS.index)
+    assert rationales.notna().all()
+    return list(scores)
+
+
+def test_regex_and_length_evaluators():
+    assert evaluate(kind="regex", pattern=r"hello", ignore_case=True) == [
+        False,
+        True,
+        False,
+        False,
+    ]
+    assert evaluate(kind="regex", pattern=r"\d", negate=True) == [
+        False,
+        True,
+        True,
+        False,
+    ]
+    assert evaluate(kind="length", max_length=8) == [True, False, True, True]
+    assert evaluate(kind="length", min_length=2, unit="words") == [
+        True,
+        True,
+        False,
+        True,
+    ]
+
+
+def test_json_evaluator():
+    assert evaluate(kind="json") == [True, False, False, False]
+
+
+def test_python_evaluator_can_leave_rows_undecided():
+    code = "None if not output else output.startswith('{')"
+    assert evaluate(kind="python", code=code) == [True, False, None, False]
+    # Errors leave the row undecided rather than failing the sweep.
+    assert evaluate(kind="python", code="json.loads(output)['a'] == 1") == [
+        True,
+        None,
+        None,
+        None,
+    ]
+
+
+def test_python_evaluator_only_gets_safe_names():
+    assert evaluate(kind="python", code="len(re.findall('o', output)) > 1") == [
+        False,
+        True,
+        False,
+        False,
+    ]
+    # Builtins outside the allow-list leave every row undecided.
+    assert evaluate(kind="python", code="open('/etc/passwd') is None") == [None] * 4
+    assert evaluate(kind="python", code="json.codecs is None") == [None] * 4
+    for code in ["().__class__", "__import__('os')", "output._x"]:
+        with pytest.raises(ValueError):
+            evaluate(kind="python", code=code)
+
+
+def frame_escape(path):
+    # Reaches the builtins of the caller through the frame of a generator.
+    return (
+        "[list(g) for l in [[]] for g in [(l[0].gi_frame.f_back.f_back.f_back"
+        f".f_builtins['open']({str(path)!r},'w').write('x') for _ in [1])]"
+        " if l.append(g) is None]"
+    )
+
+
+def test_python_evaluator_cannot_reach_frames(tmp_path):
+    path = tmp_path / "pwned"
+    with pytest.raises(ValueError):
+        evaluate(kind="python", code=frame_escape(path))
+    assert not path.exists()
+
+
+def test_code_evaluators_are_only_accepted_from_the_config():
+    def requirement(**evaluator):
+        return Requirement(
+            id="0",
+            name="r",
+            description="d",
+            prompt_snippet="",
+            evaluation_method="m",
+            evaluator=CodeEvaluator(**evaluator),
+        )
+
+    configured = CodeEvaluator(kind="python", code="True")
+    reject_untrusted_code(
+        [requirement(kind="python", code="True"), requirement(kind="json")],
+        [configured],
+    )
+    with pytest.raises(ValueError):
+        reject_untrusted_code([requirement(kind="python", code="False")], [configured])
+
+
+def test_unknown_evaluator_kind():
+    with pytest.raises(ValueError):
+        evaluate(kind="unknown")
@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from zeno.api import ModelReturn, ZenoOptions
+from zeno.classes.base import ZenoColumn, ZenoColumnType
+from zeno.classes.classes import Prompt
+from zeno.processing.data_processing import next_chunk_size, run_inference
+from zeno.util import append_series, load_series, save_series
+
+OPTIONS = ZenoOptions(
+    id_column="id",
+    data_column="text",
+    label_column="",
+    distill_columns={},
+    data_path="",
+    label_path="",
+    output_column="",
+    output_path="",
+)
+PROMPT = Prompt(text="p", version="v0", requirements={})
+
+
+def load(cache_path):
+    metadata = pd.DataFrame({"text": [f"row {i}" for i in range(100)]})
+    for name, column_type in [
+        ("output", ZenoColumnType.OUTPUT),
+        ("embedding", ZenoColumnType.EMBEDDING),
+    ]:
+        col = ZenoColumn(column_type=column_type, name=name, model="m", prompt_id="v0")
+        load_series(metadata, col, Path(cache_path, str(col) + ".pickle"))
+    return metadata
+
+
+def test_chunk_size_adapts_to_the_time_per_chunk():
+    assert next_chunk_size(100, 100, 60, 30) == 50
+    assert next_chunk_size(100, 100, 1, 30) == 200
+    assert next_chunk_size(100, 100, 0, 30) == 200
+    assert next_chunk_size(1, 1, 600, 30) == 1
+
+
+def test_inference_resumes_after_the_last_saved_chunk(tmp_path):
+    calls = []
+    crash_at = [3]
+
+    def predict(model_name, prompt_text):
+        def fn(df, ops):
+            calls.append(len(df))
+            if len(calls) == crash_at[0]:
+                raise RuntimeError("crashed")
+            return ModelReturn(model_output=[t.upper() for t in df["text"]])
+
+        return fn
+
+    with pytest.raises(RuntimeError):
+        run_inference(
+            predict,
+            OPTIONS,
+            "m",
+            PROMPT,
+            str(tmp_path),
+            load(tmp_path),
+            1,
+            0,
+            chunk_size=30,
+        )
+    assert calls == [30, 30, 30]
+    assert load(tmp_path)["OUTPUToutputm_v0"].notna().sum() == 60
+
+    calls.clear()
+    crash_at[0] = None
+    out = run_inference(
+        predict,
+        OPTIONS,
+        "m",
+        PROMPT,
+        str(tmp_path),
+        load(tmp_path),
+        1,
+        0,
+        chunk_size=30,
+    )
+    assert calls == [30, 10]
+    assert out[0].output.tolist() == [f"ROW {i}" for i in range(100)]
+
+
+def test_appended_rows_are_loaded_until_the_column_is_saved(tmp_path):
+    col = ZenoColumn(
+        column_type=ZenoColumnType.OUTPUT, name="output", model="m", prompt_id="v0"
+    )
+    path = Path(tmp_path, str(col) + ".pickle")
+    append_series(pd.Series(["a", "b"], index=[3, 1]), path)
+    append_series(pd.Series(["c"], index=[1]), path)
+    with open(str(path) + ".rows", "ab") as f:
+        # Rows cut off by a crash.
+        f.write(b"\x80\x04")
+
+    output = load(tmp_path)["OUTPUToutputm_v0"]
+    assert output[3] == "a"
+    assert output[1] == "c"
+    assert output.notna().sum() == 2
+
+    save_series(pd.Series(["d"] * 100), path)
+    assert not Path(str(path) + ".rows").exists()
+    assert load(tmp_path)["OUTPUToutputm_v0"].tolist() == ["d"] * 100
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from zeno.classes.classes import JobInfo
+from zeno.processing import jobs
+from zeno.processing.jobs import JobManager
+
+
+def wait_for(manager, job_id, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while manager.get(job_id).status not in statuses:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+def test_jobs_report_progress_and_stop_at_checkpoints(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs.jsonl"))
+    step = threading.Event()
+    rows = []
+
+    def target():
+        jobs.add_total(3)
+        for i in range(3):
+            step.wait()
+            step.clear()
+            jobs.checkpoint()
+            rows.append(i)
+            jobs.advance()
+
+    job = manager.submit("count", {"n": 3}, target)
+    # An identical unfinished job is not started twice.
+    assert manager.submit("count", {"n": 3}, target).id == job.id
+    wait_for(manager, job.id, ["running"])
+    step.set()
+    while len(rows) < 1:
+        time.sleep(0.01)
+    assert manager.get(job.id).rows_done == 1
+    assert manager.get(job.id).rows_total == 3
+
+    assert manager.pause(job.id).status == "paused"
+    step.set()
+    time.sleep(0.1)
+    assert rows == [0]
+    manager.cancel(job.id)
+    info = wait_for(manager, job.id, ["cancelled"])
+    assert rows == [0] and info.ended_at is not None
+
+    # Without a job, the checkpoint and progress functions do nothing.
+    jobs.checkpoint()
+    jobs.advance()
+
+
+def test_unfinished_jobs_resume_from_the_journal(tmp_path):
+    path = str(tmp_path / "jobs.jsonl")
+    manager = JobManager(path)
+    failed = manager.submit("fail", {}, lambda: 1 / 0)
+    done = manager.submit("noop", {}, lambda: None)
+    wait_for(manager, failed.id, ["failed"])
+    wait_for(manager, done.id, ["done"])
+    with open(path, "a") as f:
+        # Left running by a process that was stopped.
+        for kind in ["run", "unknown"]:
+            f.write(
+                JobInfo(
+                    id=kind, kind=kind, request={"x": 1}, status="running", created_at=1
+                ).model_dump_json()
+                + "\n"
+            )
+
+    resumed = []
+    manager = JobManager(path)
+    manager.resume_unfinished({"run": resumed.append})
+    info = wait_for(manager, "run", ["done"])
+    assert resumed == [{"x": 1}] and info.created_at == 1
+    assert manager.get("unknown").status == "failed"
+    assert [j.status for j in manager.list()][:2] == ["done", "failed"]
+    assert {j.kind for j in manager.list() if j.status == "failed"} == {
+        "fail",
+        "unknown",
+    }
+
+
+def test_jobs_started_by_a_job_stop_with_it(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs.jsonl"))
+    stop = threading.Event()
+    children = []
+
+    def child():
+        while not stop.is_set():
+            jobs.checkpoint()
+            time.sleep(0.01)
+
+    def parent():
+        children.append(manager.submit("child", {}, child))
+        return JobInfo(id="x", kind="k", status="done", created_at=1)
+
+    job = manager.submit("parent", {}, parent)
+    info = wait_for(manager, job.id, ["done"])
+    assert info.result["createdAt"] == 1
+    assert manager.get(children[0].id).parent_id == job.id
+
+    # Also once the parent is done.
+    manager.cancel(job.id)
+    wait_for(manager, children[0].id, ["cancelled"])
+    stop.set()
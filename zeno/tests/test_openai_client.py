@@ -0,0 +1,863 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import uvicorn
+from openai import OpenAI
+from openai.types.chat import ChatCompletionChunk
+
+from zeno.llm.batch import BatchClient, LocalBatchBackend
+from zeno.llm.cache import ResponseCache, payload_key
+from zeno.llm.dead_letter import DeadLetterStore
+from zeno.llm.endpoints import APIEndpoint
+from zeno.llm.evaluation_store import EvaluationStore, output_key, requirement_key
+from zeno.llm.mock import MockLLM
+from zeno.llm.packing import pack_rows, parse_packed
+from zeno.llm.rate_limit import RateLimiter, estimate_tokens
+from zeno.llm.scheduler import Lane, LaneQueue
+from zeno.llm.telemetry import Telemetry
+from zeno.llm.transport import HTTPTransport
+from zeno.openai_client import (
+    OpenAIClientPool,
+    OpenAIMultiClient,
+    Payload,
+    prefix_key,
+)
+from zeno.processing.jobs import JobManager
+from zeno.prompt_templates import (
+    REQUIREMENT_EVALUATION_OUTPUT_PROMPT,
+    REQUIREMENT_EVALUATION_PACKED_OUTPUT_PROMPT,
+    REQUIREMENT_EVALUATION_PACKED_PROMPT,
+    REQUIREMENT_EVALUATION_PROMPT,
+    REQUIREMENT_EXTRACTOR_PROMPT,
+    REQUIREMENTS_EVALUATION_PROMPT,
+)
+from zeno.util import requirements_to_eval_str
+
+
+def fake_api(calls):
+    async def _api(payload):
+        calls.append(payload.data)
+        content = payload.data["messages"][-1]["content"].upper()
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    return _api
+
+
+def run_requests(client, contents, **kwargs):
+    def send():
+        for i, content in enumerate(contents):
+            client.request(
+                data={"messages": [{"role": "user", "content": content}]},
+                metadata={"num": i},
+                **kwargs,
+            )
+
+    client.run_request_function(send)
+    return sorted(client, key=lambda p: p.metadata["num"])
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "llm"))
+
+
+def test_payload_key_is_canonical():
+    a = payload_key("chats", {"model": "m", "messages": [], "temperature": 0})
+    b = payload_key(
+        "chat.completions", {"temperature": 0, "messages": [], "model": "m"}
+    )
+    assert a == b
+    assert a != payload_key("chats", {"model": "m", "messages": [], "temperature": 1})
+
+
+def test_cache_replays_across_clients(cache):
+    calls = []
+    first = run_requests(
+        OpenAIMultiClient(endpoint="chats", custom_api=fake_api(calls), cache=cache),
+        ["a", "b"],
+    )
+    second = run_requests(
+        OpenAIMultiClient(endpoint="chats", custom_api=fake_api(calls), cache=cache),
+        ["a", "b"],
+    )
+
+    assert len(calls) == 2
+    assert [p.cached for p in first] == [False, False]
+    assert [p.cached for p in second] == [True, True]
+    assert [p.response.choices[0].message.content for p in second] == ["A", "B"]
+
+
+def test_cache_opt_out(cache):
+    calls = []
+    for _ in range(2):
+        run_requests(
+            OpenAIMultiClient(
+                endpoint="chats", custom_api=fake_api(calls), cache=cache
+            ),
+            ["a"],
+            cache=False,
+        )
+    assert len(calls) == 2
+
+
+def test_cache_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_size=2500, max_age=60)
+    for i in range(5):
+        cache.put(str(i) * 64, "x" * 1000)
+        # Make sure access times differ between entries.
+        entry = cache._entry_path(str(i) * 64)
+        os.utime(entry, (time.time() - 10 + i, time.time()))
+    cache.evict()
+
+    assert cache.get("0" * 64) is None
+    assert cache.get("4" * 64) == "x" * 1000
+
+    entry = cache._entry_path("4" * 64)
+    os.utime(entry, (time.time(), time.time() - 120))
+    assert cache.get("4" * 64) is None
+
+
+def test_rate_limiter_aimd():
+    limiter = RateLimiter(initial_concurrency=4, max_concurrency=8)
+
+    async def run_calls(n):
+        for _ in range(n):
+            await limiter.acquire("m", 10)
+            limiter.release("m", latency=0.1)
+
+    asyncio.run(run_calls(4))
+    assert limiter.concurrency == 5
+
+    asyncio.run(limiter.acquire("m", 10))
+    limiter.release_failed("m", rate_limited=True, retry_after=0)
+    state = limiter.state()
+    assert state.concurrency == 2
+    assert state.rate_limited == 1
+    assert state.active == 0
+
+
+def test_rate_limiter_latency_baseline():
+    limiter = RateLimiter(initial_concurrency=4, max_concurrency=64)
+
+    def calls(n, model, latency, tokens):
+        for _ in range(n):
+            asyncio.run(limiter.acquire(model, tokens))
+            limiter._last_decrease = 0.0
+            limiter.release(model, latency=latency, estimated_tokens=tokens)
+
+    # Short calls, then calls to a slower model and larger packed calls.
+    calls(10, "fast", 0.1, 100)
+    calls(10, "slow", 2.0, 100)
+    calls(10, "fast", 2.0, 2000)
+    grown = limiter.concurrency
+    assert grown > 4
+
+    # Congestion shrinks concurrency until it becomes the new baseline.
+    calls(10, "fast", 10.0, 2000)
+    shrunk = limiter.concurrency
+    assert shrunk < grown
+    calls(200, "fast", 10.0, 2000)
+    assert limiter.concurrency > shrunk
+
+
+def test_rate_limiter_token_budget():
+    limiter = RateLimiter(limits={"m": {"rpm": 60, "tpm": 6000}})
+
+    async def acquire_twice():
+        await limiter.acquire("m", 6000)
+        start = time.monotonic()
+        await limiter.acquire("m", 100)
+        return time.monotonic() - start
+
+    # The first call drains the token budget, the second waits for 100 tokens.
+    assert 0.5 < asyncio.run(acquire_twice()) < 3
+    assert (
+        estimate_tokens({"messages": [{"content": "x" * 400}], "max_tokens": 10}) == 110
+    )
+
+
+def test_cancelled_calls_release_their_slots():
+    limiter = RateLimiter(initial_concurrency=2)
+    endpoint = APIEndpoint(rate_limiter=limiter)
+    started = asyncio.Event()
+
+    async def hanging_api(payload):
+        started.set()
+        await asyncio.sleep(60)
+
+    pool = OpenAIClientPool(custom_api=hanging_api, endpoints=[endpoint])
+    payload = Payload(
+        endpoint="chats",
+        data={"model": "m", "messages": [{"role": "user", "content": "a"}]},
+        metadata={},
+        max_retries=1,
+        retry_multiplier=1,
+        retry_max=1,
+    )
+
+    async def cancel_mid_call():
+        task = asyncio.create_task(pool._fetch(payload))
+        await started.wait()
+        assert limiter.state().active == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_call())
+    pool.close()
+    assert limiter.state().active == 0
+    assert endpoint._in_flight == 0
+    assert endpoint.failures == 0
+
+
+def test_client_reports_rate_limits():
+    limiter = RateLimiter(initial_concurrency=4)
+    calls = []
+    api = fake_api(calls)
+
+    async def flaky_api(payload):
+        if payload.attempt == 1:
+            error = Exception("rate limited")
+            error.status_code = 429  # type: ignore
+            raise error
+        return await api(payload)
+
+    client = OpenAIMultiClient(
+        endpoint="chats", custom_api=flaky_api, rate_limiter=limiter, retry_max=0.1
+    )
+    results = run_requests(client, ["a"])
+
+    assert results[0].response.choices[0].message.content == "A"
+    assert limiter.rate_limited == 1
+    assert limiter.completed == 1
+
+
+def test_pool_routes_results_to_jobs():
+    calls = []
+    pool = OpenAIClientPool(custom_api=fake_api(calls))
+
+    first = run_requests(pool.client(endpoint="chats"), ["a", "b"])
+    second = run_requests(pool.client(endpoint="chats"), ["c"])
+    pool.close()
+
+    assert [p.response.choices[0].message.content for p in first] == ["A", "B"]
+    assert [p.response.choices[0].message.content for p in second] == ["C"]
+
+
+def test_paused_clients_hold_requests_and_cancelled_ones_drop_them():
+    calls = []
+    api = fake_api(calls)
+
+    async def slow_api(payload):
+        await asyncio.sleep(0.05)
+        return await api(payload)
+
+    pool = OpenAIClientPool(concurrency=2, custom_api=slow_api)
+    client = pool.client(endpoint="chats")
+    client.pause()
+    for content in "abcdef":
+        client.request({"messages": [{"role": "user", "content": content}]})
+    client.close()
+    time.sleep(0.2)
+    assert calls == [] and client.in_flight == 0
+
+    client.resume()
+    results = [next(client), next(client)]
+    client.cancel()
+    results.extend(client)
+    pool.close()
+    # Calls in flight at the cancellation finish, the others never start.
+    assert 2 <= len(results) == len(calls) < 6
+
+
+def test_async_iteration():
+    calls = []
+    pool = OpenAIClientPool(custom_api=fake_api(calls))
+
+    async def evaluate():
+        client = pool.client(endpoint="chats")
+        for content in ["a", "b", "c"]:
+            await client.arequest({"messages": [{"role": "user", "content": content}]})
+        client.close()
+        return sorted([p.response.choices[0].message.content async for p in client])
+
+    assert asyncio.run(evaluate()) == ["A", "B", "C"]
+    pool.close()
+
+
+def test_identical_inflight_requests_are_coalesced():
+    calls = []
+    api = fake_api(calls)
+
+    async def slow_api(payload):
+        await asyncio.sleep(0.2)
+        return await api(payload)
+
+    pool = OpenAIClientPool(custom_api=slow_api)
+    jobs = [pool.client(endpoint="chats") for _ in range(3)]
+    for job in jobs:
+        job.request({"messages": [{"role": "user", "content": "a"}]})
+        job.close()
+    results = [next(iter(job)) for job in jobs]
+
+    assert len(calls) == 1
+    assert sorted(p.coalesced for p in results) == [False, True, True]
+    assert all(p.response.choices[0].message.content == "A" for p in results)
+
+    job = pool.client(endpoint="chats")
+    for _ in range(2):
+        job.request({"messages": [{"role": "user", "content": "a"}]}, cache=False)
+    job.close()
+    job.pull_all()
+    pool.close()
+    assert len(calls) == 3
+
+
+def test_failed_payloads_go_to_dead_letters(tmp_path):
+    async def flaky_api(payload):
+        content = payload.data["messages"][-1]["content"]
+        if content == "fail":
+            raise ValueError("bad request")
+        return content
+
+    pool = OpenAIClientPool(custom_api=flaky_api)
+    results = run_requests(
+        pool.client(endpoint="chats"),
+        ["a", "fail", "b"],
+        max_retries=2,
+        retry_multiplier=0.01,
+        retry_max=0.01,
+    )
+    pool.close()
+    assert [p.failed for p in results] == [False, True, False]
+    assert results[1].attempt == 2
+    assert "bad request" in results[1].error
+
+    store = DeadLetterStore(str(tmp_path / "dead_letters"))
+    store.add("evalR1", results[1], results[1].error, caller="test")
+    store.add("evalR1", results[1], "again")
+    store.add("evalR2", results[0], "unparsable")
+    letters = store.get("evalR1")
+    assert [(d.num, d.error) for d in letters] == [(1, "again")]
+    assert letters[0].data == {"messages": [{"role": "user", "content": "fail"}]}
+    assert len(store.get()) == 2
+
+    store.discard("evalR1", [1])
+    store.discard("evalR2")
+    assert store.get() == []
+    assert list((tmp_path / "dead_letters").iterdir()) == []
+
+
+def test_evaluation_store_keys_by_content(tmp_path):
+    example = SimpleNamespace(input="i", output="o", is_positive=True, feedback="")
+    requirement = SimpleNamespace(
+        description="d", evaluation_method="m", examples=[example]
+    )
+    key = requirement_key(requirement, "judge")
+    assert key == requirement_key(SimpleNamespace(**vars(requirement)), "judge")
+    assert key != requirement_key(requirement, "other judge")
+    assert key != requirement_key(
+        SimpleNamespace(**{**vars(requirement), "examples": []}), "judge"
+    )
+
+    store = EvaluationStore(str(tmp_path))
+    store.put(key, {output_key("a"): (True, "ok")})
+    store.adopt(
+        "col", key, {output_key("a"): (False, "old"), output_key("b"): (False, "")}
+    )
+    store.adopt("col", key, {output_key("c"): (True, "")})
+
+    reopened = EvaluationStore(str(tmp_path))
+    # Stored verdicts win over adopted ones, and a column is adopted only once.
+    assert reopened.get(key) == {
+        output_key("a"): (True, "ok"),
+        output_key("b"): (False, ""),
+    }
+    reopened.adopt("col", key, {output_key("c"): (True, "")})
+    assert output_key("c") not in reopened.get(key)
+
+
+def test_evaluation_store_appends_verdicts(tmp_path):
+    store = EvaluationStore(str(tmp_path))
+    store.put("r", {"a": (True, "")})
+    store.put("r", {"b": (False, "")})
+    # Only the log is written until it outgrows the verdicts saved whole.
+    assert not (tmp_path / "r.pickle").exists()
+    assert EvaluationStore(str(tmp_path)).get("r") == {
+        "a": (True, ""),
+        "b": (False, ""),
+    }
+
+    store.put("r", {"a": (False, "x")})
+    assert (tmp_path / "r.pickle").exists()
+    assert not (tmp_path / "r.pickle.rows").exists()
+    store.put("r", {"c": (True, "")})
+    with open(tmp_path / "r.pickle.rows", "ab") as f:
+        # Verdicts cut off by a crash.
+        f.write(b"\x80\x04")
+    assert EvaluationStore(str(tmp_path)).get("r") == {
+        "a": (False, "x"),
+        "b": (False, ""),
+        "c": (True, ""),
+    }
+
+
+def batch_chat_api(calls):
+    async def chat_api(payload):
+        content = payload.data["messages"][-1]["content"]
+        calls.append(content)
+        if content == "fail":
+            raise ValueError("bad request")
+        return {
+            "id": "x",
+            "object": "chat.completion",
+            "created": 0,
+            "model": payload.data["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content.upper()},
+                }
+            ],
+        }
+
+    return chat_api
+
+
+def new_batch_client(tmp_path, backend, cache=None):
+    return BatchClient(
+        backend,
+        str(tmp_path / "batches"),
+        endpoint="chats",
+        data_template={"model": "m"},
+        poll_interval=0.01,
+        cache=cache,
+    )
+
+
+def test_batch_client_merges_results_by_num(tmp_path, cache):
+    calls = []
+
+    def new_client():
+        return new_batch_client(
+            tmp_path, LocalBatchBackend(batch_chat_api(calls)), cache
+        )
+
+    results = run_requests(new_client(), ["a", "b", "a", "fail"])
+    assert [p.failed for p in results] == [False, False, False, True]
+    assert [p.response.choices[0].message.content for p in results[:3]] == [
+        "A",
+        "B",
+        "A",
+    ]
+    assert sorted(calls) == ["a", "b", "fail"]
+
+    results = run_requests(new_client(), ["b", "fail"])
+    assert [p.cached for p in results] == [True, False]
+    assert len(calls) == 4
+
+
+def test_batch_client_neither_caches_nor_merges_uncached_payloads(tmp_path, cache):
+    calls = []
+    backend = LocalBatchBackend(batch_chat_api(calls))
+    client = new_batch_client(tmp_path, backend, cache)
+
+    results = run_requests(client, ["a", "a"], cache=False)
+    assert [p.response.choices[0].message.content for p in results] == ["A", "A"]
+    assert calls == ["a", "a"]
+    data = {"model": "m", "messages": [{"role": "user", "content": "a"}]}
+    assert cache.get(payload_key("chat.completions", data)) is None
+
+
+class FailingBatchBackend(LocalBatchBackend):
+    def poll(self, batch_id, output_dir):
+        raise RuntimeError(f"Batch {batch_id} expired")
+
+
+def test_failed_batches_fail_their_payloads(tmp_path, cache):
+    client = new_batch_client(tmp_path, FailingBatchBackend(batch_chat_api([])))
+
+    results = run_requests(client, ["a", "b"])
+    assert [p.failed for p in results] == [True, True]
+    assert all("expired" in p.error for p in results)
+
+
+class PendingBatchBackend(LocalBatchBackend):
+    def __init__(self):
+        super().__init__(batch_chat_api([]))
+        self.cancelled = []
+
+    def poll(self, batch_id, output_dir):
+        return None
+
+    def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+
+def test_batch_waits_stop_when_their_job_is_cancelled(tmp_path):
+    backend = PendingBatchBackend()
+    manager = JobManager(str(tmp_path / "jobs.jsonl"))
+    job = manager.submit(
+        "batch", {}, lambda: run_requests(new_batch_client(tmp_path, backend), ["a"])
+    )
+    while len(backend._threads) == 0:
+        time.sleep(0.01)
+
+    manager.cancel(job.id)
+    deadline = time.time() + 5
+    while manager.get(job.id).status != "cancelled":
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert backend.cancelled == list(backend._threads)
+
+
+def test_streaming_forwards_deltas(cache):
+    async def streaming_api(payload):
+        async def chunks():
+            for i, token in enumerate(["{", '"a"', ": 1", "}"]):
+                yield ChatCompletionChunk.model_validate(
+                    {
+                        "id": "x",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": "m",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"content": token},
+                                "finish_reason": "stop" if i == 3 else None,
+                            }
+                        ],
+                    }
+                )
+
+        return chunks()
+
+    def stream_once():
+        deltas = []
+        client = OpenAIMultiClient(
+            endpoint="chats", custom_api=streaming_api, cache=cache
+        )
+        client.request({"messages": []}, on_delta=deltas.append)
+        client.close()
+        return deltas, next(iter(client))
+
+    deltas, result = stream_once()
+    assert deltas == ["{", '"a"', ": 1", "}"]
+    assert result.response.choices[0].message.content == '{"a": 1}'
+    assert result.response.choices[0].finish_reason == "stop"
+
+    # Cached responses are replayed as a single delta.
+    deltas, result = stream_once()
+    assert result.cached
+    assert deltas == ['{"a": 1}']
+
+
+def test_mock_llm_scripts_evaluations_and_injects_errors():
+    mock = MockLLM(rate_limit_rate=0.3, server_error_rate=0.2, retry_after=0)
+    client = OpenAIMultiClient(
+        endpoint="chats", custom_api=mock, retry_multiplier=0.01, retry_max=0.01
+    )
+    prefix = REQUIREMENT_EVALUATION_PROMPT.format(
+        prompt="p", requirement="r", evaluation_method="m", examples=""
+    )
+    prompts = [
+        prefix + REQUIREMENT_EVALUATION_OUTPUT_PROMPT.format(modelOutput=i)
+        for i in range(20)
+    ]
+    results = run_requests(client, prompts)
+
+    assert not any(p.failed for p in results)
+    assert mock.errors > 0
+    assert mock.calls == 20 + mock.errors
+    evaluations = [json.loads(p.response.choices[0].message.content) for p in results]
+    assert [e["modelOutput"] for e in evaluations] == [str(i) for i in range(20)]
+    assert {e["pass/fail"] for e in evaluations} == {0, 1}
+    # Outputs only depend on the request and the seed.
+    assert MockLLM().text({"messages": [{"content": prompts[0]}]}) == mock.text(
+        {"messages": [{"content": prompts[0]}]}
+    )
+
+
+def test_packed_evaluation_matches_single_rows():
+    outputs = {10: "a" * 40, 11: "b", 12: "c" * 400, 13: "d", 14: "e", 15: "f"}
+    packs = pack_rows(list(outputs), list(outputs.values()), 30, 2)
+    assert packs == [[10, 11], [12], [13, 14], [15]]
+
+    mock = MockLLM(pass_rate=0.5)
+    prefix = REQUIREMENT_EVALUATION_PROMPT.format(
+        prompt="p", requirement="r", evaluation_method="m", examples=""
+    )
+
+    def evaluate(nums):
+        if len(nums) == 1:
+            output = REQUIREMENT_EVALUATION_OUTPUT_PROMPT.format(
+                modelOutput=outputs[nums[0]]
+            )
+        else:
+            output = REQUIREMENT_EVALUATION_PACKED_PROMPT.format(
+                modelOutputs="\n".join(
+                    REQUIREMENT_EVALUATION_PACKED_OUTPUT_PROMPT.format(
+                        id=i, modelOutput=outputs[i]
+                    )
+                    for i in nums
+                )
+            )
+        messages = [
+            {"role": "user", "content": prefix},
+            {"role": "user", "content": output},
+        ]
+        return mock.text({"messages": messages})
+
+    packed = parse_packed(evaluate(list(outputs)), list(outputs))
+    assert list(packed) == list(outputs)
+    for i in outputs:
+        single = json.loads(evaluate([i]))
+        assert packed[i]["pass/fail"] == single["pass/fail"]
+
+    # Rows missing from a response are left for a single-row retry.
+    partial = json.dumps({"results": [{"id": "11", "pass/fail": 1}, "x", {"id": 99}]})
+    assert parse_packed(partial, [10, 11]) == {11: {"id": "11", "pass/fail": 1}}
+    with pytest.raises(ValueError):
+        parse_packed("not json", [10])
+
+
+def test_mock_llm_evaluates_several_requirements_at_once():
+    requirements = [
+        SimpleNamespace(
+            id=str(i), description=f"d{i}", evaluation_method="m", examples=[]
+        )
+        for i in range(12)
+    ]
+    prompt = REQUIREMENTS_EVALUATION_PROMPT.format(
+        prompt="p", requirements=requirements_to_eval_str(requirements)
+    )
+    assert "Requirement 11: '''d11'''" in prompt
+    messages = [
+        {"role": "user", "content": prompt},
+        {
+            "role": "user",
+            "content": REQUIREMENT_EVALUATION_OUTPUT_PROMPT.format(modelOutput="o"),
+        },
+    ]
+    ids = [r.id for r in requirements]
+    results = parse_packed(MockLLM().text({"messages": messages}), ids)
+    assert list(results) == ids
+    assert {r["pass/fail"] for r in results.values()} == {0, 1}
+
+
+def test_mock_llm_serves_openai_api():
+    mock = MockLLM(rate_limit_rate=1.0, retry_after=0)
+    server = uvicorn.Server(
+        uvicorn.Config(mock.app(), port=0, log_level="error", lifespan="off")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    client = OpenAI(
+        api_key="mock", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0
+    )
+    messages = [
+        {
+            "role": "user",
+            "content": REQUIREMENT_EXTRACTOR_PROMPT.format(
+                prompt="Answer briefly. Use a friendly tone."
+            ),
+        }
+    ]
+    with pytest.raises(Exception) as error:
+        client.chat.completions.create(model="m", messages=messages)
+    assert getattr(error.value, "status_code", None) == 429
+
+    mock.rate_limit_rate = 0
+    response = client.chat.completions.create(model="m", messages=messages)
+    requirements = json.loads(response.choices[0].message.content)["requirements"]
+    assert [r["description"] for r in requirements] == [
+        "Answer briefly.",
+        "Use a friendly tone.",
+    ]
+    embeddings = client.embeddings.create(model="e", input=["a", "b"])
+    assert len(embeddings.data) == 2
+
+    server.should_exit = True
+    thread.join()
+
+
+def test_telemetry_rollups(tmp_path):
+    telemetry = Telemetry()
+    mock = MockLLM(latency=0.05, rate_limit_rate=0.3, retry_after=0)
+    pool = OpenAIClientPool(custom_api=mock, telemetry=telemetry)
+    for caller, model in [("evaluate_requirement", "a"), ("suggest_requirements", "b")]:
+        client = pool.client(
+            caller=caller,
+            endpoint="chats",
+            data_template={"model": model},
+            retry_multiplier=0.01,
+            retry_max=0.01,
+        )
+        run_requests(client, [str(i) for i in range(10)])
+    pool.close()
+
+    rollups = {r.caller: r for r in telemetry.rollup()}
+    assert set(rollups) == {"evaluate_requirement", "suggest_requirements"}
+    evaluation = rollups["evaluate_requirement"]
+    assert (evaluation.endpoint, evaluation.model, evaluation.count) == (
+        "chat.completions",
+        "a",
+        10,
+    )
+    assert evaluation.retries > 0
+    assert evaluation.prompt_tokens > 0
+    assert 0.05 <= evaluation.service_time.p50 <= evaluation.latency.p50
+    assert evaluation.queue_wait.p50 >= 0
+
+    path = tmp_path / "telemetry.json"
+    telemetry.dump(str(path))
+    dumped = json.loads(path.read_text())
+    assert len(dumped["rollups"]) == 2
+    assert len(dumped["records"]) == 20
+
+
+@pytest.mark.parametrize(
+    "policy,expected",
+    [("strict", "FFFFBB"), ("weighted", "FBFFBF")],
+)
+def test_lane_queue_policies(policy, expected):
+    async def drain():
+        queue = LaneQueue(policy=policy, weights={Lane.FOREGROUND: 2})
+        for lane, count in [(Lane.BACKGROUND, 2), (Lane.FOREGROUND, 4)]:
+            for _ in range(count):
+                await queue.put(SimpleNamespace(lane=lane))
+        await queue.put(None)
+        order = [(await queue.get()).lane for _ in range(6)]
+        assert await queue.get() is None
+        return "".join("F" if lane == Lane.FOREGROUND else "B" for lane in order)
+
+    assert asyncio.run(drain()) == expected
+
+
+def test_lane_queue_groups_shared_prefixes():
+    def evaluation(requirement, output):
+        return {
+            "model": "m",
+            "messages": [
+                {"role": "system", "content": "s"},
+                {"role": "user", "content": requirement},
+                {"role": "user", "content": output},
+            ],
+        }
+
+    assert prefix_key(evaluation("r1", "a")) == prefix_key(evaluation("r1", "b"))
+    assert prefix_key(evaluation("r1", "a")) != prefix_key(evaluation("r2", "a"))
+
+    async def drain():
+        queue = LaneQueue(max_group_run=3)
+        for i in range(4):
+            for requirement in ["r1", "r2"]:
+                key = prefix_key(evaluation(requirement, str(i)))
+                await queue.put(SimpleNamespace(lane=Lane.FOREGROUND, prefix_key=key))
+        return [(await queue.get()).prefix_key for _ in range(8)]
+
+    r1 = prefix_key(evaluation("r1", ""))
+    order = ["r1" if key == r1 else "r2" for key in asyncio.run(drain())]
+    assert order == ["r1"] * 3 + ["r2"] * 3 + ["r1", "r2"]
+
+
+def test_interactive_lane_preempts_bulk_work():
+    limiter = RateLimiter(initial_concurrency=2, max_concurrency=2)
+    pool = OpenAIClientPool(custom_api=MockLLM(latency=0.1), rate_limiter=limiter)
+    bulk = pool.client(endpoint="chats", lane=Lane.FOREGROUND)
+    bulk.run_request_function(
+        lambda: [
+            bulk.request({"messages": [{"role": "user", "content": str(i)}]})
+            for i in range(40)
+        ]
+    )
+    time.sleep(0.3)
+
+    start = time.monotonic()
+    interactive = pool.client(endpoint="chats", lane=Lane.INTERACTIVE)
+    run_requests(interactive, ["suggest"])
+    waited = time.monotonic() - start
+
+    # The bulk job alone needs two seconds.
+    assert waited < 0.6
+    bulk.pull_all()
+    pool.close()
+
+
+def test_endpoints_balance_by_weight_and_fail_over():
+    mock = MockLLM(latency=0.05)
+    broken = set()
+
+    async def api(payload):
+        if payload.api_endpoint in broken:
+            error = Exception("unavailable")
+            error.status_code = 503  # type: ignore
+            raise error
+        return await mock(payload)
+
+    def endpoint(name, weight):
+        limiter = RateLimiter(initial_concurrency=3, max_concurrency=3)
+        return APIEndpoint(name=name, weight=weight, rate_limiter=limiter)
+
+    endpoints = [endpoint("a", 2), endpoint("b", 1)]
+    client = OpenAIMultiClient(
+        endpoint="chats",
+        custom_api=api,
+        endpoints=endpoints,
+        retry_multiplier=0.01,
+        retry_max=0.01,
+    )
+    results = run_requests(client, [str(i) for i in range(60)])
+    served = [p.api_endpoint for p in results]
+    assert served.count("a") > served.count("b") > 0
+
+    broken.add("a")
+    client = OpenAIMultiClient(
+        endpoint="chats", custom_api=api, endpoints=endpoints, retry_max=0.01
+    )
+    results = run_requests(client, [f"x{i}" for i in range(20)])
+    assert not any(p.failed for p in results)
+    assert {p.api_endpoint for p in results} == {"b"}
+    assert not endpoints[0].healthy()
+    assert endpoints[0].state().consecutive_failures >= 3
+
+
+def test_http_transport_is_sized_from_concurrency():
+    limits = HTTPTransport().limits(64)
+    assert limits.max_connections == 72
+    assert limits.max_keepalive_connections == 72
+    assert HTTPTransport(max_connections=5).limits(64).max_connections == 5
+
+    transport = HTTPTransport(keepalive_expiry=30).updated(
+        {"name": "a", "http2": True, "timeout": 5}
+    )
+    assert (transport.keepalive_expiry, transport.http2, transport.timeout) == (
+        30,
+        True,
+        5,
+    )
+
+    limited = APIEndpoint(
+        api_key="x", rate_limiter=RateLimiter(max_concurrency=40), transport=transport
+    )
+    pool = OpenAIClientPool(concurrency=3, endpoints=[APIEndpoint(api_key="x")])
+    unlimited = pool.endpoints.endpoints[0]
+    assert (limited.max_concurrency, unlimited.max_concurrency) == (40, 3)
+
+    client = limited.client
+    assert client.timeout.read == 5
+    assert client._client.timeout.connect == 10
+    pool.close()
+    asyncio.run(limited.close())
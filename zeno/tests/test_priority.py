@@ -0,0 +1,18 @@
+from zeno.processing.priority import PriorityHints
+
+
+def test_displayed_rows_come_first_and_follow_hint_changes():
+    hints = PriorityHints()
+    assert hints.sort([3, 1, 2]) == [3, 1, 2]
+    hints.update(displayed=[2], focused=[1, 2])
+    assert hints.sort([3, 1, 2]) == [2, 1, 3]
+
+    order = hints.ordered([[0, 5], [1, 6], [2, 7], [3, 8], [4, 9]], key=lambda p: p[0])
+    assert next(order) == [2, 7]
+    # The user moved on, what is left is re-sorted.
+    hints.update(displayed=[4])
+    assert list(order) == [[4, 9], [0, 5], [1, 6], [3, 8]]
+
+    version = hints.version
+    hints.update(displayed=[4])
+    assert hints.version == version
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from zeno.processing.sampling import proportion_interval, stratified_order
+
+
+def test_every_prefix_of_the_order_is_stratified():
+    index = pd.Index(range(1000))
+    strata = pd.Series(["a"] * 800 + ["b"] * 200, index=index)
+    order = stratified_order(index, strata, seed=1)
+    assert sorted(order) == list(index)
+    assert order == stratified_order(index, strata, seed=1)
+    for k in (10, 50, 300):
+        share = (strata[order[:k]] == "b").mean()
+        assert abs(share - 0.2) <= 1 / k + 1e-9
+
+    # Without strata, samples are spread over the positions of the rows.
+    order = stratified_order(index)
+    assert {i // 100 for i in order[:10]} == set(range(10))
+
+
+def test_proportion_interval_narrows_to_the_full_population():
+    low, high = proportion_interval(30, 100)
+    assert low < 0.3 < high
+    sampled_low, sampled_high = proportion_interval(30, 100, population=120)
+    assert low < sampled_low and sampled_high < high
+    assert proportion_interval(30, 100, population=100) == (0.3, 0.3)
+    assert proportion_interval(0, 0, population=100) == (0.0, 1.0)
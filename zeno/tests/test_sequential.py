@@ -0,0 +1,29 @@
+from zeno.processing.sequential import (
+    BETTER,
+    SAME,
+    UNDECIDED,
+    WORSE,
+    paired_sequential_test,
+)
+
+
+def test_paired_sequential_test_decides_once_the_evidence_suffices():
+    args = dict(effect=0.2, alpha=0.05, beta=0.2)
+    assert paired_sequential_test(3, 1, **args) == UNDECIDED
+    assert paired_sequential_test(20, 4, **args) == BETTER
+    assert paired_sequential_test(4, 20, **args) == WORSE
+    assert paired_sequential_test(30, 30, **args) == SAME
+    # Concordant rows carry no information, only discordant ones count.
+    assert paired_sequential_test(0, 0, **args) == UNDECIDED
+
+
+def test_paired_sequential_test_decides_that_agreeing_prompts_are_the_same():
+    args = dict(effect=0.2, alpha=0.05, beta=0.2, margin=0.05)
+    # Identical scores have no discordant rows at all.
+    assert paired_sequential_test(0, 0, rows=20, **args) == UNDECIDED
+    assert paired_sequential_test(0, 0, rows=100, **args) == SAME
+    assert paired_sequential_test(1, 0, rows=200, **args) == SAME
+    assert paired_sequential_test(3, 3, rows=40, **args) == UNDECIDED
+    assert paired_sequential_test(0, 0, rows=100, effect=0.2, alpha=0.05, beta=0.2) == (
+        UNDECIDED
+    )
@@ -15,6 +15,7 @@ import tomli
 
 from zeno.api import ZenoParameters
 from zeno.classes.base import MetadataType, ZenoColumn
+from zeno.prompt_templates import REQUIREMENTS_EVALUATION_ITEM_PROMPT
 
 VIEW_MAP_URL: str = "https://raw.githubusercontent.com/zeno-ml/instance-views/0.3/"
 VIEWS_MAP_JSON: str = "views.json"
@@ -78,14 +79,57 @@ def get_metadata_type(col: pd.Series) -> MetadataType:
 
 
 def load_series(df, col_name, save_path):
+    series = read_series(save_path, df.index)
+    col_name.metadata_type = get_metadata_type(series)
+    df.loc[:, str(col_name)] = series
+
+
+def read_series(save_path, index) -> pd.Series:
+    """A column saved with save_series and append_series, all missing if never saved."""
     try:
         series = pd.read_pickle(save_path)
-        col_name.metadata_type = get_metadata_type(series)
-        df.loc[:, str(col_name)] = series
+    except (FileNotFoundError, EOFError):
+        series = pd.Series([pd.NA] * len(index), index=index)
+    return _replay_rows(series, save_path)
+
+
+def save_series(series, save_path):
+    """Pickle a column so that a crash never leaves a partial file behind."""
+    tmp_path = str(save_path) + ".tmp"
+    series.to_pickle(tmp_path)
+    os.replace(tmp_path, save_path)
+    # The rows appended since are part of the column now.
+    try:
+        os.remove(str(save_path) + ".rows")
+    except FileNotFoundError:
+        pass
+
+
+def append_series(series, save_path):
+    """Save some rows of a column, writing only those rows.
+
+    The rows are appended to a log next to the pickle, which load_series
+    applies on top of it and the next save_series of the column clears.
+    """
+    with open(str(save_path) + ".rows", "ab") as f:
+        pickle.dump(series, f)
+
+
+def _replay_rows(series, save_path):
+    try:
+        f = open(str(save_path) + ".rows", "rb")
     except FileNotFoundError:
-        df.loc[:, str(col_name)] = pd.Series([pd.NA] * df.shape[0], index=df.index)
-    except EOFError:
-        df.loc[:, str(col_name)] = pd.Series([pd.NA] * df.shape[0], index=df.index)
+        return series
+    series = series.astype(object)
+    with f:
+        while True:
+            try:
+                rows = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                # The end, or rows cut off by a crash while appending them.
+                break
+            series.loc[rows.index] = rows.astype(object)
+    return series.convert_dtypes()
 
 
 @contextmanager
@@ -280,4 +324,36 @@ def requirements_to_str(requirements: Dict[str, Any]) -> str:
             """\"{id}\" : {{"description": "{description}", "prompt_snippet": "{prompt_snippet}"}}""".format(id=id, description=r.description, prompt_snippet=r.prompt_snippet)
             for id, r in requirements.items()
         ]
-    ) + "}"
\ No newline at end of file
+    ) + "}"
+
+
+def examples_to_str(examples: List[Any]) -> str:
+    """Convert labeled requirement examples to a string for evaluation prompts"""
+    if len(examples) == 0:
+        return ""
+    return "Labeled examples:\n" + "\n".join(
+        [
+            """Input: '''{input}'''\nOutput: '''{output}'''\npass/fail: {label}{feedback}""".format(
+                input=ex.input,
+                output=ex.output,
+                label=1 if ex.is_positive else 0,
+                feedback="\nFeedback: " + ex.feedback if ex.feedback else "",
+            )
+            for ex in examples
+        ]
+    ) + "\n"
+
+
+def requirements_to_eval_str(requirements: List[Any]) -> str:
+    """Convert requirements to a string for evaluating them in one prompt"""
+    return "\n".join(
+        [
+            REQUIREMENTS_EVALUATION_ITEM_PROMPT.format(
+                id=req.id,
+                requirement=req.description,
+                evaluation_method=req.evaluation_method,
+                examples=examples_to_str(req.examples),
+            )
+            for req in requirements
+        ]
+    )